@@ -0,0 +1,130 @@
+"""
+SLU-C AST arena
+A Program flattened into parallel arrays, the way TokenStream keeps tokens:
+the kind of every node, where its fields start, the encoded fields and
+lists, and one pool of the literal values they share, so a tree of millions
+of nodes is a handful of arrays and a short list
+Nodes are numbered breadth first from the root, the tree is rebuilt from
+the arena before it is checked or run
+"""
+from array import array
+from typing import Dict, List, Tuple
+
+from ast import *
+
+# every node class, by kind code: append new classes, codes are stored
+KINDS = [
+    Program, FunctionDef, Param, Declaration,
+    Statement, AssignmentStatement, ConstAssignment, StoreAssignment, IntAssignment, FloatAssignment,
+    PrintStatement, WhileStatement, IfStatement, BlockStatement, ReturnStatement,
+    Expr, BoolOr, BinaryExpr, AddExpr, IntAdd, FloatAdd, MultExpr, ExpoExpr, ConjExpr, BoolAnd,
+    EqExpr, RelatExpr, UnaryOp, IDExpr, IntLitExpr, StrLitExpr, FloatLitExpr, BoolExpr,
+    FuncCExpr, MemoCall, Farg,
+]
+CODES = {cls: code for code, cls in enumerate(KINDS)}
+# the slots of every kind, base class slots first
+FIELDS = {cls: tuple(s for c in reversed(cls.__mro__) for s in c.__dict__.get("__slots__", ())) for cls in KINDS}
+
+# a field is a value shifted left by 2 with the tag in the low bits
+NODE, LITERAL, LIST, NONE = range(4)
+
+
+class Arena:
+    """
+    Parallel arrays of one tree, fields[firsts[i]:] holds the len(FIELDS)
+    fields of node i in slot order; a list field points at its length in
+    items, followed by its elements, encoded like fields
+    """
+    __slots__ = ("kinds", "firsts", "fields", "items", "literals")
+
+    def __init__(self, root=None):
+        self.kinds = array("B")
+        self.firsts = array("I")
+        self.fields = array("I")
+        self.items = array("I")
+        self.literals: List[object] = []
+        if root is not None:
+            self.flatten(root)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def kind(self, i: int) -> type:
+        return KINDS[self.kinds[i]]
+
+    def flatten(self, root):
+        """
+        stores the tree under root, nodes reachable twice are stored once
+        """
+        kinds, firsts, fields, items = self.kinds, self.firsts, self.fields, self.items
+        nodes = [root]
+        index: Dict[int, int] = {id(root): 0}
+        pool: Dict[Tuple[type, object], int] = {}
+        literals = self.literals
+
+        def encode(v) -> int:
+            t = type(v)
+            if v is None:
+                return NONE
+            if t in CODES:
+                i = index.get(id(v))
+                if i is None:
+                    i = index[id(v)] = len(nodes)
+                    nodes.append(v)
+                return i << 2
+            if t == list:
+                codes = [encode(e) for e in v]
+                start = len(items)
+                items.append(len(codes))
+                items.extend(codes)
+                return start << 2 | LIST
+            try:
+                # 0.0 and -0.0 are equal in Python, floats are told apart by how they print
+                key = (t, repr(v) if t == float else v)
+                i = pool.get(key)
+            except TypeError:   # unhashable, pooled by identity
+                key = (t, id(v))
+                i = pool.get(key)
+            if i is None:
+                i = pool[key] = len(literals)
+                literals.append(v)
+            return i << 2 | LITERAL
+
+        # nodes grows while it is walked, every node found is encoded in turn
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            cls = type(node)
+            kinds.append(CODES[cls])
+            firsts.append(len(fields))
+            fields.extend([encode(getattr(node, s, None)) for s in FIELDS[cls]])
+            i += 1
+
+    def program(self):
+        """
+        a new tree of the stored one, its root is node 0
+        """
+        nodes = [cls.__new__(cls) for cls in map(KINDS.__getitem__, self.kinds)]
+        fields, items, literals = self.fields, self.items, self.literals
+
+        def decode(code: int):
+            tag = code & 3
+            if tag == NODE:
+                return nodes[code >> 2]
+            if tag == LITERAL:
+                return literals[code >> 2]
+            if tag == LIST:
+                start = code >> 2
+                return [decode(c) for c in items[start + 1:start + 1 + items[start]]]
+            return None
+
+        for node, first in zip(nodes, self.firsts):
+            for n, s in enumerate(FIELDS[type(node)]):
+                setattr(node, s, decode(fields[first + n]))
+        return nodes[0]
+
+    def nbytes(self) -> int:
+        """
+        bytes held by the arrays, the literals not included
+        """
+        return sum(a.itemsize * len(a) for a in (self.kinds, self.firsts, self.fields, self.items))
@@ -9,14 +9,25 @@ Strategy Pattern  (sorting strategy)
 Interpreter Pattern
 design patterns - catalog of best practices in software design
 """
+from sys import intern
 from typing import Sequence, Union, Optional
 
+from output import Sink, BufferedSink
+
+OUTPUT = "print"    # the output sink's key in global_env, no function can be named print
+
+
+def indent(level: int) -> str:
+    return "\t" * level
+
 
 # Expr, Statements, FunctionDef,Pram
 class Expr:
     """
     Base class for expression
     """
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
@@ -43,27 +54,60 @@ class Expr:
         return left
 
 
+# the checker's specialized nodes skip the runtime checks it has proven unnecessary
+
+class BoolOr(Expr):
+    """
+    || of two bools
+    """
+    __slots__ = ()
+
+    def eval(self, global_env, env) -> bool:
+        left = self.left.eval(global_env, env)
+        return self.right.eval(global_env, env) or left
+
+
 class Statement:
     """
     Base class for statement
     """
-    def __init__(self, stmt, tabs=""):
+    __slots__ = ("left", "line")
+
+    def __init__(self, stmt):
         self.left = stmt
-        self.tabs = tabs
+        self.line = None    # the source line it starts on, set by the parser
 
     def __str__(self):
-        return "{}{}\n".format(self.tabs, str(self.left))
+        return self.format(0)
+
+    # the text of the statement at a nesting level, the indentation is
+    # worked out while printing rather than kept in every node
+    def format(self, level: int) -> str:
+        return "{}\n".format(str(self.left))
 
+    # statements return None, or a ReturnValue once a return statement ran
     def eval(self, global_env, env):
-        if self.left == ";":
-            return self.left
-        self.left.eval(global_env, env)
+        if self.left != ";":
+            self.left.eval(global_env, env)
+
+
+class ReturnValue:
+    """
+    Signal of an executed return statement, handed up through the enclosing
+    blocks, loops and ifs to the function call it ends
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
 
 
 class Param:
     """
     Parameter
     """
+    __slots__ = ("left", "right", "args")
+
     def __init__(self, left: str, right: Expr, args=None):
         self.left = left    # type
         self.right = right  # id
@@ -83,57 +127,48 @@ class Param:
             return "{0} {1}{2}".format((str(self.left)), str(self.right), params)
         return "{0} {1}".format(str(self.left), str(self.right))
 
-    def eval(self, global_env, env):
-        alist = env["arg"]
-        if len(alist) > 1:
-            tlist = [self.left]
-            ilist = [self.right]
-            for arg in self.args:
-                if type(arg) == str:
-                    tlist.append(arg)
-                else:
-                    ilist.append(arg)
-            for i in range(0, len(ilist)):
-                env[str(ilist[i])] = (tlist[i], alist[i])
-        else:
-            env[str(self.right)] = ("int", (alist[0]))
-
 
 class AssignmentStatement(Statement):
-    def __init__(self, left: Expr, right: Expr, tabs=""):
+    __slots__ = ("right", "slot", "type")
+
+    def __init__(self, left: Expr, right: Expr):
         self.left = left    # id
         self.right = right  # value
-        self.tabs = tabs
+        self.line = None
+        self.slot = None    # frame slot and declared type of the target, set by the resolver
+        self.type = None
 
-    def __str__(self):
-        return "{0}{1} = {2};\n".format(self.tabs, str(self.left), str(self.right))
+    def format(self, level: int) -> str:
+        return "{0}{1} = {2};\n".format(indent(level), str(self.left), str(self.right))
 
     def eval(self, global_env, env):
-        t = env[str(self.left)][0]
+        t = self.type
 
         if t == "int":
             if type(self.right) == IntLitExpr:
-                env.update({str(self.left): (t, int(str(self.right)))})
+                env[self.slot] = self.right.intlit
             elif type(self.right) == FloatLitExpr:
-                env.update({str(self.left): (t, int(float(str(self.right))))})
+                env[self.slot] = int(self.right.floatlit)
             elif type(self.right) == StrLitExpr or type(self.right) == BoolExpr:
                 raise SLUCTypeError("ERROR: Variable {} incorrect assignment type".format(self.left))
             else:
                 result = self.right.eval(global_env, env)
-                env.update({str(self.left): (t, int(result))})
+                env[self.slot] = int(result)
 
         if t == "float":
-            if type(self.right) == IntLitExpr or type(self.right) == FloatLitExpr:
-                env.update({str(self.left): (t, (float(str(self.right))))})
+            if type(self.right) == IntLitExpr:
+                env[self.slot] = float(self.right.intlit)
+            elif type(self.right) == FloatLitExpr:
+                env[self.slot] = self.right.floatlit
             elif type(self.right) == StrLitExpr or type(self.right) == BoolExpr:
                 raise SLUCTypeError("ERROR: Variable {} incorrect assignment type".format(self.left))
             else:
                 result = self.right.eval(global_env, env)
-                env.update({str(self.left): (t, float(result))})
+                env[self.slot] = float(result)
 
         if t == "bool":
             if type(self.right) == BoolExpr:
-                env.update({str(self.left): (t, self.right.eval(global_env, env))})
+                env[self.slot] = self.right.eval(global_env, env)
             elif type(self.right) == IntLitExpr \
                     or type(self.right) == FloatLitExpr \
                     or type(self.right) == StrLitExpr:
@@ -142,96 +177,146 @@ class AssignmentStatement(Statement):
                 result = self.right.eval(global_env, env)
 
                 if type(result) == bool:
-                    env.update({str(self.left): (t, result)})
+                    env[self.slot] = result
                 else:
                     raise SLUCTypeError("ERROR: Variable {} incorrect assignment type".format(self.left))
 
         if t == "str":
             if type(self.right) == StrLitExpr:
-                env.update({str(self.left): (t, str(self.right.eval(global_env, env)))})
+                env[self.slot] = str(self.right.eval(global_env, env))
             else:
                 raise SLUCTypeError("ERROR: Variable {} incorrect assignment type".format(self.left))
 
 
+class ConstAssignment(AssignmentStatement):
+    """
+    Assignment of a literal, converted to the target's type beforehand
+    """
+    __slots__ = ("value",)
+
+    def eval(self, global_env, env):
+        env[self.slot] = self.value
+
+
+class StoreAssignment(AssignmentStatement):
+    """
+    Assignment of a value that already has the target's type
+    """
+    __slots__ = ()
+
+    def eval(self, global_env, env):
+        env[self.slot] = self.right.eval(global_env, env)
+
+
+class IntAssignment(AssignmentStatement):
+    """
+    Assignment of a float or bool to an int
+    """
+    __slots__ = ()
+
+    def eval(self, global_env, env):
+        env[self.slot] = int(self.right.eval(global_env, env))
+
+
+class FloatAssignment(AssignmentStatement):
+    """
+    Assignment of an int or bool to a float
+    """
+    __slots__ = ()
+
+    def eval(self, global_env, env):
+        env[self.slot] = float(self.right.eval(global_env, env))
+
+
 class Declaration:
     """
     Declaration
     """
-    def __init__(self, left: str, right: Union[Expr, Statement], tabs=""):
+    __slots__ = ("left", "right", "line")
+
+    def __init__(self, left: str, right: Union[Expr, Statement]):
         self.left = left    # type
         self.right = right  # id | assignment
-        self.tabs = tabs
+        self.line = None    # the source line of one with an assignment, set by the parser
 
     def __str__(self):
-        if type(self.right) == AssignmentStatement:
-            return "{0}{1} {2}".format(self.tabs, self.left, str(self.right))
-        return "{0}{1} {2};\n".format(self.tabs, self.left, str(self.right))
+        return self.format(0)
+
+    def format(self, level: int) -> str:
+        if isinstance(self.right, AssignmentStatement):
+            return "{0}{1} {2}".format(indent(level), self.left, str(self.right))
+        return "{0}{1} {2};\n".format(indent(level), self.left, str(self.right))
 
+    # the variable's slot starts out None in every new frame
     def eval(self, global_env, env):
-        if type(self.right) == AssignmentStatement:
-            id = str(self.right)[0]
-            env[id] = (self.left, None)
+        if isinstance(self.right, AssignmentStatement):
             self.right.eval(global_env, env)
-        else:
-            env[str(self.right)] = (self.left, None)  # ID: (type, value)
 
 
 class FunctionDef:
+    __slots__ = ("type", "id", "params", "decls", "stmts", "nparams", "names", "types", "check_return")
+
     def __init__(self, ftype: str, id: Expr, params: Param, decls: Sequence[Declaration], stmts: Sequence[Statement]):
         self.type = ftype
         self.id = id
         self.params = params
         self.decls = decls
         self.stmts = stmts
+        self.nparams = 0    # frame layout, set by the resolver: the parameters come first
+        self.names = []     # slot -> variable name
+        self.types = []     # slot -> declared type
+        self.check_return = True    # cleared by the checker when every return has the declared type
 
     def __str__(self):
         declstr = ""
         stmtstr = ""
         for d in self.decls:
-            declstr += str(d)
+            declstr += d.format(1)
         for i in range(0, len(self.stmts)):
             if i == len(self.stmts) - 1:
-                stmtstr += str(self.stmts[i])
+                stmtstr += self.stmts[i].format(1)
             else:
-                stmtstr += str(self.stmts[i])
+                stmtstr += self.stmts[i].format(1)
         return "{0} {1} ({2}) {{\n{3}{4}}}".format(self.type, str(self.id), str(self.params), declstr, stmtstr)
 
-    def eval(self, global_env, env={}) -> Union[None, int, float, bool]:
-        # an environment maps identifiers to values
-        # parameters or local variables
-        # to evaluate a function you evaluate all of the statements
-        # within the environment
-        # id: (type, params, decls, stmts)
+    def eval(self, global_env, env=None) -> Union[None, int, float, bool]:
+        # a call's environment is a frame, a list holding the value of
+        # every parameter and local variable at the slot the resolver gave it
+        # env is the list of arguments, they fill the first slots
+        # global_env maps function names to (type, FunctionDef), and OUTPUT to the sink prints write to
 
         if str(self.id) in global_env:
-            self.params.eval(global_env, env)   # get the value of a param
+            env = env[:self.nparams] + [None] * (len(self.names) - self.nparams)
             for d in self.decls:
                 d.eval(global_env, env)
 
             for s in self.stmts:
-                if type(s) in {ReturnStatement, IfStatement}:
-                    if str(type(s.eval(global_env, env)).__name__) == self.type:
-                        return s.eval(global_env, env)
-                    else:
+                signal = s.eval(global_env, env)
+                if signal is not None:
+                    # the returned value must have the declared type
+                    if self.check_return and type(signal.value).__name__ != self.type:
                         raise SLUCTypeError("ERROR: type error")
-                else:
-                    s.eval(global_env, env)
+                    return signal.value
 
         elif str(self.id) == "main":
-            env = {}
+            env = [None] * len(self.names)
             for d in self.decls:
                 d.eval(global_env, env)
             for s in self.stmts:
-                s.eval(global_env, env)
+                if s.eval(global_env, env) is not None:
+                    break
 
         else:
-            global_env[str(self.id)] = (self.type, FunctionDef(self.type, self.id, self.params, self.decls, self.stmts))
+            global_env[str(self.id)] = (self.type, self)
         return None
 
 
 class Program:
-    def __init__(self, funcs: Sequence[FunctionDef]):
+    __slots__ = ("funcs", "symbols")
+
+    def __init__(self, funcs: Sequence[FunctionDef], symbols=None):
         self.funcs = funcs
+        self.symbols = symbols  # SymbolTable from the parser
 
     def __str__(self):
         alist = list(map(str, self.funcs))
@@ -240,14 +325,17 @@ class Program:
             strs += f + "\n\n"
         return "{}".format(strs)
 
-    def eval(self):
-        env_func = {}
-        for func in self.funcs:
-            func.eval(env_func)
+    def eval(self, out: Sink = None):
+        env_func = {OUTPUT: BufferedSink() if out is None else out}
+        try:
+            for func in self.funcs:
+                func.eval(env_func)
+        finally:
+            env_func[OUTPUT].flush()
 
 
 class BinaryExpr(Expr):
-    pass
+    __slots__ = ()
 
 
 class SLUCTypeError(Exception):
@@ -259,7 +347,18 @@ class SLUCTypeError(Exception):
         return self.message
 
 
+class SLUCRecursionError(SLUCTypeError):
+    """
+    Calls nested deeper than the engine's recursion limit
+    """
+    def __init__(self, limit: int):
+        SLUCTypeError.__init__(self, "ERROR: recursion limit of {} calls exceeded".format(limit))
+        self.limit = limit
+
+
 class AddExpr(BinaryExpr):
+    __slots__ = ()
+
     def __init__(self, left: Expr, right: Expr):
         self.left = left
         self.right = right
@@ -284,7 +383,31 @@ class AddExpr(BinaryExpr):
         return left + right
 
 
+class IntAdd(AddExpr):
+    """
+    + of two ints
+    """
+    __slots__ = ()
+
+    def eval(self, global_env, env) -> int:
+        left = self.left.eval(global_env, env)
+        return left + self.right.eval(global_env, env)
+
+
+class FloatAdd(AddExpr):
+    """
+    + of two numbers, at least one of them a float
+    """
+    __slots__ = ()
+
+    def eval(self, global_env, env) -> float:
+        left = self.left.eval(global_env, env)
+        return left + self.right.eval(global_env, env)
+
+
 class MultExpr(BinaryExpr):
+    __slots__ = ("op",)
+
     def __init__(self, left: Expr, right: Expr, op: str):
         self.left = left
         self.right = right
@@ -308,6 +431,8 @@ class ExpoExpr(BinaryExpr):
     """
     Represents exponential operation
     """
+    __slots__ = ()
+
     def __init__(self, left: Expr, right: Expr):
         self.left = left
         self.right = right
@@ -316,24 +441,13 @@ class ExpoExpr(BinaryExpr):
         return "({} ** {})".format(str(self.left), str(self.right))
 
     def eval(self, global_env, env) -> Union[int, float]:
-        # TODO environment
-        # If we checked type when running eval we have a "dynamically typed"
-        # language
-        if type(self.left) == IDExpr:
-            left = self.left.eval(global_env, env)
-        else:
-            left = self.left.eval()
-        if type(self.right) == IDExpr:
-            right = self.right.eval(global_env, env)
-        elif type(self.right) == IntLitExpr:
-
-            right = self.right.eval()
-        else:
-            right = self.right.eval(global_env, env)
-        return left ** right
+        left = self.left.eval(global_env, env)
+        return left ** self.right.eval(global_env, env)
 
 
 class ConjExpr(BinaryExpr):
+    __slots__ = ()
+
     def __init__(self, left: Expr, right: Expr):
         self.left = left
         self.right = right
@@ -359,7 +473,20 @@ class ConjExpr(BinaryExpr):
         return left
 
 
+class BoolAnd(ConjExpr):
+    """
+    && of two bools
+    """
+    __slots__ = ()
+
+    def eval(self, global_env, env) -> bool:
+        left = self.left.eval(global_env, env)
+        return self.right.eval(global_env, env) and left
+
+
 class EqExpr(BinaryExpr):
+    __slots__ = ("Eqlop",)
+
     def __init__(self, left: Expr, right: Expr, Eqlop):
         self.left = left
         self.right = right
@@ -376,6 +503,8 @@ class EqExpr(BinaryExpr):
 
 
 class RelatExpr(BinaryExpr):
+    __slots__ = ("relop",)
+
     def __init__(self, left: Expr, right: Expr, relop):
         self.left = left
         self.right = right
@@ -399,57 +528,69 @@ class RelatExpr(BinaryExpr):
 
 
 class PrintStatement(Statement):
-    def __init__(self, prtarg: Expr, prtargs: Sequence[Expr], tabs=""):
+    __slots__ = ("prtarg", "prtargs")
+
+    def __init__(self, prtarg: Expr, prtargs: Sequence[Expr]):
         self.prtarg = prtarg
         self.prtargs = prtargs
-        self.tabs = tabs
+        self.line = None
 
-    def __str__(self):
+    def format(self, level: int) -> str:
         if self.prtargs:
             args = ""
             for arg in self.prtargs:
                 args += ", " + str(arg)
-            return "{}print({} {})".format(self.tabs, str(self.prtarg), args)
-        return "{}print({})".format(self.tabs, str(self.prtarg))
+            return "{}print({} {})".format(indent(level), str(self.prtarg), args)
+        return "{}print({})".format(indent(level), str(self.prtarg))
 
     def eval(self, global_env, env):
+        write = global_env[OUTPUT].write
         if self.prtargs:
-            print(self.prtarg.eval(global_env, env), end=" ")
+            write(str(self.prtarg.eval(global_env, env)) + " ")
             for i in range(0, len(self.prtargs)):
                 if i == len(self.prtargs) - 1:
-                    print(self.prtargs[i].eval(global_env, env))
+                    write(str(self.prtargs[i].eval(global_env, env)) + "\n")
                 else:
-                    print(self.prtargs[i].eval(global_env, env), end=" ")
+                    write(str(self.prtargs[i].eval(global_env, env)) + " ")
         else:
-            print(self.prtarg.eval(global_env, env))
+            write(str(self.prtarg.eval(global_env, env)) + "\n")
 
 
 class WhileStatement(Statement):
-    def __init__(self, left: Expr, right: Statement, tabs=""):
+    __slots__ = ("right",)
+
+    def __init__(self, left: Expr, right: Statement):
         self.left = left
         self.right = right
-        self.tabs = tabs
+        self.line = None
 
-    def __str__(self):
-        return "{}while {} {}".format(self.tabs, str(self.left), str(self.right))
+    # the loop and its body are one level deeper than the statements around it
+    def format(self, level: int) -> str:
+        return "{}while {} {}".format(indent(level + 1), str(self.left), self.right.format(level + 1))
 
     def eval(self, global_env, env):
         while self.left.eval(global_env, env):
-            self.right.eval(global_env, env)
+            signal = self.right.eval(global_env, env)
+            if signal is not None:
+                return signal
 
 
 class IfStatement(Statement):
-    def __init__(self, expr: Expr, stmt: Statement, elsestmt: Statement = None, tabs=""):
+    __slots__ = ("expr", "stmt", "elsestmt")
+
+    def __init__(self, expr: Expr, stmt: Statement, elsestmt: Statement = None):
         self.expr = expr
         self.stmt = stmt
         self.elsestmt = elsestmt
-        self.tabs = tabs
+        self.line = None
 
-    def __str__(self):
+    # like a loop, one level deeper along with its branches
+    def format(self, level: int) -> str:
         if self.elsestmt:
-            return "{0}if ({1})\n\t{2} else \n\t{3}".format(self.tabs, str(self.expr),
-                                                            str(self.stmt), str(self.elsestmt))
-        return "{0}if({1})\n\t{2}".format(self.tabs, str(self.expr), str(self.stmt))
+            return "{0}if ({1})\n\t{2} else \n\t{3}".format(indent(level + 1), str(self.expr),
+                                                            self.stmt.format(level + 1),
+                                                            self.elsestmt.format(level + 1))
+        return "{0}if({1})\n\t{2}".format(indent(level + 1), str(self.expr), self.stmt.format(level + 1))
 
     def eval(self, global_env, env):
         if self.expr.eval(global_env, env):
@@ -460,39 +601,50 @@ class IfStatement(Statement):
 
 
 class BlockStatement(Statement):
-    def __init__(self, stmt: Statement, args: Sequence[Statement], tabs=""):
+    __slots__ = ("right",)
+
+    def __init__(self, stmt: Statement, args: Sequence[Statement]):
         self.left = stmt
         self.right = args
-        self.tabs = tabs
+        self.line = None
 
-    def __str__(self):
+    def format(self, level: int) -> str:
+        tabs = indent(level)
         if self.right:
             stmtargs = ""
             for arg in self.right:
-                stmtargs += self.tabs + str(arg) + "\n"
-            return "{2}{{\n{0} {1}{2}}}\n".format(str(self.left), stmtargs, self.tabs)
+                stmtargs += tabs + arg.format(level) + "\n"
+            return "{2}{{\n{0} {1}{2}}}\n".format(self.left.format(level), stmtargs, tabs)
 
-        return "{1}{{\n{0}{1}}}\n".format(str(self.left), self.tabs)
+        return "{1}{{\n{0}{1}}}\n".format(self.left.format(level), tabs)
 
     def eval(self, global_env, env):
-        self.left.eval(global_env, env)
+        signal = self.left.eval(global_env, env)
+        if signal is not None:
+            return signal
         for argument in self.right:
-            argument.eval(global_env, env)
+            signal = argument.eval(global_env, env)
+            if signal is not None:
+                return signal
 
 
 class ReturnStatement(Statement):
-    def __init__(self, expr: Expr, tabs=""):
+    __slots__ = ()
+
+    def __init__(self, expr: Expr):
         self.left = expr
-        self.tabs = tabs
+        self.line = None
 
-    def __str__(self):
-        return "{}return {};\n".format(self.tabs, str(self.left))
+    def format(self, level: int) -> str:
+        return "{}return {};\n".format(indent(level), str(self.left))
 
-    def eval(self, global_env, env):
-        return self.left.eval(global_env, env)
+    def eval(self, global_env, env) -> ReturnValue:
+        return ReturnValue(self.left.eval(global_env, env))
 
 
 class UnaryOp(Expr):
+    __slots__ = ("tree", "op")
+
     def __init__(self, tree: Expr, op: str):
         self.tree = tree
         self.op = op
@@ -508,18 +660,21 @@ class UnaryOp(Expr):
 
 
 class IDExpr(Expr):
+    __slots__ = ("id", "slot")
 
     def __init__(self, id: str):
-        self.id = id
+        self.id = intern(id)    # a name is used many times, every use shares one string
+        self.slot = None    # frame slot, set by the resolver
 
     def __str__(self):
         return self.id
 
     def eval(self, global_env, env):  # a + 7
-        return env[self.id][1]
+        return env[self.slot]
 
 
 class IntLitExpr(Expr):
+    __slots__ = ("intlit",)
 
     def __init__(self, intlit: str):
         self.intlit = int(intlit)
@@ -532,6 +687,7 @@ class IntLitExpr(Expr):
 
 
 class StrLitExpr(Expr):
+    __slots__ = ("strlit",)
 
     def __init__(self, strlit: str):
         self.strlit = strlit
@@ -544,6 +700,8 @@ class StrLitExpr(Expr):
 
 
 class FloatLitExpr(Expr):
+    __slots__ = ("floatlit",)
+
     def __init__(self, floatlit: str):
         self.floatlit = float(floatlit)
 
@@ -555,6 +713,8 @@ class FloatLitExpr(Expr):
 
 
 class BoolExpr(Expr):
+    __slots__ = ("bool",)
+
     def __init__(self, bool: str):
         self.bool = bool
 
@@ -569,6 +729,8 @@ class BoolExpr(Expr):
 
 
 class FuncCExpr(Expr):
+    __slots__ = ("f_id",)
+
     def __init__(self, f_id: str, left: Expr, right: Sequence[Expr]):
         self.f_id = f_id
         self.left = left
@@ -585,22 +747,41 @@ class FuncCExpr(Expr):
             return "{}({}{})".format(self.f_id, str(self.left), args)
         return "{}({})".format(self.f_id, str(self.left))
 
+    # number of arguments, f() has a single empty argument
+    def arity(self) -> int:
+        if not self.right and type(self.left.farg) == StrLitExpr and not self.left.farg.strlit:
+            return 0
+        return 1 + len(self.right)
+
     def eval(self, global_env, env) -> Union[int, float, bool]:
 
-        if self.right:
-            args = [self.left.eval(global_env, env)]
-            for a in self.right:
-                args.append(a.eval(global_env, env))
-            return global_env[str(self.f_id)][1].eval(global_env, {"arg": args})
+        args = [self.left.eval(global_env, env)]
+        for a in self.right:
+            args.append(a.eval(global_env, env))
+        return global_env[self.f_id][1].eval(global_env, args)
 
-        else:
-            return global_env[str(self.f_id)][1].eval(global_env, {"arg": [self.left.eval(global_env, env)]})
+
+class MemoCall(FuncCExpr):
+    """
+    Call of a pure function, answered from the callee's memo
+    when it was already called with the same arguments
+    """
+    __slots__ = ("memo",)
+
+    def eval(self, global_env, env) -> Union[int, float, bool]:
+        args = [self.left.eval(global_env, env)]
+        for a in self.right:
+            args.append(a.eval(global_env, env))
+        f = global_env[self.f_id][1]
+        return self.memo.call(lambda args: f.eval(global_env, args), args)
 
 
 class Farg(Expr):
     """
     Represents function arguments
     """
+    __slots__ = ("farg",)
+
     def __init__(self, arg: Expr):
         self.farg = arg
 
@@ -615,10 +796,24 @@ if __name__ == '__main__':
     """
     Represent a + b + c * d
     ((a + b) + (c * d))
+    the parser resolves every name to its slot in the frame, so the tree is
+    built by it rather than by hand
     """
-    globalenv = {"b": ("int", 2)}
-    env = {"a": ("int", 1)}
-    expr = AddExpr(IDExpr("a"), IntLitExpr("2"))
-    assignment = AssignmentStatement(IDExpr("c"), IntLitExpr("3"))
-    print(assignment.eval({}, {"c": ("int", None)}))
-    print(expr.eval({}, env))
+    from parser_sluc import Parser
+    from checker import check
+
+    source = b"""int main() {
+\tint a;
+\tint b;
+\tint c;
+\tint d;
+\ta = 1;
+\tb = 2;
+\tc = 3;
+\td = 4;
+\tprint(a + b + c * d);
+}
+"""
+    program = check(Parser.from_bytes(source).program())
+    print(program)
+    program.eval()
@@ -0,0 +1,420 @@
+"""
+Batch front end
+Lexes or parses many SLU-C files, and line-aligned pieces of very large
+files, across a process pool and merges the results back in order
+Runs the programs of a manifest across the pool as well, each worker keeps
+its imports and caches warm between programs and captures every program's
+output on its own
+"""
+import argparse
+import io
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from array import array
+
+from lexer import Lexer, Token, TokenStream, SLUCIOError
+from parser_sluc import Parser, SLUCSyntaxError, call_error
+from ast import Program
+from symbols import SymbolTable
+from ast import SLUCTypeError
+from output import CaptureSink
+import interpreter
+
+CHUNK_SIZE = 1 << 20    # files bigger than this many bytes are split into chunks
+PARTS_PER_WORKER = 4    # how many parse parts a large file is split into per worker
+
+
+class Result(NamedTuple):
+    fn: str
+    value: object               # TokenStream or Program, None on error
+    error: Optional[str] = None
+    errors: Sequence[str] = ()  # every error, when parsing with recovery
+
+
+class RunResult(NamedTuple):
+    index: int                  # position in the manifest
+    fn: str
+    output: str                 # what the program printed, up to an error
+    error: Optional[str] = None
+    seconds: float = 0.0        # load, check and run
+    report: str = ""            # memo stats and profile
+
+
+def read_range(fn: str, start: int, end: int) -> bytes:
+    with open(fn, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def line_chunks(fn: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    byte ranges of about chunk_size that always end after a newline
+    """
+    size = os.path.getsize(fn)
+    if size == 0:
+        return [(0, 0)]
+    chunks = []
+    with open(fn, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            nl = mm.find(b"\n", min(start + chunk_size, size) - 1)
+            end = size if nl < 0 else nl + 1
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+# ---- worker side: everything below runs in the pool and returns picklable values
+
+def lex_chunk(fn: str, start: int, end: int):
+    """
+    lex one line-aligned chunk, offsets and lines are relative to the chunk
+    """
+    data = read_range(fn, start, end)
+    s = Lexer.from_bytes(data).tokenize()
+    return s.kinds, s.lines, s.starts, s.ends, data.count(b"\n")
+
+
+def lex_file(fn: str):
+    try:
+        return Lexer(fn).tokenize(), None, []
+    except SLUCIOError as e:
+        return None, str(e), [str(e)]
+
+
+def parse_file(fn: str, recover: bool = False):
+    """
+    parse a whole file, with recover the partial program comes back along with every error
+    """
+    try:
+        p = Parser(fn, recover)
+        program = p.program()
+    except (SLUCIOError, SLUCSyntaxError) as e:
+        return None, str(e), [str(e)]
+    errors = [d.message for d in p.errors]
+    return program, errors[0] if errors else None, errors
+
+
+def parse_part(fn: str, start: int, end: int, line: int, recover: bool = False):
+    """
+    parse the function definitions in a byte range, the cross-function checks are left to the caller
+    """
+    p = Parser.from_bytes(read_range(fn, start, end), line, recover)
+    try:
+        return p.functiondefs(), p.symbols, [d.message for d in p.errors]
+    except SLUCSyntaxError as e:
+        return None, None, [str(e)]
+
+
+def entry_argv(entry: Dict[str, object], defaults: argparse.Namespace) -> List[str]:
+    """
+    the interpreter.py command line of a manifest entry: a key is an option
+    under its argument name, a switch is given as true or false, null
+    leaves the default; raises ValueError for a key or switch it can't give
+    """
+    argv = []
+    for k, v in entry.items():
+        if k == "file" or v is None:
+            continue
+        if not hasattr(defaults, k):
+            raise ValueError("unknown option {}".format(k))
+        option = "--" + k.replace("_", "-")
+        if isinstance(getattr(defaults, k), bool):
+            if not isinstance(v, bool):
+                raise ValueError("option {} is true or false, not {}".format(k, json.dumps(v)))
+            if v:
+                argv.append(option)
+        else:
+            argv.extend([option, str(v)])
+    return argv + ["--", str(entry["file"])]
+
+
+def run_file(index: int, entry: Dict[str, object]) -> RunResult:
+    """
+    run one manifest entry, its "file" with the other keys as the options of
+    interpreter.py under their argument names, like "engine" or "max_steps";
+    they are parsed as the command line would be, errors are the entry's result
+    """
+    fn = str(entry.get("file"))
+    if "file" not in entry:
+        return RunResult(index, fn, "", "ERROR: no file")
+    argp = interpreter.arguments()
+
+    def error(message):
+        raise ValueError(message)
+
+    argp.error = error
+    try:
+        args = argp.parse_args(entry_argv(entry, argp.parse_args([])))
+    except ValueError as e:
+        return RunResult(index, fn, "", "ERROR: {}".format(e))
+    problem = interpreter.validate(args)
+    if problem:
+        return RunResult(index, fn, "", "ERROR: " + problem)
+    out = CaptureSink()
+    report = io.StringIO()
+    error = None
+    t = time.perf_counter()
+    try:
+        interpreter.execute(interpreter.load(args), args, out, report)
+    except (SLUCIOError, SLUCSyntaxError, SLUCTypeError) as e:
+        error = str(e)
+    except Exception as e:
+        # a worker outlives the programs it runs, anything they raise is their result
+        error = "{}: {}".format(type(e).__name__, e)
+    return RunResult(index, fn, out.getvalue(), error, time.perf_counter() - t, report.getvalue())
+
+
+def run_entry(job: Tuple[int, Dict[str, object]]) -> RunResult:
+    return run_file(*job)
+
+
+# ---- merging
+
+def merge_chunks(fn: str, chunks: Sequence[Tuple[int, int]], results) -> TokenStream:
+    """
+    concatenate chunk token streams, shifting offsets by the chunk start and lines by the lines before it
+    """
+    if len(chunks) == 1 and chunks[0] == (0, 0):
+        return TokenStream(b"")
+    f = open(fn, "rb")
+    stream = TokenStream(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    f.close()
+    line = 0
+    for (start, _), (kinds, lines, starts, ends, newlines) in zip(chunks, results):
+        stream.kinds.extend(kinds)
+        stream.lines.extend(array(stream.lines.typecode, (n + line for n in lines)))
+        stream.starts.extend(array(stream.starts.typecode, (n + start for n in starts)))
+        stream.ends.extend(array(stream.ends.typecode, (n + start for n in ends)))
+        line += newlines
+    return stream
+
+
+def function_ends(stream: TokenStream) -> List[int]:
+    """
+    index of the closing brace of every top level function
+    """
+    left, right = Token.kind_codes["left-brace"], Token.kind_codes["right-brace"]
+    braces = re.compile(b"[" + re.escape(bytes([left, right])) + b"]")  # [{}] over the kind codes
+    ends = []
+    depth = 0
+    for m in braces.finditer(stream.kinds.tobytes()):
+        if m.group()[0] == left:
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                ends.append(m.start())
+    n = len(stream)
+    if not ends or ends[-1] != n - 1:
+        ends.append(n - 1)  # trailing tokens go with the last part, the parser reports them
+    return ends
+
+
+def function_parts(stream: TokenStream, ends: List[int], parts: int) -> List[Tuple[int, int]]:
+    """
+    split a token stream into about parts ranges of whole top level functions
+    returns (first token, last token) index pairs
+    """
+    n = len(stream)
+    target = max(1, n // parts)
+    ranges = []
+    first = 0
+    for e in ends:
+        if e - first + 1 >= target or e == ends[-1]:
+            ranges.append((first, e))
+            first = e + 1
+    return ranges
+
+
+def merge_symbols(parts) -> Tuple[SymbolTable, List[str]]:
+    """
+    one symbol table for the merged parts, with the checks Parser.program does across functions
+    returns the table and every error found
+    """
+    symbols = SymbolTable()
+    errors = []
+    for _, part, _ in parts:
+        for sig in symbols.absorb(part):
+            errors.append("ERROR: ID {} duplicated on line {}".format(sig.name, sig.line))
+    errors.extend(call_error(symbols, call) for call in symbols.unresolved())
+    return symbols, errors
+
+
+# ---- front ends
+
+def lex_files(files: Sequence[str], workers: int = None, chunk_size: int = CHUNK_SIZE) -> List[Result]:
+    """
+    lex every file into a TokenStream, large files in parallel chunks
+    """
+    with ProcessPoolExecutor(workers) as pool:
+        jobs = []
+        for fn in files:
+            if os.path.isfile(fn) and os.path.getsize(fn) > chunk_size:
+                chunks = line_chunks(fn, chunk_size)
+                jobs.append((chunks, [pool.submit(lex_chunk, fn, s, e) for s, e in chunks]))
+            else:
+                jobs.append((None, pool.submit(lex_file, fn)))
+        results = []
+        for fn, (chunks, job) in zip(files, jobs):
+            if chunks is None:
+                results.append(Result(fn, *job.result()))
+            else:
+                results.append(Result(fn, merge_chunks(fn, chunks, [j.result() for j in job])))
+        return results
+
+
+def parse_files(files: Sequence[str], workers: int = None, chunk_size: int = CHUNK_SIZE,
+                recover: bool = False) -> List[Result]:
+    """
+    parse every file into a Program, large files as parallel parts of whole functions
+    with recover a file with syntax errors still gives its partial Program and every error
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        jobs = []
+        # submit every lex chunk before waiting on any of them
+        for fn in files:
+            if os.path.isfile(fn) and os.path.getsize(fn) > chunk_size:
+                chunks = line_chunks(fn, chunk_size)
+                jobs.append((chunks, [pool.submit(lex_chunk, fn, s, e) for s, e in chunks]))
+            else:
+                jobs.append((None, pool.submit(parse_file, fn, recover)))
+
+        # then split each large file at function boundaries and parse the parts
+        for i, (fn, (chunks, job)) in enumerate(zip(files, jobs)):
+            if chunks is None:
+                continue
+            stream = merge_chunks(fn, chunks, [j.result() for j in job])
+            if not len(stream):
+                jobs[i] = (None, pool.submit(parse_file, fn, recover))
+                continue
+            ends = function_ends(stream)
+            parts = []
+            for first, last in function_parts(stream, ends, workers * PARTS_PER_WORKER):
+                start, end = stream.starts[first], stream.ends[last]
+                parts.append(pool.submit(parse_part, fn, start, end, stream.lines[first], recover))
+            jobs[i] = (chunks, parts)
+
+        results = []
+        for fn, (chunks, job) in zip(files, jobs):
+            if chunks is None:
+                results.append(Result(fn, *job.result()))
+                continue
+            parts = [j.result() for j in job]
+            errors = [e for _, _, part_errors in parts for e in part_errors]
+            if recover or not errors:
+                symbols, symbol_errors = merge_symbols(parts)
+                errors.extend(symbol_errors)
+            if errors and not recover:
+                results.append(Result(fn, None, errors[0], errors[:1]))
+            else:
+                program = Program([f for funcs, _, _ in parts for f in funcs], symbols)
+                results.append(Result(fn, program, errors[0] if errors else None, errors))
+        return results
+
+
+def read_manifest(fn: str) -> List[Dict[str, object]]:
+    """
+    the entries of a manifest, one JSON object per line, blank lines are skipped
+    """
+    entries = []
+    with open(fn) as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                raise SLUCIOError("ERROR: manifest line {}: {}".format(n, e))
+            if not isinstance(entry, dict):
+                raise SLUCIOError("ERROR: manifest line {} is not an object".format(n))
+            entries.append(entry)
+    return entries
+
+
+def run_files(entries: Sequence[Dict[str, object]], workers: int = None,
+              ordered: bool = True) -> Iterator[RunResult]:
+    """
+    run every manifest entry across the pool, the results stream back
+    in manifest order, or as the programs finish when not ordered
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = list(enumerate(entries))
+    with ProcessPoolExecutor(workers) as pool:
+        if ordered:
+            # small programs go out a few at a time, keeping the pipes busy
+            chunk = max(1, min(16, len(jobs) // (workers * PARTS_PER_WORKER)))
+            yield from pool.map(run_entry, jobs, chunksize=chunk)
+        else:
+            for job in as_completed([pool.submit(run_file, i, e) for i, e in jobs]):
+                yield job.result()
+
+
+def write_results(results: Iterable[RunResult], stream) -> Tuple[int, int]:
+    """
+    one JSON object per result, written as it arrives
+    returns the number of results and of errors
+    """
+    count = errors = 0
+    for r in results:
+        count += 1
+        errors += r.error is not None
+        stream.write(json.dumps(r._asdict()) + "\n")
+        stream.flush()
+    return count, errors
+
+
+if __name__ == '__main__':
+    argp = argparse.ArgumentParser(description="lex, parse or run SLU-C files in parallel")
+    argp.add_argument("files", nargs="*")
+    argp.add_argument("--run", metavar="MANIFEST",
+                      help="run the programs of a manifest, one JSON object per line with a \"file\" and"
+                           " interpreter.py options by argument name, the results are JSON lines on stdout")
+    argp.add_argument("--unordered", action="store_true", help="with --run, write the results as the programs finish")
+    argp.add_argument("--lex", action="store_true", help="only lex the files")
+    argp.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes")
+    argp.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="split files bigger than this many bytes")
+    argp.add_argument("--all-errors", action="store_true", help="recover from syntax errors and report all of them")
+    args = argp.parse_args()
+    if bool(args.run) == bool(args.files):
+        argp.error("give either files or --run MANIFEST")
+
+    t = time.perf_counter()
+    if args.run:
+        try:
+            entries = read_manifest(args.run)
+        except SLUCIOError as e:
+            print(str(e))
+            sys.exit(1)
+        except OSError as e:
+            print("ERROR: {}".format(e))
+            sys.exit(1)
+        count, errors = write_results(run_files(entries, args.workers, not args.unordered), sys.stdout)
+        print("{} programs, {} errors in {:.3f}s".format(count, errors, time.perf_counter() - t), file=sys.stderr)
+        sys.exit(1 if errors else 0)
+    if args.lex:
+        results = lex_files(args.files, args.workers, args.chunk_size)
+    else:
+        results = parse_files(args.files, args.workers, args.chunk_size, args.all_errors)
+    elapsed = time.perf_counter() - t
+
+    errors = 0
+    for r in results:
+        for message in r.errors:
+            errors += 1
+            print("{}: {}".format(r.fn, message))
+    if args.lex:
+        count = sum(len(r.value) for r in results if r.value is not None)
+        print("{} files, {} tokens, {} errors in {:.3f}s".format(len(results), count, errors, elapsed))
+    else:
+        count = sum(len(r.value.funcs) for r in results if r.value is not None)
+        print("{} files, {} functions, {} errors in {:.3f}s".format(len(results), count, errors, elapsed))
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,5 @@
+"""
+SLU-C front end benchmarks
+Run the suite with  python -m bench  from the repository root,
+or emit a generated program with  python -m bench.generator
+"""
@@ -0,0 +1,97 @@
+"""
+Benchmark suite runner
+Generates one program per case, times every phase and writes the results
+as JSON; with --compare it fails when a phase got slower than a baseline
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+
+from bench.generator import PRESETS, generate
+from bench.harness import bench_arena, bench_lex, bench_parse, bench_run, bench_run_closure, bench_run_memo, \
+    bench_run_optimized, bench_run_python, bench_run_vm
+
+PHASES = {
+    "lex": bench_lex,
+    "parse": bench_parse,
+    "arena": bench_arena,
+    "run": bench_run,
+    "run-O": bench_run_optimized,
+    "run-vm": bench_run_vm,
+    "run-closure": bench_run_closure,
+    "run-python": bench_run_python,
+    "run-memo": bench_run_memo,
+}
+
+
+def run_case(name: str, seed: int, repeat: int, phases, workdir: str) -> dict:
+    shape = PRESETS[name]
+    source = generate(shape, seed)
+    fn = os.path.join(workdir, name + ".c")
+    with open(fn, "w") as f:
+        f.write(source)
+    case = {"shape": shape._asdict(), "bytes": len(source), "lines": source.count("\n")}
+    for phase in phases:
+        case[phase] = PHASES[phase](fn, repeat)
+    return case
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    phases whose throughput dropped more than tolerance below the baseline,
+    the run phases have no tokens and compare their time instead
+    """
+    found = []
+    for name, case in results["cases"].items():
+        for phase, stats in case.items():
+            old = baseline.get("cases", {}).get(name, {}).get(phase)
+            if not isinstance(stats, dict) or not isinstance(old, dict):
+                continue
+            if "tokens_per_sec" in old:
+                if stats["tokens_per_sec"] < old["tokens_per_sec"] * (1 - tolerance):
+                    found.append("{} {}: {:.0f} tokens/s, baseline {:.0f}".format(
+                        name, phase, stats["tokens_per_sec"], old["tokens_per_sec"]))
+            elif "seconds" in old and stats["seconds"] > old["seconds"] / (1 - tolerance):
+                found.append("{} {}: {:.4f} s, baseline {:.4f}".format(name, phase, stats["seconds"], old["seconds"]))
+    return found
+
+
+if __name__ == '__main__':
+    argp = argparse.ArgumentParser(prog="python -m bench", description="benchmark the SLU-C front end and engines")
+    argp.add_argument("--case", action="append", choices=sorted(PRESETS), help="case to run, default all")
+    argp.add_argument("--phase", action="append", choices=sorted(PHASES), help="phase to run, default all")
+    argp.add_argument("--repeat", type=int, default=3)
+    argp.add_argument("--seed", type=int, default=0)
+    argp.add_argument("--out", help="write the JSON results to this file instead of stdout")
+    argp.add_argument("--compare", help="baseline JSON results to compare against")
+    argp.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown against the baseline")
+    args = argp.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.case or sorted(PRESETS):
+            print("running", name, file=sys.stderr)
+            results["cases"][name] = run_case(name, args.seed, args.repeat, args.phase or list(PHASES), workdir)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print("REGRESSION", line, file=sys.stderr)
+        sys.exit(1 if found else 0)
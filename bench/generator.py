@@ -0,0 +1,169 @@
+"""
+Seeded generator of valid SLU-C programs for benchmarking the front end
+The same seed and shape always give the same program
+"""
+import argparse
+import random
+import sys
+from typing import List, NamedTuple
+
+
+class Shape(NamedTuple):
+    functions: int = 10     # functions besides main
+    params: int = 2         # int parameters per function
+    locals: int = 4         # int locals per function
+    stmts: int = 10         # statements per function body
+    block_depth: int = 2    # nesting of if / while blocks
+    expr_depth: int = 3     # depth of generated expression trees
+    loop_iters: int = 5     # iterations of every generated while loop
+    prints: bool = True     # emit print statements
+
+
+# the first LEAVES functions make no calls, the others only call them,
+# so running a program costs about the same however many functions it has
+LEAVES = 5
+
+# shapes used by the benchmark suite
+PRESETS = {
+    "small": Shape(),
+    "many-functions": Shape(functions=1000, stmts=6),
+    "long-blocks": Shape(functions=10, stmts=400, block_depth=1),
+    "deep-expressions": Shape(functions=25, stmts=8, expr_depth=12),
+}
+
+
+class ProgramGenerator:
+    """
+    Emits SLU-C source text
+    Generated programs parse, and they also run: loops terminate, functions only
+    call functions defined before them and values stay small
+    """
+    def __init__(self, shape: Shape = Shape(), seed: int = 0):
+        self.shape = shape
+        self.rand = random.Random(seed)
+        self.lines: List[str] = []
+        self.vars: List[str] = []
+        self.funcs: List[str] = []     # functions already emitted
+        self.leaves: List[str] = []    # functions without calls, the only ones that get called
+
+    def program(self) -> str:
+        for i in range(self.shape.functions):
+            self.functiondef("f{}".format(i))
+        self.main()
+        return "\n".join(self.lines) + "\n"
+
+    def emit(self, level: int, text: str):
+        self.lines.append("    " * level + text)
+
+    @property
+    def calls(self) -> bool:
+        return len(self.leaves) == LEAVES
+
+    def functiondef(self, name: str):
+        shape = self.shape
+        params = ["p{}".format(i) for i in range(max(1, shape.params))]
+        self.vars = params + ["v{}".format(i) for i in range(shape.locals)]
+        counters = ["i{}".format(i) for i in range(shape.block_depth)]
+        self.emit(0, "int {}({}) {{".format(name, ", ".join("int " + p for p in params)))
+        for v in self.vars[len(params):] + counters:
+            self.emit(1, "int {};".format(v))
+        for v in self.vars[len(params):]:
+            self.emit(1, "{} = {};".format(v, self.rand.randint(0, 9)))
+        self.statements(1, shape.stmts)
+        self.emit(1, "return {};".format(self.vars[-1]))
+        self.emit(0, "}")
+        self.lines.append("")
+        if len(self.leaves) < LEAVES:
+            self.leaves.append(name)
+        self.funcs.append(name)
+
+    def main(self):
+        self.vars = ["v{}".format(i) for i in range(max(1, self.shape.locals))]
+        self.emit(0, "int main() {")
+        for v in self.vars:
+            self.emit(1, "int {};".format(v))
+        for v in self.vars:
+            self.emit(1, "{} = {};".format(v, self.rand.randint(0, 9)))
+        for f in self.funcs[-10:]:
+            self.emit(1, "{} = {};".format(self.rand.choice(self.vars), self.call(f)))
+        self.emit(1, 'print("done", {});'.format(self.vars[0]))
+        self.emit(0, "}")
+
+    def statements(self, level: int, count: int):
+        for _ in range(count):
+            self.statement(level)
+
+    def statement(self, level: int):
+        depth = level - 1
+        roll = self.rand.random()
+        if depth < self.shape.block_depth and roll < 0.15:
+            self.ifstatement(level)
+        elif depth < self.shape.block_depth and roll < 0.25:
+            self.whilestatement(level, "i{}".format(depth))
+        elif self.shape.prints and roll < 0.3:
+            self.emit(level, "print({});".format(self.rand.choice(self.vars)))
+        elif self.calls and roll < 0.4:
+            self.emit(level, "{} = {};".format(self.rand.choice(self.vars), self.call(self.rand.choice(self.leaves))))
+        else:
+            self.assignment(level)
+
+    def assignment(self, level: int):
+        # keep values small so generated arithmetic never turns into big ints
+        target = self.rand.choice(self.vars)
+        self.emit(level, "{} = ({}) % 1009;".format(target, self.expression(self.shape.expr_depth)))
+
+    def ifstatement(self, level: int):
+        self.emit(level, "if ({}) {{".format(self.condition()))
+        self.statements(level + 1, 3)
+        if self.rand.random() < 0.5:
+            self.emit(level, "} else {")
+            self.statements(level + 1, 2)
+        self.emit(level, "}")
+
+    def whilestatement(self, level: int, counter: str):
+        self.emit(level, "{} = 0;".format(counter))
+        self.emit(level, "while ({} < {}) {{".format(counter, self.shape.loop_iters))
+        self.statements(level + 1, 3)
+        self.emit(level + 1, "{0} = {0} + 1;".format(counter))
+        self.emit(level, "}")
+
+    def condition(self) -> str:
+        left = "({} {} {})".format(self.rand.choice(self.vars), self.rand.choice(["<", "<=", ">", ">="]),
+                                   self.rand.randint(0, 500))
+        if self.rand.random() < 0.3:
+            right = "({} != {})".format(self.rand.choice(self.vars), self.rand.randint(0, 9))
+            return "{} {} {}".format(left, self.rand.choice(["&&", "||"]), right)
+        return left
+
+    def expression(self, depth: int) -> str:
+        if depth <= 0 or self.rand.random() < 0.15:
+            if self.rand.random() < 0.6:
+                return self.rand.choice(self.vars)
+            return str(self.rand.randint(0, 99))
+        op = self.rand.choice(["+", "+", "-", "*"])
+        if op == "*":
+            # only multiply by small literals
+            return "({} * {})".format(self.expression(depth - 1), self.rand.randint(0, 3))
+        return "({} {} {})".format(self.expression(depth - 1), op, self.expression(depth - 1))
+
+    def call(self, f: str) -> str:
+        args = ["{} % 7".format(self.rand.choice(self.vars)) for _ in range(max(1, self.shape.params))]
+        return "{}({})".format(f, ", ".join(args))
+
+
+def generate(shape: Shape = Shape(), seed: int = 0) -> str:
+    return ProgramGenerator(shape, seed).program()
+
+
+if __name__ == '__main__':
+    argp = argparse.ArgumentParser(description="generate a SLU-C program")
+    argp.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    argp.add_argument("--seed", type=int, default=0)
+    for field, default in Shape._field_defaults.items():
+        if type(default) == bool:
+            argp.add_argument("--no-" + field.replace("_", "-"), dest=field, action="store_false", default=None)
+        else:
+            argp.add_argument("--" + field.replace("_", "-"), type=type(default), default=None)
+    args = argp.parse_args()
+    overrides = {f: getattr(args, f) for f in Shape._fields if getattr(args, f) is not None}
+    sys.stdout.write(generate(PRESETS[args.preset]._replace(**overrides), args.seed))
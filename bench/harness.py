@@ -0,0 +1,183 @@
+"""
+Timing harnesses for the SLU-C front end and engines
+Every harness runs its phase repeat times for the best time, then once
+more under tracemalloc for the peak memory
+"""
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from lexer import Lexer
+from parser_sluc import Parser
+from ast import Program
+from cache import CodeCache
+from arena import Arena
+from checker import check
+from optimizer import optimize
+from memo import memoize
+from output import NullSink, Sink
+import closures
+import transpiler
+import vm
+
+
+def fields(node) -> list:
+    """
+    attribute values of a node, with or without __slots__
+    """
+    d = getattr(node, "__dict__", None)
+    if d is not None:
+        return list(d.values())
+    return [getattr(node, s, None) for c in type(node).__mro__ for s in getattr(c, "__slots__", ())]
+
+
+def count_nodes(root) -> int:
+    """
+    number of AST nodes reachable from root
+    """
+    module = Program.__module__
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack.extend(node)
+        elif type(node).__module__ == module:
+            count += 1
+            stack.extend(fields(node))
+    return count
+
+
+def best_time(run: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def peak_memory(run: Callable[[], object]) -> int:
+    """
+    peak bytes allocated while run() executes and its result is alive
+    """
+    tracemalloc.start()
+    try:
+        result = run()
+        peak = tracemalloc.get_traced_memory()[1]
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def lex(fn: str) -> int:
+    count = 0
+    for _ in Lexer(fn).token_generator():
+        count += 1
+    return count
+
+
+def bench_lex(fn: str, repeat: int = 3) -> Dict[str, float]:
+    """
+    Lexer.token_generator over the whole file
+    """
+    tokens = lex(fn)
+    seconds = best_time(lambda: lex(fn), repeat)
+    return {
+        "tokens": tokens,
+        "seconds": seconds,
+        "tokens_per_sec": tokens / seconds,
+        "peak_bytes": peak_memory(lambda: list(Lexer(fn).token_generator())),
+    }
+
+
+def bench_parse(fn: str, repeat: int = 3) -> Dict[str, float]:
+    """
+    Parser.program over the whole file, lexing included
+    """
+    tokens = lex(fn)
+    nodes = count_nodes(Parser(fn).program())
+    seconds = best_time(lambda: Parser(fn).program(), repeat)
+    return {
+        "tokens": tokens,
+        "nodes": nodes,
+        "seconds": seconds,
+        "tokens_per_sec": tokens / seconds,
+        "nodes_per_sec": nodes / seconds,
+        "peak_bytes": peak_memory(lambda: Parser(fn).program()),
+    }
+
+
+def bench_arena(fn: str, repeat: int = 3) -> Dict[str, float]:
+    """
+    flattening the parsed tree into an arena and rebuilding it, with the
+    peak bytes of parsing the tree of objects and the bytes of the arena arrays
+    """
+    program = Parser(fn).program()
+    nodes = count_nodes(program)
+    arena = Arena(program)
+    flatten = best_time(lambda: Arena(program), repeat)
+    rebuild = best_time(arena.program, repeat)
+    return {
+        "nodes": nodes,
+        "seconds": flatten + rebuild,
+        "flatten_seconds": flatten,
+        "rebuild_seconds": rebuild,
+        "parse_peak_bytes": peak_memory(lambda: Parser(fn).program()),
+        "arena_bytes": arena.nbytes(),
+    }
+
+
+def evaluate(program: Program, run: Callable[[Program, Sink], object]):
+    run(program, NullSink())
+
+
+def bench_run(fn: str, repeat: int = 3, optimized: bool = False,
+              run: Callable[[Program, Sink], object] = Program.eval) -> Dict[str, float]:
+    """
+    run of the checked program, output discarded, optimized beforehand
+    when optimized is set; compiling to closures or Python is timed too
+    """
+    program = check(Parser(fn).program())
+    if optimized:
+        optimize(program)
+    seconds = best_time(lambda: evaluate(program, run), repeat)
+    return {
+        "nodes": count_nodes(program),
+        "seconds": seconds,
+        "peak_bytes": peak_memory(lambda: evaluate(program, run)),
+    }
+
+
+def bench_run_optimized(fn: str, repeat: int = 3) -> Dict[str, float]:
+    return bench_run(fn, repeat, optimized=True)
+
+
+def bench_run_closure(fn: str, repeat: int = 3) -> Dict[str, float]:
+    return bench_run(fn, repeat, run=closures.run)
+
+
+def bench_run_vm(fn: str, repeat: int = 3) -> Dict[str, float]:
+    return bench_run(fn, repeat, run=lambda program, out: vm.run(program, out=out))
+
+
+def bench_run_python(fn: str, repeat: int = 3) -> Dict[str, float]:
+    """
+    transpiled runs sharing a code cache, as repeated runs of a file do:
+    after the first one the Python compile is a cache hit
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CodeCache(directory)
+        return bench_run(fn, repeat, run=lambda program, out: transpiler.run(program, cache, out))
+
+
+def bench_run_memo(fn: str, repeat: int = 3) -> Dict[str, float]:
+    """
+    tree runs with new memos each time, the purity analysis is timed too
+    """
+    def run(program: Program, out: Sink):
+        memoize(program)
+        program.eval(out)
+    return bench_run(fn, repeat, run=run)
@@ -0,0 +1,212 @@
+"""
+SLU-C parse and code caches
+Parsed programs are pickled into a cache directory under the hash of their
+source text, so running an unchanged file again skips lexing and parsing;
+the Python code objects of transpiled programs are marshalled next to them
+Entries are keyed by front end version as well and the least recently used
+ones are evicted once the directory grows past its size limit
+"""
+import gc
+import hashlib
+import importlib.util
+import marshal
+import os
+import pickle
+import sys
+import tempfile
+from types import CodeType
+from typing import Optional
+
+from lexer import SLUCIOError
+from parser_sluc import Parser
+from ast import Program
+
+FORMAT = 1                  # bump when the layout of cache entries changes
+MAX_BYTES = 64 << 20        # default size limit of a cache directory
+SUFFIX = ".pickle"
+CODE_SUFFIX = ".marshal"
+
+# the modules whose code decides what a source parses to
+FRONT_END = ["lexer.py", "parser_sluc.py", "ast.py", "symbols.py", "resolver.py"]
+
+
+def front_end_version() -> str:
+    """
+    cache format, Python version and a hash of the front end sources,
+    changing any of them makes every older entry a miss
+    """
+    h = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in FRONT_END:
+        with open(os.path.join(here, name), "rb") as f:
+            h.update(f.read())
+    return "{}-{}-{}".format(FORMAT, sys.version.split()[0], h.hexdigest()[:16])
+
+
+def default_directory() -> str:
+    d = os.environ.get("SLUC_CACHE_DIR")
+    if d:
+        return d
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "sluc")
+
+
+class Cache:
+    """
+    Directory of entries, one file per source text
+    A hit refreshes the file's modification time, which is the LRU order used for eviction
+    Subclasses set the version and suffix of their entries and how values are stored
+    """
+    suffix = SUFFIX
+
+    def __init__(self, directory: str = None, max_bytes: int = MAX_BYTES, version: str = ""):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.version = version
+
+    def dumps(self, value) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def loads(self, data: bytes):
+        raise NotImplementedError
+
+    def key(self, source: bytes) -> str:
+        h = hashlib.sha256(self.version.encode("ascii"))
+        h.update(source)
+        return h.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, source: bytes):
+        path = self.path(self.key(source))
+        # the collector would keep scanning the nodes being rebuilt, loads run
+        # several times faster with it off
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(path, "rb") as f:
+                value = self.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # unreadable entry, drop it and parse again
+            self.remove(path)
+            return None
+        finally:
+            if enabled:
+                gc.enable()
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, source: bytes, value):
+        data = self.dumps(value)
+        if data is None or len(data) > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # write to a temporary file first so readers never see half an entry
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(self.key(source)))
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        remove the least recently used entries until the directory fits in max_bytes
+        """
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for e in it:
+                    if e.name.endswith(self.suffix):
+                        st = e.stat()
+                        entries.append((st.st_mtime, st.st_size, e.path))
+                        total += st.st_size
+        except OSError:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    @staticmethod
+    def remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        max_bytes, self.max_bytes = self.max_bytes, 0
+        self.evict()
+        self.max_bytes = max_bytes
+
+
+class ParseCache(Cache):
+    """
+    Directory of pickled Programs
+    """
+    def __init__(self, directory: str = None, max_bytes: int = MAX_BYTES):
+        Cache.__init__(self, directory, max_bytes, front_end_version())
+
+    def dumps(self, program: Program) -> Optional[bytes]:
+        try:
+            return pickle.dumps(program, pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            return None  # too deep to pickle, the program just isn't cached
+
+    def loads(self, data: bytes) -> Program:
+        return pickle.loads(data)
+
+    def parse(self, fn: str) -> Program:
+        """
+        the Program of a file, from the cache when its source was parsed before
+        """
+        try:
+            with open(fn, "rb") as f:
+                source = f.read()
+        except IOError:
+            raise SLUCIOError("File {} not found".format(fn))
+        program = self.get(source)
+        if program is None:
+            program = Parser.from_bytes(source).program()
+            self.put(source, program)
+        return program
+
+
+class CodeCache(Cache):
+    """
+    Directory of marshalled code objects, keyed by the Python source they were
+    compiled from; marshal data only loads on the Python version that wrote it
+    """
+    suffix = CODE_SUFFIX
+
+    def __init__(self, directory: str = None, max_bytes: int = MAX_BYTES):
+        Cache.__init__(self, directory, max_bytes, "{}-{}".format(FORMAT, importlib.util.MAGIC_NUMBER.hex()))
+
+    def dumps(self, code: CodeType) -> Optional[bytes]:
+        return marshal.dumps(code)
+
+    def loads(self, data: bytes) -> CodeType:
+        return marshal.loads(data)
+
+    def compile(self, source: str, filename: str) -> CodeType:
+        """
+        the code object of a Python source, from the cache when it was compiled before
+        """
+        data = source.encode("utf-8")
+        code = self.get(data)
+        if code is None:
+            code = compile(source, filename, "exec")
+            self.put(data, code)
+        return code
@@ -0,0 +1,349 @@
+"""
+SLU-C static type checker
+Runs once over a resolved Program before it is executed: the errors the
+eval methods would raise are reported up front, and every node whose
+operand types are known is rewritten into a specialized variant that
+skips the runtime checks
+A type is the name of a Python type, or None when it is only known at run time
+A local holds None until it is first assigned, so a read of it has its declared
+type only where every path to the read assigns it
+"""
+from typing import Dict, List, Optional, Set
+
+from ast import *
+
+NUMBERS = {"int", "float", "bool"}  # bools count as 0 and 1 in arithmetic
+LITERALS = (IntLitExpr, FloatLitExpr, StrLitExpr, BoolExpr)
+
+
+class Checker:
+    """
+    Checks and specializes a Program in place
+    Parameters are typed from the call sites: one takes its declared type only
+    when every call passes a value of that type, otherwise it stays None
+    """
+    def __init__(self, program: Program):
+        self.program = program
+        self.functions: Dict[str, FunctionDef] = {str(f.id): f for f in program.funcs}
+        self.params: Dict[str, List[Optional[str]]] = {
+            name: list(f.types[:f.nparams]) for name, f in self.functions.items()}
+        self.reporting = False
+        self.changed = False
+        self.func: FunctionDef = None
+        self.types: List[Optional[str]] = []    # slot -> type of the current function
+        self.assigned: Set[int] = set()         # ids of its reads of assigned variables
+        self.returns: List[Optional[str]] = []  # types of the current function's returns
+
+        #  statement and expression dictionaries, keyed by node class
+        self.stmt_dict = {
+            Statement: lambda s: s,
+            Declaration: self.declaration,
+            PrintStatement: self.printstmt,
+            WhileStatement: self.whilestmt,
+            IfStatement: self.ifstmt,
+            BlockStatement: self.block,
+            ReturnStatement: self.returnstmt,
+        }
+        for cls in (AssignmentStatement, ConstAssignment, StoreAssignment, IntAssignment, FloatAssignment):
+            self.stmt_dict[cls] = self.assignment
+        self.expr_dict = {
+            IDExpr: lambda e: (e, self.types[e.slot] if id(e) in self.assigned else None),
+            IntLitExpr: lambda e: (e, "int"),
+            FloatLitExpr: lambda e: (e, "float"),
+            StrLitExpr: lambda e: (e, "str"),
+            BoolExpr: lambda e: (e, "bool"),
+            Farg: self.farg,
+            UnaryOp: self.unary,
+            AddExpr: self.add,
+            IntAdd: self.add,
+            FloatAdd: self.add,
+            MultExpr: self.mult,
+            ExpoExpr: self.expo,
+            EqExpr: self.compare,
+            RelatExpr: self.compare,
+            Expr: lambda e: self.logical(e, BoolOr),
+            BoolOr: lambda e: self.logical(e, BoolOr),
+            ConjExpr: lambda e: self.logical(e, BoolAnd),
+            BoolAnd: lambda e: self.logical(e, BoolAnd),
+            FuncCExpr: self.call,
+        }
+
+    def check(self) -> Program:
+        # parameter types only ever go from known to None, repeat until they settle
+        self.changed = True
+        while self.changed:
+            self.changed = False
+            for f in self.program.funcs:
+                self.function(f)
+        # one more pass now that the types are final, reporting the first error
+        self.reporting = True
+        for f in self.program.funcs:
+            self.function(f)
+        return self.program
+
+    def error(self, message: str = "ERROR: type error"):
+        if self.reporting:
+            raise SLUCTypeError(message)
+
+    def function(self, f: FunctionDef):
+        self.func = f
+        self.types = self.params.get(str(f.id), [])[:f.nparams] + f.types[f.nparams:]
+        self.assigned = assigned_reads(f)
+        self.returns = []
+        f.decls = [self.statement(d) for d in f.decls]
+        f.stmts = [self.statement(s) for s in f.stmts]
+        f.check_return = any(t != f.type for t in self.returns)
+
+    # ---- statements
+
+    def statement(self, s):
+        return self.stmt_dict[type(s)](s)
+
+    def declaration(self, d: Declaration):
+        if isinstance(d.right, AssignmentStatement):
+            d.right = self.assignment(d.right)
+        return d
+
+    def assignment(self, s: AssignmentStatement):
+        """
+        the specialized assignment for the target's declared type and the value's type,
+        literals are converted here once
+        """
+        right, t = self.expression(s.right)
+        target = s.type
+        literal = type(right)
+        incorrect = "ERROR: Variable {} incorrect assignment type".format(s.left)
+        cls = AssignmentStatement
+        value = None
+        if target == "int":
+            if literal == IntLitExpr or literal == FloatLitExpr:
+                cls, value = ConstAssignment, int(right.eval())
+            elif literal == StrLitExpr or literal == BoolExpr or t == "str":
+                self.error(incorrect)
+            elif t == "int":
+                cls = StoreAssignment
+            elif t in NUMBERS:
+                cls = IntAssignment
+        elif target == "float":
+            if literal == IntLitExpr or literal == FloatLitExpr:
+                cls, value = ConstAssignment, float(right.eval())
+            elif literal == StrLitExpr or literal == BoolExpr or t == "str":
+                self.error(incorrect)
+            elif t == "float":
+                cls = StoreAssignment
+            elif t in NUMBERS:
+                cls = FloatAssignment
+        elif target == "bool":
+            if literal == BoolExpr:
+                cls, value = ConstAssignment, right.eval()
+            elif literal == IntLitExpr or literal == FloatLitExpr or literal == StrLitExpr:
+                self.error(incorrect)
+            elif t == "bool":
+                cls = StoreAssignment
+            elif t is not None:
+                self.error(incorrect)
+        node = cls(s.left, right)
+        node.line = s.line
+        node.slot = s.slot
+        node.type = s.type
+        if cls == ConstAssignment:
+            node.value = value
+        return node
+
+    def printstmt(self, s: PrintStatement):
+        s.prtarg = self.expression(s.prtarg)[0]
+        s.prtargs = [self.expression(arg)[0] for arg in s.prtargs]
+        return s
+
+    def whilestmt(self, s: WhileStatement):
+        s.left = self.expression(s.left)[0]
+        s.right = self.statement(s.right)
+        return s
+
+    def ifstmt(self, s: IfStatement):
+        s.expr = self.expression(s.expr)[0]
+        s.stmt = self.statement(s.stmt)
+        if s.elsestmt:
+            s.elsestmt = self.statement(s.elsestmt)
+        return s
+
+    def block(self, s: BlockStatement):
+        s.left = self.statement(s.left)
+        s.right = [self.statement(arg) for arg in s.right]
+        return s
+
+    # main's returns end the program, their value is never checked
+    def returnstmt(self, s: ReturnStatement):
+        s.left, t = self.expression(s.left)
+        if str(self.func.id) != "main":
+            if t is not None and t != self.func.type:
+                self.error()
+            self.returns.append(t)
+        return s
+
+    # ---- expressions, each handler returns the node to use and its type
+
+    def expression(self, e):
+        return self.expr_dict[type(e)](e)
+
+    def farg(self, e: Farg):
+        e.farg, t = self.expression(e.farg)
+        return e, t
+
+    def unary(self, e: UnaryOp):
+        e.tree, t = self.expression(e.tree)
+        if e.op != "-":
+            return e, "bool"
+        if t == "float":
+            return e, "float"
+        return e, "int" if t == "int" or t == "bool" else None
+
+    def add(self, e: AddExpr):
+        left, lt = self.expression(e.left)
+        right, rt = self.expression(e.right)
+        if lt == "bool" or rt == "bool":
+            self.error()
+        elif lt == "int" and rt == "int":
+            return IntAdd(left, right), "int"
+        elif lt in NUMBERS and rt in NUMBERS:
+            return FloatAdd(left, right), "float"
+        elif lt == "str" and rt == "str":
+            return AddExpr(left, right), "str"
+        elif lt is not None and rt is not None:
+            self.error()    # a string and a number
+        return AddExpr(left, right), None
+
+    def mult(self, e: MultExpr):
+        e.left, lt = self.expression(e.left)
+        e.right, rt = self.expression(e.right)
+        if lt not in NUMBERS or rt not in NUMBERS:
+            return e, None
+        if e.op != "/" and lt != "float" and rt != "float":
+            return e, "int"
+        return e, "float"
+
+    # a power can be an int, a float or a complex number
+    def expo(self, e: ExpoExpr):
+        e.left = self.expression(e.left)[0]
+        e.right = self.expression(e.right)[0]
+        return e, None
+
+    def compare(self, e: BinaryExpr):
+        e.left, lt = self.expression(e.left)
+        if not e.right:
+            return e, lt
+        e.right = self.expression(e.right)[0]
+        return e, "bool"
+
+    # || and && need bools on both sides
+    def logical(self, e: Expr, specialized):
+        left, lt = self.expression(e.left)
+        if lt is not None and lt != "bool":
+            self.error()
+        if not e.right:
+            e.left = left
+            return e, "bool"
+        right, rt = self.expression(e.right)
+        if rt is not None and rt != "bool":
+            self.error()
+        generic = Expr if specialized == BoolOr else ConjExpr
+        return (specialized if lt == "bool" and rt == "bool" else generic)(left, right), "bool"
+
+    def call(self, e: FuncCExpr):
+        """
+        narrow the callee's parameter types to what this call passes,
+        the call has the callee's type when the callee always returns
+        """
+        e.left, t = self.expression(e.left)
+        types = [t]
+        args = []
+        for arg in e.right:
+            arg, t = self.expression(arg)
+            args.append(arg)
+            types.append(t)
+        e.right = args
+        f = self.functions.get(e.f_id)
+        if f is None:
+            return e, None
+        params = self.params[e.f_id]
+        for i in range(len(params)):
+            if params[i] is not None and (i >= len(types) or types[i] != params[i]):
+                params[i] = None
+                self.changed = True
+        return e, f.type if any(map(returns, f.stmts)) else None
+
+
+# whether running s always ends in a return
+def returns(s) -> bool:
+    if type(s) == ReturnStatement:
+        return True
+    if type(s) == IfStatement:
+        return s.elsestmt is not None and returns(s.stmt) and returns(s.elsestmt)
+    if type(s) == BlockStatement:
+        return returns(s.left) or any(map(returns, s.right))
+    return False
+
+
+def assigned_reads(func: FunctionDef) -> Set[int]:
+    """
+    the ids of the IDExpr nodes of func that read a variable assigned on
+    every path to them; parameters always are, a local holds None until
+    its first assignment
+    """
+    reads = set()
+
+    def expression(e, assigned: Set[int]):
+        stack = [e]
+        while stack:
+            e = stack.pop()
+            if type(e) == IDExpr:
+                if e.slot in assigned:
+                    reads.add(id(e))
+            elif type(e) in LITERALS or e is None:
+                continue
+            elif type(e) == UnaryOp:
+                stack.append(e.tree)
+            elif type(e) == Farg:
+                stack.append(e.farg)
+            elif isinstance(e, FuncCExpr):
+                stack.append(e.left)
+                stack.extend(e.right)
+            else:
+                stack.append(e.left)
+                stack.append(e.right)
+
+    # the variables assigned after s runs, when they were before it
+    def statement(s, assigned: Set[int]) -> Set[int]:
+        if isinstance(s, Declaration):
+            return statement(s.right, assigned) if isinstance(s.right, AssignmentStatement) else assigned
+        if isinstance(s, AssignmentStatement):
+            expression(s.right, assigned)
+            return assigned | {s.slot}
+        if type(s) == PrintStatement:
+            for arg in [s.prtarg] + list(s.prtargs):
+                expression(arg, assigned)
+        elif type(s) == WhileStatement:
+            # the body may not run at all
+            expression(s.left, assigned)
+            statement(s.right, assigned)
+        elif type(s) == IfStatement:
+            expression(s.expr, assigned)
+            then = statement(s.stmt, assigned)
+            return then & statement(s.elsestmt, assigned) if s.elsestmt else assigned
+        elif type(s) == BlockStatement:
+            for stmt in [s.left] + list(s.right):
+                assigned = statement(stmt, assigned)
+        elif type(s) == ReturnStatement:
+            expression(s.left, assigned)
+        elif s.left != ";":
+            expression(s.left, assigned)
+        return assigned
+
+    assigned = set(range(func.nparams))
+    for s in list(func.decls) + list(func.stmts):
+        assigned = statement(s, assigned)
+    return reads
+
+
+def check(program: Program) -> Program:
+    return Checker(program).check()
@@ -0,0 +1,118 @@
+"""
+SLU-C client
+Takes the arguments of interpreter.py and has a running server.py lex,
+parse, pretty-print or run the file, then prints what the server sent back
+and exits with its status, so it can stand in for interpreter.py
+Imports nothing of the interpreter, starting it costs little more than
+starting Python
+"""
+import json
+import os
+import socket
+import struct
+import sys
+import time
+from typing import List
+
+HEADER = struct.Struct(">I")    # every frame is its length followed by that many bytes of JSON
+MAX_FRAME = 1 << 30
+OPS = ["run", "lex", "parse", "format"]            # what can be asked about a file
+CLIENT_OPS = ["--" + op for op in OPS + ["stats", "shutdown"]]
+
+
+class SLUCServerError(Exception):
+    def __init__(self, message: str):
+        Exception.__init__(self)
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def default_socket() -> str:
+    return os.environ.get("SLUC_SOCKET") or "/tmp/sluc-{}.sock".format(os.getuid())
+
+
+def send(sock: socket.socket, message: dict):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def receive_exactly(sock: socket.socket, n: int) -> bytes:
+    parts = []
+    while n:
+        part = sock.recv(min(n, 1 << 20))
+        if not part:
+            raise EOFError
+        parts.append(part)
+        n -= len(part)
+    return b"".join(parts)
+
+
+def receive(sock: socket.socket) -> dict:
+    """
+    the next frame, raises EOFError when the other side closed between frames
+    """
+    header = sock.recv(HEADER.size)
+    if not header:
+        raise EOFError
+    header += receive_exactly(sock, HEADER.size - len(header))
+    n, = HEADER.unpack(header)
+    if n > MAX_FRAME:
+        raise SLUCServerError("ERROR: frame of {} bytes".format(n))
+    return json.loads(receive_exactly(sock, n).decode("utf-8"))
+
+
+def request(path: str, message: dict) -> dict:
+    """
+    one request and its reply over a new connection
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError as e:
+            raise SLUCServerError("ERROR: no server on {}: {}".format(path, e.strerror))
+        send(sock, message)
+        try:
+            return receive(sock)
+        except EOFError:
+            raise SLUCServerError("ERROR: the server closed the connection")
+
+
+def split(argv: List[str]):
+    """
+    the client's own options, the operation and the arguments left for interpreter.py
+    """
+    path, op, latency, rest = default_socket(), "run", False, []
+    items = iter(argv)
+    for a in items:
+        if a == "--socket":
+            path = next(items, path)
+        elif a.startswith("--socket="):
+            path = a.split("=", 1)[1]
+        elif a == "--latency":
+            latency = True
+        elif a in CLIENT_OPS:
+            op = a[2:]
+        else:
+            rest.append(a)
+    return path, op, latency, rest
+
+
+if __name__ == '__main__':
+    # --socket PATH, --lex, --parse, --format, --run, --stats, --shutdown and --latency
+    # are the client's, the other arguments are interpreter.py's
+    path, op, latency, argv = split(sys.argv[1:])
+    start = time.perf_counter()
+    try:
+        reply = request(path, {"op": op, "argv": argv, "cwd": os.getcwd()})
+    except SLUCServerError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(reply.get("stdout", ""))
+    sys.stdout.flush()
+    sys.stderr.write(reply.get("stderr", ""))
+    if latency:
+        print("server {:.3f} ms, round trip {:.3f} ms".format(
+            reply.get("seconds", 0.0) * 1e3, (time.perf_counter() - start) * 1e3), file=sys.stderr)
+    sys.exit(reply.get("exit", 0))
@@ -0,0 +1,455 @@
+"""
+SLU-C closure compiler
+Compiles every node of a checked Program once into a Python closure that
+takes the call frame: the operator, the literal and slot operands and the
+type decisions of the eval methods in ast.py are fixed at compile time,
+so running a program is a chain of direct closure calls
+Statements return None, or a ReturnValue once a return statement ran
+"""
+import gc
+import sys
+from typing import Callable, Dict
+
+from ast import *
+from compiler import binary_funcs
+
+
+def nothing(env):
+    return None
+
+
+def fail(message: str):
+    def raise_error(env):
+        raise SLUCTypeError(message)
+    return raise_error
+
+
+# whether running s can end in a return, loops and blocks that cannot skip the signal checks
+def may_return(s) -> bool:
+    if type(s) == ReturnStatement:
+        return True
+    if type(s) == IfStatement:
+        return may_return(s.stmt) or s.elsestmt is not None and may_return(s.elsestmt)
+    if type(s) == WhileStatement:
+        return may_return(s.right)
+    if type(s) == BlockStatement:
+        return may_return(s.left) or any(map(may_return, s.right))
+    return False
+
+
+class ClosureCompiler:
+    """
+    Compiles FunctionDefs into functions of their argument list
+    calls look their callee up in functions when they run, so a function
+    can be called once it is registered, the same as in the tree walker
+    """
+    def __init__(self, functions: Dict[str, Callable[[list], object]], out: Sink):
+        self.functions = functions
+        self.out = out
+
+        #  statement and expression dictionaries, keyed by node class
+        self.stmt_dict = {
+            Statement: lambda s: nothing,
+            AssignmentStatement: self.assignment,
+            ConstAssignment: self.const,
+            StoreAssignment: lambda s: self.store(s, None),
+            IntAssignment: lambda s: self.store(s, int),
+            FloatAssignment: lambda s: self.store(s, float),
+            Declaration: self.declaration,
+            PrintStatement: self.printstmt,
+            WhileStatement: self.whilestmt,
+            IfStatement: self.ifstmt,
+            BlockStatement: self.block,
+            ReturnStatement: self.returnstmt,
+        }
+        self.expr_dict = {
+            IDExpr: self.variable,
+            IntLitExpr: lambda e: self.constant(e.intlit),
+            FloatLitExpr: lambda e: self.constant(e.floatlit),
+            StrLitExpr: lambda e: self.constant(e.strlit),
+            BoolExpr: lambda e: self.constant(e.bool == "true"),
+            Farg: lambda e: self.expression(e.farg),
+            UnaryOp: self.unary,
+            AddExpr: self.add,
+            IntAdd: self.plus,
+            FloatAdd: self.plus,
+            MultExpr: lambda e: self.binary(e, e.op if e.op in {"*", "/"} else "%"),
+            ExpoExpr: lambda e: self.binary(e, "**"),
+            EqExpr: lambda e: self.binary(e, "==" if e.Eqlop == "==" else "!="),
+            RelatExpr: self.relational,
+            Expr: lambda e: self.logical(e, False),
+            ConjExpr: lambda e: self.logical(e, True),
+            BoolOr: self.bool_or,
+            BoolAnd: self.bool_and,
+            FuncCExpr: self.call,
+            MemoCall: self.memo_call,
+        }
+
+    def register(self, f: FunctionDef):
+        """
+        puts f in the function table, it is compiled on its first call
+        so functions that never run cost nothing
+        """
+        name = str(f.id)
+
+        def compile_and_call(args):
+            code = self.compile(f)
+            self.functions[name] = code
+            return code(args)
+        self.functions[name] = compile_and_call
+
+    def compile(self, f: FunctionDef) -> Callable[[list], object]:
+        # the collector would keep scanning the tree while the closures pile up,
+        # compiling runs several times faster with it off
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self.function(f)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def function(self, f: FunctionDef) -> Callable[[list], object]:
+        """
+        the compiled function takes the argument list, main's its frame
+        """
+        body = [self.statement(s) for s in list(f.decls) + list(f.stmts)]
+        body = [s for s in body if s is not nothing]
+        size = len(f.names)
+        if str(f.id) == "main":
+            def run_main(args):
+                env = [None] * size
+                for s in body:
+                    if s(env) is not None:
+                        break
+            return run_main
+
+        nparams = f.nparams
+        locals = [None] * (size - nparams)
+        ftype = f.type
+        check_return = f.check_return
+
+        def run_function(args):
+            env = args[:nparams] + locals
+            for s in body:
+                signal = s(env)
+                if signal is not None:
+                    # the returned value must have the declared type
+                    if check_return and type(signal.value).__name__ != ftype:
+                        raise SLUCTypeError("ERROR: type error")
+                    return signal.value
+            return None
+        return run_function
+
+    # ---- statements
+
+    def statement(self, s):
+        return self.stmt_dict[type(s)](s)
+
+    def declaration(self, d: Declaration):
+        if isinstance(d.right, AssignmentStatement):
+            return self.statement(d.right)
+        return nothing
+
+    def assignment(self, s: AssignmentStatement):
+        """
+        the literal and target type tests of AssignmentStatement.eval, made once
+        """
+        slot = s.slot
+        t = s.type
+        literal = type(s.right)
+        incorrect = fail("ERROR: Variable {} incorrect assignment type".format(s.left))
+        if t == "int" or t == "float":
+            convert = int if t == "int" else float
+            if literal == IntLitExpr or literal == FloatLitExpr:
+                return self.constant_store(slot, convert(s.right.eval()))
+            if literal == StrLitExpr or literal == BoolExpr:
+                return incorrect
+            return self.store(s, convert)
+        if t == "bool":
+            if literal == BoolExpr:
+                return self.constant_store(slot, s.right.eval())
+            if literal == IntLitExpr or literal == FloatLitExpr or literal == StrLitExpr:
+                return incorrect
+            right = self.expression(s.right)
+
+            def store_bool(env):
+                value = right(env)
+                if type(value) != bool:
+                    incorrect(env)
+                env[slot] = value
+            return store_bool
+        if t == "str":
+            if literal == StrLitExpr:
+                return self.constant_store(slot, str(s.right.eval()))
+            return incorrect
+        return nothing
+
+    def const(self, s: ConstAssignment):
+        return self.constant_store(s.slot, s.value)
+
+    def constant_store(self, slot: int, value):
+        def store_constant(env):
+            env[slot] = value
+        return store_constant
+
+    def store(self, s: AssignmentStatement, convert):
+        slot = s.slot
+        right = self.expression(s.right)
+        if convert is None:
+            def store_value(env):
+                env[slot] = right(env)
+            return store_value
+
+        def store_converted(env):
+            env[slot] = convert(right(env))
+        return store_converted
+
+    def printstmt(self, s: PrintStatement):
+        write = self.out.write
+        args = [self.expression(arg) for arg in [s.prtarg] + list(s.prtargs)]
+        last = args.pop()
+        if not args:
+            def print_one(env):
+                write(str(last(env)) + "\n")
+            return print_one
+
+        # each value is printed as soon as it is computed, calls in the arguments may print too
+        def print_values(env):
+            for arg in args:
+                write(str(arg(env)) + " ")
+            write(str(last(env)) + "\n")
+        return print_values
+
+    def whilestmt(self, s: WhileStatement):
+        cond = self.expression(s.left)
+        body = self.statement(s.right)
+        if not may_return(s.right):
+            def loop(env):
+                while cond(env):
+                    body(env)
+            return loop
+
+        def loop_returning(env):
+            while cond(env):
+                signal = body(env)
+                if signal is not None:
+                    return signal
+        return loop_returning
+
+    def ifstmt(self, s: IfStatement):
+        cond = self.expression(s.expr)
+        then = self.statement(s.stmt)
+        if not s.elsestmt:
+            def if_then(env):
+                if cond(env):
+                    return then(env)
+            return if_then
+        orelse = self.statement(s.elsestmt)
+
+        def if_else(env):
+            if cond(env):
+                return then(env)
+            return orelse(env)
+        return if_else
+
+    def block(self, s: BlockStatement):
+        stmts = [self.statement(arg) for arg in [s.left] + list(s.right)]
+        stmts = [c for c in stmts if c is not nothing]
+        if not stmts:
+            return nothing
+        if len(stmts) == 1:
+            return stmts[0]
+        if not may_return(s):
+            def run_block(env):
+                for stmt in stmts:
+                    stmt(env)
+            return run_block
+
+        def run_block_returning(env):
+            for stmt in stmts:
+                signal = stmt(env)
+                if signal is not None:
+                    return signal
+        return run_block_returning
+
+    def returnstmt(self, s: ReturnStatement):
+        value = self.expression(s.left)
+        return lambda env: ReturnValue(value(env))
+
+    # ---- expressions
+
+    def expression(self, e):
+        return self.expr_dict[type(e)](e)
+
+    def operand(self, e):
+        """
+        (True, slot) for a declared variable, (False, value) for a number or bool
+        literal, a negated one included, and None for anything that needs a closure
+        """
+        t = type(e)
+        if t == IDExpr:
+            return True, e.slot
+        if t == UnaryOp and type(e.tree) in {IntLitExpr, FloatLitExpr, BoolExpr}:
+            value = self.operand(e.tree)[1]
+            return False, -value if e.op == "-" else not value
+        if t == IntLitExpr:
+            return False, e.intlit
+        if t == FloatLitExpr:
+            return False, e.floatlit
+        if t == BoolExpr:
+            return False, e.bool == "true"
+        if t == Farg:
+            return self.operand(e.farg)
+        return None
+
+    def variable(self, e: IDExpr):
+        slot = e.slot
+        return lambda env: env[slot]
+
+    def constant(self, value):
+        return lambda env: value
+
+    def unary(self, e: UnaryOp):
+        o = self.operand(e)
+        if o is not None:
+            return self.constant(o[1])
+        tree = self.expression(e.tree)
+        if e.op == "-":
+            return lambda env: -tree(env)
+        return lambda env: not tree(env)
+
+    # + with no proven types rejects bools
+    def add(self, e: AddExpr):
+        left = self.expression(e.left)
+        right = self.expression(e.right)
+
+        def add_checked(env):
+            a = left(env)
+            b = right(env)
+            if type(a) == bool or type(b) == bool:
+                raise SLUCTypeError("ERROR: type error")
+            return a + b
+        return add_checked
+
+    def plus(self, e: AddExpr):
+        """
+        + of proven numbers, with the shapes of loop counters written out
+        """
+        left = self.operand(e.left)
+        right = self.operand(e.right)
+        if left is not None and left[0] and right is not None:
+            a = left[1]
+            if right[0]:
+                b = right[1]
+                return lambda env: env[a] + env[b]
+            c = right[1]
+            return lambda env: env[a] + c
+        return self.binary(e, "+")
+
+    def relational(self, e: RelatExpr):
+        if not e.right:
+            return self.expression(e.left)
+        left = self.operand(e.left)
+        right = self.operand(e.right)
+        # the comparisons of while and if conditions, a local against a constant
+        if left is not None and left[0] and right is not None and not right[0]:
+            a = left[1]
+            c = right[1]
+            if e.relop == "<":
+                return lambda env: env[a] < c
+            if e.relop == "<=":
+                return lambda env: env[a] <= c
+            if e.relop == ">":
+                return lambda env: env[a] > c
+            return lambda env: env[a] >= c
+        return self.binary(e, e.relop)
+
+    def binary(self, e: BinaryExpr, op: str):
+        fn = binary_funcs[op]
+        left = self.operand(e.left)
+        right = self.operand(e.right)
+        if left is not None and left[0] and right is not None:
+            a = left[1]
+            if right[0]:
+                b = right[1]
+                return lambda env: fn(env[a], env[b])
+            c = right[1]
+            return lambda env: fn(env[a], c)
+        x = self.expression(e.left)
+        if right is None:
+            y = self.expression(e.right)
+            return lambda env: fn(x(env), y(env))
+        if right[0]:
+            b = right[1]
+            return lambda env: fn(x(env), env[b])
+        c = right[1]
+        return lambda env: fn(x(env), c)
+
+    # || and && evaluate both sides and require bools, the left one is checked first
+    def logical(self, e: Expr, conjunction: bool):
+        left = self.expression(e.left)
+        right = self.expression(e.right) if e.right else None
+
+        def logical_checked(env):
+            a = left(env)
+            if type(a) != bool:
+                raise SLUCTypeError("ERROR: type error")
+            if right is None:
+                return a
+            b = right(env)
+            if type(b) != bool:
+                raise SLUCTypeError("ERROR: type error")
+            return a and b if conjunction else a or b
+        return logical_checked
+
+    # both sides are proven bools, | and & evaluate both of them in order
+    def bool_or(self, e: BoolOr):
+        left = self.expression(e.left)
+        right = self.expression(e.right)
+        return lambda env: left(env) | right(env)
+
+    def bool_and(self, e: BoolAnd):
+        left = self.expression(e.left)
+        right = self.expression(e.right)
+        return lambda env: left(env) & right(env)
+
+    def call(self, e: FuncCExpr):
+        functions = self.functions
+        name = str(e.f_id)
+        args = [self.expression(e.left)] + [self.expression(arg) for arg in e.right]
+        if len(args) == 1:
+            arg = args[0]
+            return lambda env: functions[name]([arg(env)])
+        if len(args) == 2:
+            first, second = args
+            return lambda env: functions[name]([first(env), second(env)])
+        return lambda env: functions[name]([arg(env) for arg in args])
+
+    def memo_call(self, e: MemoCall):
+        functions = self.functions
+        name = str(e.f_id)
+        memo = e.memo
+        args = [self.expression(e.left)] + [self.expression(arg) for arg in e.right]
+        return lambda env: memo.call(functions[name], [arg(env) for arg in args])
+
+
+def run(program: Program, out: Sink = None):
+    """
+    registers the functions in order and runs main when it is reached
+    """
+    out = BufferedSink() if out is None else out
+    compiler = ClosureCompiler({}, out)
+    try:
+        for f in program.funcs:
+            if str(f.id) == "main":
+                compiler.compile(f)([])
+            else:
+                compiler.register(f)
+    finally:
+        out.flush()
+
+
+if __name__ == '__main__':
+    from parser_sluc import Parser
+    run(Parser(sys.argv[1] if len(sys.argv) > 1 else "simple.c").program())
@@ -0,0 +1,374 @@
+"""
+SLU-C bytecode compiler
+Compiles the functions of a Program into flat lists of (opcode, argument)
+pairs for the stack machine in vm.py, keeping the semantics of the eval
+methods in ast.py: local variables become numbered slots and every type
+decision the tree walker makes on node classes is made once here
+"""
+import operator
+import sys
+from typing import List
+
+from ast import *
+
+# opcodes; code is a list of (op, arg) pairs
+# they are numbered by how often they run, the vm tests them in that order
+# L in a name is an operand read from a slot, C a constant and X the top of the stack
+LOAD = 0            # push slots[arg]
+JUMP_UNLESS_LC = 1  # arg (slot, constant, function, target), jump unless function(local, constant)
+STORE_INT = 2       # slots[arg] = int(pop())
+ADD_LC = 3          # arg (slot, constant), push local + constant, the constant is never a bool
+BINARY_LC = 4       # arg (slot, constant, function), push function(local, constant)
+CONST = 5           # push arg
+JUMP = 6            # pc = arg
+CALL = 7            # arg (function name, number of arguments)
+ADD = 8             # + that rejects bools
+BINARY_XC = 9       # arg (constant, function), replaces the top
+STORE = 10          # slots[arg] = pop()
+RETURN = 11         # return pop()
+RETURN_CHECKED = 12  # return pop(), its type name must be arg, the declared return type
+BINARY = 13         # arg is a function of two values, pops the right one and replaces the left one
+JUMP_IF_FALSE = 14  # pops, pc = arg when it is falsy
+STORE_FLOAT = 15    # slots[arg] = float(pop())
+ADD_LL = 16         # arg (slot, slot)
+BINARY_LL = 17      # arg (slot, slot, function)
+JUMP_UNLESS_LL = 18  # arg (slot, slot, function, target)
+ADD_XC = 19         # arg constant, never a bool
+ADD_XL = 20         # arg slot
+BINARY_XL = 21      # arg (slot, function)
+PRINT = 22          # pops and prints, arg is the end string
+UNARY = 23          # arg is a function of one value, applied to the top
+CHECK_BOOL = 24     # the top must be a bool
+BOOL_AND = 25       # pops a bool and ands it into the top
+BOOL_OR = 26        # pops a bool and ors it into the top
+STORE_BOOL = 27     # arg (slot, message): store a bool, anything else is a type error
+FAIL = 28           # raise arg
+CALL_MEMO = 29      # arg (function name, number of arguments, Memo), a CALL through the callee's memo
+TAIL_CALL = 30      # arg (function name, number of arguments), the callee replaces the current frame
+
+opnames = {v: k for k, v in list(globals().items()) if k.isupper() and type(v) == int}
+
+binary_funcs = {
+    "+": operator.add,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "%": operator.mod,
+    "**": operator.pow,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "||": operator.or_,     # only for operands the checker proved to be bools
+    "&&": operator.and_,
+}
+
+
+class Function:
+    """
+    compiled function: its code and the layout of its local slots
+    """
+    def __init__(self, name: str, type: str, params: int, names: List[str], code: list):
+        self.name = name
+        self.type = type
+        self.params = params        # arguments land in the first slots
+        self.names = names          # slot -> variable name
+        self.code = code
+
+    def dis(self) -> str:
+        lines = ["{} {}({}) slots {}".format(self.type, self.name, self.params, self.names)]
+        for pc, (op, arg) in enumerate(self.code):
+            if callable(arg):
+                arg = arg.__name__
+            elif type(arg) == tuple:
+                arg = tuple(a.__name__ if callable(a) else a for a in arg)
+            lines.append("{:6} {:14} {}".format(pc, opnames[op], "" if arg is None and op != CONST else repr(arg)))
+        return "\n".join(lines)
+
+
+class Compiler:
+    """
+    Compiles one FunctionDef
+    """
+    def __init__(self, func: FunctionDef):
+        self.func = func
+        self.name = str(func.id)
+        self.main = self.name == "main"
+        self.code = []
+
+        #  statement and expression dictionaries, keyed by node class
+        self.stmt_dict = {
+            Statement: self.empty,
+            AssignmentStatement: self.assignment,
+            ConstAssignment: self.const,
+            StoreAssignment: lambda s: self.store(s, STORE),
+            IntAssignment: lambda s: self.store(s, STORE_INT),
+            FloatAssignment: lambda s: self.store(s, STORE_FLOAT),
+            Declaration: self.declaration,
+            PrintStatement: self.printstmt,
+            WhileStatement: self.whilestmt,
+            IfStatement: self.ifstmt,
+            BlockStatement: self.block,
+            ReturnStatement: self.returnstmt,
+        }
+        self.expr_dict = {
+            IDExpr: lambda e: self.emit(LOAD, e.slot),
+            IntLitExpr: lambda e: self.emit(CONST, e.intlit),
+            FloatLitExpr: lambda e: self.emit(CONST, e.floatlit),
+            StrLitExpr: lambda e: self.emit(CONST, e.strlit),
+            BoolExpr: lambda e: self.emit(CONST, e.bool == "true"),
+            Farg: lambda e: self.expression(e.farg),
+            UnaryOp: self.unary,
+            AddExpr: self.add,
+            IntAdd: lambda e: self.binary(e, "+"),
+            FloatAdd: lambda e: self.binary(e, "+"),
+            MultExpr: lambda e: self.binary(e, e.op if e.op in {"*", "/"} else "%"),
+            ExpoExpr: lambda e: self.binary(e, "**"),
+            EqExpr: lambda e: self.binary(e, "==" if e.Eqlop == "==" else "!="),
+            RelatExpr: lambda e: self.binary(e, e.relop),
+            Expr: lambda e: self.logical(e, BOOL_OR),
+            ConjExpr: lambda e: self.logical(e, BOOL_AND),
+            BoolOr: lambda e: self.binary(e, "||"),
+            BoolAnd: lambda e: self.binary(e, "&&"),
+            FuncCExpr: self.call,
+            MemoCall: self.call,
+        }
+
+    def emit(self, op: int, arg=None) -> int:
+        self.code.append((op, arg))
+        return len(self.code) - 1
+
+    # point the jump at pc to the next instruction, fused jumps keep their target last
+    def patch(self, pc: int):
+        op, arg = self.code[pc]
+        self.code[pc] = (op, arg[:-1] + (len(self.code),) if type(arg) == tuple else len(self.code))
+
+    def jump_unless(self, e) -> int:
+        """
+        compile a condition and a jump to be patched that is taken when it is false,
+        a comparison of locals and constants becomes a single instruction
+        """
+        self.expression(e)
+        op, arg = self.code[-1]
+        if op == BINARY_LL:
+            self.code[-1] = (JUMP_UNLESS_LL, arg + (None,))
+        elif op == BINARY_LC:
+            self.code[-1] = (JUMP_UNLESS_LC, arg + (None,))
+        else:
+            self.emit(JUMP_IF_FALSE)
+        return len(self.code) - 1
+
+    # slots and types come from the resolver, frames have the same layout on both engines
+    def compile(self) -> Function:
+        func = self.func
+        for d in func.decls:
+            self.statement(d)
+        for s in func.stmts:
+            self.statement(s)
+        # falling off the end returns None unchecked
+        self.emit(CONST, None)
+        self.emit(RETURN)
+        return Function(self.name, func.type, func.nparams, func.names, self.code)
+
+    # ---- statements
+
+    def statement(self, s):
+        self.stmt_dict[type(s)](s)
+
+    def empty(self, s: Statement):
+        if s.left != ";":
+            self.statement(s.left)
+
+    def declaration(self, d: Declaration):
+        if isinstance(d.right, AssignmentStatement):
+            self.statement(d.right)
+
+    def assignment(self, s: AssignmentStatement):
+        slot = s.slot
+        t = s.type
+        right = s.right
+        literal = type(right)
+        error = SLUCTypeError("ERROR: Variable {} incorrect assignment type".format(s.left))
+        if t == "int":
+            if literal == IntLitExpr:
+                self.emit(CONST, right.intlit)
+            elif literal == FloatLitExpr:
+                self.emit(CONST, int(right.floatlit))
+            elif literal == StrLitExpr or literal == BoolExpr:
+                self.emit(FAIL, error)
+                return
+            else:
+                self.expression(right)
+                self.emit(STORE_INT, slot)
+                return
+            self.emit(STORE, slot)
+        elif t == "float":
+            if literal == IntLitExpr or literal == FloatLitExpr:
+                self.emit(CONST, float(right.intlit if literal == IntLitExpr else right.floatlit))
+                self.emit(STORE, slot)
+            elif literal == StrLitExpr or literal == BoolExpr:
+                self.emit(FAIL, error)
+            else:
+                self.expression(right)
+                self.emit(STORE_FLOAT, slot)
+        elif t == "bool":
+            if literal == BoolExpr:
+                self.expression(right)
+                self.emit(STORE, slot)
+            elif literal == IntLitExpr or literal == FloatLitExpr or literal == StrLitExpr:
+                self.emit(FAIL, error)
+            else:
+                self.expression(right)
+                self.emit(STORE_BOOL, (slot, error))
+
+    def const(self, s: ConstAssignment):
+        self.emit(CONST, s.value)
+        self.emit(STORE, s.slot)
+
+    def store(self, s: AssignmentStatement, op: int):
+        self.expression(s.right)
+        self.emit(op, s.slot)
+
+    def printstmt(self, s: PrintStatement):
+        args = [s.prtarg] + list(s.prtargs)
+        for i, arg in enumerate(args):
+            self.expression(arg)
+            self.emit(PRINT, "\n" if i == len(args) - 1 else " ")
+
+    def whilestmt(self, s: WhileStatement):
+        top = len(self.code)
+        exit = self.jump_unless(s.left)
+        self.statement(s.right)
+        self.emit(JUMP, top)
+        self.patch(exit)
+
+    def ifstmt(self, s: IfStatement):
+        orelse = self.jump_unless(s.expr)
+        self.statement(s.stmt)
+        if s.elsestmt:
+            end = self.emit(JUMP)
+            self.patch(orelse)
+            self.statement(s.elsestmt)
+            self.patch(end)
+        else:
+            self.patch(orelse)
+
+    def block(self, s: BlockStatement):
+        self.statement(s.left)
+        for arg in s.right:
+            self.statement(arg)
+
+    # main's value is thrown away, any other function checks it against its type
+    # unless the checker proved every return has it
+    def returnstmt(self, s: ReturnStatement):
+        if type(s.left) == FuncCExpr and not self.main and not self.func.check_return:
+            # nothing is left to do with the value, the callee's frame replaces this one
+            self.call(s.left, TAIL_CALL)
+            return
+        self.expression(s.left)
+        if self.main or not self.func.check_return:
+            self.emit(RETURN)
+        else:
+            self.emit(RETURN_CHECKED, self.func.type)
+
+    # ---- expressions
+
+    def expression(self, e):
+        self.expr_dict[type(e)](e)
+
+    def operand(self, e):
+        """
+        (True, slot) for a declared variable, (False, value) for a number or bool
+        literal, a negated one included, and None for anything that needs code
+        """
+        t = type(e)
+        if t == IDExpr:
+            return True, e.slot
+        if t == UnaryOp and type(e.tree) in {IntLitExpr, FloatLitExpr, BoolExpr}:
+            value = self.operand(e.tree)[1]
+            return False, -value if e.op == "-" else not value
+        if t == IntLitExpr:
+            return False, e.intlit
+        if t == FloatLitExpr:
+            return False, e.floatlit
+        if t == BoolExpr:
+            return False, e.bool == "true"
+        if t == Farg:
+            return self.operand(e.farg)
+        return None
+
+    def unary(self, e: UnaryOp):
+        o = self.operand(e)
+        if o is not None:
+            self.emit(CONST, o[1])
+            return
+        self.expression(e.tree)
+        self.emit(UNARY, operator.neg if e.op == "-" else operator.not_)
+
+    def add(self, e: AddExpr):
+        left = self.operand(e.left)
+        right = self.operand(e.right)
+        # a bool constant is a type error, leave it to the generic instruction
+        if right is not None and not right[0] and type(right[1]) == bool:
+            right = None
+        if left is not None and left[0] and right is not None:
+            if right[0]:
+                self.emit(ADD_LL, (left[1], right[1]))
+            else:
+                self.emit(ADD_LC, (left[1], right[1]))
+            return
+        self.expression(e.left)
+        if right is None:
+            self.expression(e.right)
+            self.emit(ADD)
+        elif right[0]:
+            self.emit(ADD_XL, right[1])
+        else:
+            self.emit(ADD_XC, right[1])
+
+    def binary(self, e: BinaryExpr, op: str):
+        fn = binary_funcs[op]
+        left = self.operand(e.left)
+        right = self.operand(e.right)
+        if left is not None and left[0] and right is not None:
+            if right[0]:
+                self.emit(BINARY_LL, (left[1], right[1], fn))
+            else:
+                self.emit(BINARY_LC, (left[1], right[1], fn))
+            return
+        self.expression(e.left)
+        if right is None:
+            self.expression(e.right)
+            self.emit(BINARY, fn)
+        elif right[0]:
+            self.emit(BINARY_XL, (right[1], fn))
+        else:
+            self.emit(BINARY_XC, (right[1], fn))
+
+    # || and && evaluate both sides and require bools, the left one is checked first
+    def logical(self, e: Expr, op: int):
+        self.expression(e.left)
+        self.emit(CHECK_BOOL)
+        self.expression(e.right)
+        self.emit(op)
+
+    def call(self, e: FuncCExpr, op: int = CALL):
+        self.expression(e.left)
+        for arg in e.right:
+            self.expression(arg)
+        if type(e) == MemoCall:
+            self.emit(CALL_MEMO, (str(e.f_id), 1 + len(e.right), e.memo))
+        else:
+            self.emit(op, (str(e.f_id), 1 + len(e.right)))
+
+
+def compile_program(program: Program) -> List[Function]:
+    return [Compiler(f).compile() for f in program.funcs]
+
+
+if __name__ == '__main__':
+    from parser_sluc import Parser
+    for f in compile_program(Parser(sys.argv[1] if len(sys.argv) > 1 else "simple.c").program()):
+        print(f.dis())
+        print()
@@ -0,0 +1,169 @@
+"""
+SLU-C execution governor
+Runs a checked Program on the tree walker under a budget: every executed
+statement is a step and every pass through a loop body a back edge, and
+the run is stopped with an SLUCLimitError once it has taken too many steps,
+too much wall clock time or too much memory
+Programs run without a budget are never rewritten and pay nothing
+"""
+import time
+import tracemalloc
+from typing import Dict, Optional
+
+from ast import *
+from optimizer import Pass
+
+CHECK_EVERY = 1000  # steps between two checks of the clock and the memory
+# a value can double in size each step, when memory is limited it is checked at every one
+MEMORY_CHECK_EVERY = 1
+
+
+class SLUCLimitError(SLUCTypeError):
+    """
+    A run stopped by its budget, stats has the usage up to that point
+    """
+    def __init__(self, message: str, stats: Dict[str, float]):
+        SLUCTypeError.__init__(self, message)
+        self.stats = stats
+
+
+class Governor:
+    """
+    The budget of one run and what it used so far, a limit of None is no limit
+    memory is the bytes allocated by the run, measured with tracemalloc,
+    which slows the run down, so only when it is limited
+    """
+    def __init__(self, steps: Optional[int] = None, seconds: Optional[float] = None,
+                 memory: Optional[int] = None):
+        self.max_steps = steps
+        self.max_seconds = seconds
+        self.max_memory = memory
+        self.every = CHECK_EVERY if memory is None else MEMORY_CHECK_EVERY
+        self.begin()
+
+    def begin(self):
+        """
+        starts the usage over, and the clock
+        """
+        self.steps = 0
+        self.back_edges = 0
+        self.memory = 0
+        self.start = time.perf_counter()
+        self.next_check = self.following()
+
+    def following(self) -> int:
+        # the step of the next check: no later than the step limit
+        step = self.steps + self.every
+        return step if self.max_steps is None else min(step, self.max_steps + 1)
+
+    def check(self):
+        """
+        raises SLUCLimitError when a limit is exceeded, called every self.every steps
+        limits are checked between statements, a single one is never interrupted
+        """
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.stop("ERROR: step limit of {} exceeded".format(self.max_steps))
+        if self.max_seconds is not None and time.perf_counter() - self.start > self.max_seconds:
+            self.stop("ERROR: time limit of {}s exceeded".format(self.max_seconds))
+        if self.max_memory is not None:
+            self.memory = max(self.memory, tracemalloc.get_traced_memory()[1])
+            if self.memory > self.max_memory:
+                self.stop("ERROR: memory limit of {} bytes exceeded".format(self.max_memory))
+        self.next_check = self.following()
+
+    def stop(self, message: str):
+        raise SLUCLimitError(message, self.stats())
+
+    def stats(self) -> Dict[str, float]:
+        if self.max_memory is not None and tracemalloc.is_tracing():
+            self.memory = max(self.memory, tracemalloc.get_traced_memory()[1])
+        return {
+            "steps": self.steps,
+            "back_edges": self.back_edges,
+            "seconds": time.perf_counter() - self.start,
+            "peak_bytes": self.memory,
+        }
+
+
+class Step(Statement):
+    """
+    Runs a statement after charging one step
+    """
+    __slots__ = ("stmt", "governor")
+
+    def __init__(self, stmt, governor: Governor):
+        self.stmt = stmt
+        self.governor = governor
+        self.line = stmt.line
+
+    def format(self, level: int) -> str:
+        return self.stmt.format(level)
+
+    def eval(self, global_env, env):
+        governor = self.governor
+        governor.steps += 1
+        if governor.steps >= governor.next_check:
+            governor.check()
+        return self.stmt.eval(global_env, env)
+
+
+class BackEdge(Step):
+    """
+    The body of a loop, each run of it is a back edge and a step
+    """
+    __slots__ = ()
+
+    def eval(self, global_env, env):
+        governor = self.governor
+        governor.back_edges += 1
+        governor.steps += 1
+        if governor.steps >= governor.next_check:
+            governor.check()
+        return self.stmt.eval(global_env, env)
+
+
+class Govern(Pass):
+    """
+    Wraps every statement but blocks in a Step and every loop body in a BackEdge
+    """
+    def __init__(self, func: FunctionDef, governor: Governor):
+        Pass.__init__(self, func)
+        self.governor = governor
+        for cls in list(self.stmt_dict):
+            if cls != BlockStatement:
+                self.rules[cls] = self.step
+        self.stmt_dict[Declaration] = self.declaration
+        self.stmt_dict[WhileStatement] = self.loop
+
+    # Declaration.eval tests for an AssignmentStatement, the declaration is charged instead
+    def declaration(self, d: Declaration):
+        if isinstance(d.right, AssignmentStatement):
+            d.right.right = self.expression(d.right.right)
+        return d
+
+    def loop(self, s: WhileStatement):
+        s.left = self.expression(s.left)
+        s.right = BackEdge(self.statement(s.right), self.governor)
+        return s
+
+    def step(self, s):
+        return Step(s, self.governor)
+
+
+def run(program: Program, governor: Governor, out: Sink = None) -> Dict[str, float]:
+    """
+    instruments a checked Program and runs it on the tree walker under
+    the governor's budget, in place, and returns the usage
+    """
+    for f in program.funcs:
+        Govern(f, governor).run()
+    tracing = governor.max_memory is not None and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    try:
+        governor.begin()
+        program.eval(out)
+        return governor.stats()
+    finally:
+        if tracing:
+            tracemalloc.stop()
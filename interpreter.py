@@ -1,17 +1,143 @@
 from parser_sluc import *
-if __name__ == '__main__':
-    if len(sys.argv) > 1:
-        p = Parser(sys.argv[1])
+from cache import CodeCache, ParseCache
+from checker import check
+from optimizer import optimize
+from memo import DEFAULT_SIZE, memoize
+from output import BUFFER_SIZE, FLUSH_POLICIES, Sink, sink
+import argparse
+from typing import Optional, TextIO
+import vm
+from vm import RECURSION_LIMIT
+import closures
+import governor
+import profiler
+import transpiler
+
+
+def arguments() -> argparse.ArgumentParser:
+    argp = argparse.ArgumentParser(description="run a SLU-C program")
+    argp.add_argument("file", nargs="?", default="simple.c")
+    argp.add_argument("--no-cache", action="store_true", help="always lex, parse and compile, skip the caches")
+    argp.add_argument("--cache-dir", help="cache directory, default $SLUC_CACHE_DIR or ~/.cache/sluc")
+    argp.add_argument("--engine", choices=["tree", "vm", "closure", "python"], default="tree",
+                      help="run by walking the tree, as bytecode on the virtual machine, as compiled closures"
+                           " or transpiled to Python")
+    argp.add_argument("-O", "--optimize", action="store_true",
+                      help="fold constants, drop dead code and simplify identities before running")
+    argp.add_argument("--recursion-limit", type=int, default=RECURSION_LIMIT,
+                      help="deepest call nesting on the vm engine, which keeps its frames off the"
+                           " Python stack, default {}".format(RECURSION_LIMIT))
+    argp.add_argument("--buffer-size", type=int, default=BUFFER_SIZE,
+                      help="characters of output held before they are written, default {}".format(BUFFER_SIZE))
+    argp.add_argument("--flush", choices=FLUSH_POLICIES, default="auto",
+                      help="write the output when the buffer is full, at every line end,"
+                           " or by line on a terminal only (auto)")
+    argp.add_argument("--memo", action="store_true",
+                      help="keep the results of functions that never print and answer repeated calls from them")
+    argp.add_argument("--memo-size", type=int, default=DEFAULT_SIZE,
+                      help="results kept per function, default {}".format(DEFAULT_SIZE))
+    argp.add_argument("--memo-stats", action="store_true", help="print the memo hits and misses to stderr")
+    argp.add_argument("--profile", action="store_true",
+                      help="count the calls and time of every function and the statements run on every line,"
+                           " report them to stderr; runs on the tree engine")
+    argp.add_argument("--profile-stacks", metavar="FILE",
+                      help="with --profile, write the call paths and their time in collapsed stack format")
+    argp.add_argument("--max-steps", type=int, help="stop the program after this many statements")
+    argp.add_argument("--max-seconds", type=float, help="stop the program after this much wall clock time")
+    argp.add_argument("--max-memory", type=int, metavar="BYTES",
+                      help="stop the program once it allocated this much, tracking it slows the run down")
+    return argp
+
+
+def limited(args) -> bool:
+    return args.max_steps is not None or args.max_seconds is not None or args.max_memory is not None
+
+
+def validate(args) -> Optional[str]:
+    """
+    what is wrong with a combination of arguments, None when nothing is
+    """
+    if (args.profile or limited(args)) and args.engine != "tree":
+        return "--profile and the limits run on the tree engine"
+    if args.profile and limited(args):
+        return "--profile cannot be combined with the limits"
+    if args.recursion_limit != RECURSION_LIMIT and args.engine != "vm":
+        return "--recursion-limit runs on the vm engine"
+    return None
+
+
+def load(args) -> Program:
+    """
+    the parsed program of args.file, from the parse cache unless args.no_cache
+    """
+    if args.no_cache:
+        return Parser(args.file).program()
+    return ParseCache(args.cache_dir).parse(args.file)
+
+
+def execute(t: Program, args, out: Sink, report: TextIO = None):
+    """
+    checks and runs t the way args say, the program's output goes to out
+    and the memo stats and the profile to report, by default stderr
+    """
+    report = sys.stderr if report is None else report
+    check(t)
+    if args.optimize:
+        optimize(t)
+    memos = memoize(t, args.memo_size) if args.memo else {}
+    if args.profile:
+        profile = profiler.Profile()
+        try:
+            profiler.run(t, out, profile)
+        finally:
+            with open(args.file) as f:
+                report.write(profile.report(f.read().splitlines()))
+            if args.profile_stacks:
+                with open(args.profile_stacks, "w") as f:
+                    f.write(profile.collapsed())
+    elif limited(args):
+        governor.run(t, governor.Governor(args.max_steps, args.max_seconds, args.max_memory), out)
+    elif args.engine == "vm":
+        vm.run(t, args.recursion_limit, out)
+    elif args.engine == "closure":
+        closures.run(t, out)
+    elif args.engine == "python":
+        transpiler.run(t, None if args.no_cache else CodeCache(args.cache_dir), out)
     else:
-        p = Parser("simple.c")
+        t.eval(out)
+    if args.memo_stats:
+        for m in memos.values():
+            print(m, file=report)
+
+
+if __name__ == '__main__':
+    argp = arguments()
+    args = argp.parse_args()
+    problem = validate(args)
+    if problem:
+        argp.error(problem)
 
     try:
-        t = p.program()
-        t.eval()
+        t = load(args)
+    except SLUCIOError as e:
+        print(str(e))
+        print("Exiting")
+        sys.exit(1)
     except SLUCSyntaxError as e:
         print(str(e))
         sys.exit()
 
+    try:
+        execute(t, args, sink(args.buffer_size, args.flush))
+    except SLUCSyntaxError as e:
+        print(str(e))
+        sys.exit()
+
+    except governor.SLUCLimitError as e:
+        print(str(e))
+        print(", ".join("{} {}".format(k, v) for k, v in e.stats.items()), file=sys.stderr)
+        sys.exit(1)
+
     except SLUCTypeError as e:
         print(str(e))
         sys.exit()
@@ -3,7 +3,9 @@ Lexer Project
 Peixuan,Xin,Jiusheng hi
 '''
 import sys
-from typing import Generator, Tuple
+import mmap
+from array import array
+from typing import Generator, Iterator, List, Tuple, Union
 import re
 
 
@@ -11,6 +13,7 @@ class Token:
     '''
     this class includes all kind of tokens
     '''
+    __slots__ = ("kind", "name", "loc")
 
     # define the possible tokens
 
@@ -81,78 +84,348 @@ class Token:
         rightShift: "shift right",
         expo : "expo"
     }
+    # keywords are matched as IDs first and then looked up in this set
+    keywords = {"bool", "else", "if", "print", "false", "true", "int", "main", "while", "char", "float", "return"}
+    # every pattern above in token_dict order folded into one compiled pattern, built below the class
+    classifier = None
+    classifier_kinds = {}
+
     '''
     constructor take the token and the location
     precondition for t: t must be a string
     precondition for loc: loc must be a integer
+    kind can be passed by a scanner that already knows it
     '''
-    def __init__(self, t:str, loc:int):
-        if self.find_matches(Token.token_dict, t):
-            self.kind = self.find_matches(Token.token_dict, t)
-        else:
-            self.kind = "illegal token"
+    def __init__(self, t:str, loc:int, kind:str=None):
+        self.kind = kind if kind else Token.classify(t)
         self.name = t
         self.loc = loc
 
-
     '''
-    match the kind of token in the dictionary
-    d represents a dictionary
+    match the kind of a lexeme with a single fullmatch of the classifier
     '''
-    def find_matches(self, d, item):
-        for k in d:
-            if re.fullmatch(k, item):
-                return d[k]
+    @staticmethod
+    def classify(item: str) -> str:
+        m = Token.classifier.fullmatch(item)
+        if not m:
+            return "illegal token"
+        kind = Token.classifier_kinds[m.lastgroup]
+        if kind == "ID" and item in Token.keywords:
+            return "Keyword"
+        return kind
+
+
+Token.classifier = re.compile("|".join(
+    "(?P<k{}>{})".format(i, p) for i, p in enumerate(Token.token_dict) if p != Token.keyword))
+Token.classifier_kinds = {"k{}".format(i): k for i, k in enumerate(Token.token_dict.values())}
+# small-int codes for every kind, used by TokenStream
+Token.kinds = list(dict.fromkeys(Token.token_dict.values())) + ["illegal token"]
+Token.kind_codes = {k: i for i, k in enumerate(Token.kinds)}
+
+
+class SourceToken(Token):
+    """
+    Token whose lexeme stays an offset range into the source buffer
+    until its name is read
+    """
+    __slots__ = ("source", "start", "end")
+
+    def __init__(self, source, start: int, end: int, loc: int, kind: str):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.loc = loc
+        self.kind = kind
+
+    @property
+    def name(self) -> str:
+        return lexeme(self.source, self.start, self.end)
+
+
+# decode source[start:end], the source being a str or any bytes-like buffer
+def lexeme(source, start: int, end: int) -> str:
+    t = source[start:end]
+    if type(t) is str:
+        return t
+    return str(t, Lexer.encoding)
+
+
+class TokenStream:
+    """
+    Compact token stream: kind codes, line numbers and lexeme offsets into the
+    source text are kept in parallel arrays instead of one Token per lexeme
+    """
+    __slots__ = ("source", "kinds", "lines", "starts", "ends")
+
+    def __init__(self, source):
+        offset = "I" if len(source) < 2 ** 32 else "Q"
+        self.source = source
+        self.kinds = array("B")
+        self.lines = array("I")
+        self.starts = array(offset)
+        self.ends = array(offset)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def kind(self, i: int) -> str:
+        return Token.kinds[self.kinds[i]]
+
+    def name(self, i: int) -> str:
+        return lexeme(self.source, self.starts[i], self.ends[i])
+
+    def __getitem__(self, i: int) -> Token:
+        return Token(self.name(i), self.lines[i], self.kind(i))
+
+    # tokens are only built while iterating, followed by EOF like token_generator
+    def __iter__(self) -> Iterator[Token]:
+        for block in self.blocks(Lexer.block_size):
+            yield from block
+
+    # tokens built a list at a time, the last list ends with EOF
+    def blocks(self, size: int) -> Generator[List[Token], None, None]:
+        kinds = Token.kinds
+        source = self.source
+        for i in range(0, len(self.kinds), size):
+            j = i + size
+            block = [SourceToken(source, start, end, line, kinds[code]) for code, line, start, end in
+                     zip(self.kinds[i:j], self.lines[i:j], self.starts[i:j], self.ends[i:j])]
+            if j >= len(self.kinds):
+                block.append(Token("EOF", -1))
+            yield block
+        if not len(self.kinds):
+            yield [Token("EOF", -1)]
 
 
 class Lexer:
     """
     Lexer class to reads a file, splits and generates tokens
     """
+    encoding = "utf-8"
 
     #  constructor that takes a file name and split them into tokens
-    def __init__(self, fn: str):
+    #  use from_string, from_bytes or from_mmap for sources that are not read line by line
+    def __init__(self, fn: str = None):
+        self.f = None
+        self.source = None
+        self.line = 1  # line number of the first line
+        if fn is not None:
+            try:
+                self.f = open(fn)
+            except IOError:
+                raise SLUCIOError("File {} not found".format(fn))
+
+    # lex a str that is already in memory, line is the number of its first line
+    @classmethod
+    def from_string(cls, text: str, line: int = 1) -> "Lexer":
+        lex = cls()
+        lex.source = text
+        lex.line = line
+        return lex
+
+    # lex a bytes, bytearray, memoryview or mmap buffer in place
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, bytearray, memoryview, mmap.mmap], line: int = 1) -> "Lexer":
+        lex = cls()
+        if isinstance(data, memoryview):
+            data = data.cast("B")
+        lex.source = data
+        lex.line = line
+        return lex
+
+    # lex a file through a read only memory map instead of reading it
+    @classmethod
+    def from_mmap(cls, fn: str) -> "Lexer":
         try:
-            self.f = open(fn)
+            with open(fn, "rb") as f:
+                if f.seek(0, 2) == 0:
+                    return cls.from_bytes(b"")  # an empty file can't be mapped
+                return cls.from_bytes(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
         except IOError:
-            print("File {} not found".format(fn))
-            print("Exiting")
-            sys.exit(1)  # can't go on
+            raise SLUCIOError("File {} not found".format(fn))
+
+    # separators that split a line, in the order they are tried, labelled with their token kind;
+    # None marks text that is dropped (newlines, spaces and comments)
+    separators = [
+        (r'"(?:[^\\"\n]|\\.)*"', "String"),
+        (r"\n", None),
+        (r"[^\S\n]+", None),
+        (r"[ \t]*//.*$", None),
+        (r"\|\|", "or"),
+        (r"&&", "and"),
+        (r"==", "equal-equal"),
+        (r"!=", "not-equal"),
+        (r"(?<!<)<(?![<=])", "less-than"),
+        (r"<=", "less-equal"),
+        (r"(?<!>)>(?![>=])", "greater-than"),
+        (r"<<", "shift left"),
+        (r">>", "shift right"),
+        (r">=", "greater-equal"),
+        (r"=", "assignment"),
+        (r"(?<!e)\+", "plus"),
+        (r"(?<!e)-", "minus"),
+        (r"\*\*", "expo"),
+        (r"\*", "multiply"),
+        (r"/", "divide"),
+        (r"%", "mod"),
+        (r"!", "negate"),
+        (r";", "semicolon"),
+        (r",", "comma"),
+        (r"\{", "left-brace"),
+        (r"\}", "right-brace"),
+        (r"\(", "left-paren"),
+        (r"\)", "right-paren"),
+    ]
+    separator_patt = "|".join(p for p, _ in separators)
+
+    # split and classify in one pass: a separator, or a word running up to the next separator
+    master_patt = re.compile("|".join(
+        ["(?P<s{}>{})".format(i, p) for i, (p, _) in enumerate(separators)] +
+        ["(?P<word>(?:(?!{}).)+)".format(separator_patt)]), re.MULTILINE)
+    # the same pattern for bytes-like sources
+    master_bytes_patt = re.compile(master_patt.pattern.encode("ascii"), re.MULTILINE)
+    group_kinds = {"s{}".format(i): k for i, (_, k) in enumerate(separators)}
+    newline_group = "s1"
+
+    # master pattern and word classifier for the kind of source being lexed
+    @staticmethod
+    def scanner(source):
+        if isinstance(source, str):
+            return Lexer.master_patt.finditer, Token.classify
+        return Lexer.master_bytes_patt.finditer, lambda w: Token.classify(str(w, Lexer.encoding))
+
+    # tokens are handed out in lists of about this many
+    block_size = 256
 
     # method for generate tokens
     def token_generator(self) -> Generator[Token, None, None]:
-        split_patt = re.compile(
-            r"""             # Split on 
-              ("(?:[^\\\"]|\\.)*")|   #string
-              \s           |          #space 
-               [ \t]*//.*$ |          # comments start with a //
-               (\|\|)       |         # and operators
-               (&&)         | 
-               (==)         |  
-               (!=) | ((?<!<)<(?![<=]))  | (<=) |((?<!>)>(?![>=]))  |   (<<)    |
-               (>>)|(>=) |(=)|
-               ((?<!e)\+)   |
-               ((?<!e)-)    |
-               (\*?\*) |(\/) |(\%) |
-               (\! ) |
-               (\; |\, |\{ |\} |\( |\)) # punctuation
-            """,
-            re.VERBOSE
-        )
-
-        index = 0  # line number
+        for block in self.token_blocks():
+            yield from block
+
+    # lists of tokens, the last list ends with EOF
+    def token_blocks(self, size: int = 0) -> Generator[List[Token], None, None]:
+        if self.source is not None:
+            yield from self.source_blocks(size or Lexer.block_size)
+            return
+        size = size or Lexer.block_size
+        group_kinds = Lexer.group_kinds
+        words = {}  # word -> kind, identifiers and literals repeat a lot
+        scan = Lexer.master_patt.finditer
+        block = []
+        append = block.append
+
+        index = self.line - 1  # line number
         for line in self.f:
             index += 1
-            tokens = (t for t in split_patt.split(line) if t)
-            for t in tokens:
-                yield Token(t, index)
+            for m in scan(line):
+                group = m.lastgroup
+                if group == "word":
+                    t = m.group()
+                    kind = words.get(t)
+                    if kind is None:
+                        kind = words[t] = Token.classify(t)
+                else:
+                    kind = group_kinds[group]
+                    if not kind:
+                        continue
+                    t = m.group()
+                append(Token(t, index, kind))
+                if len(block) >= size:
+                    yield block
+                    block = []
+                    append = block.append
+
+        append(Token("EOF", -1))
+        yield block
+
+    # tokens of an in-memory source; lexemes are not copied out of the buffer
+    def source_blocks(self, size: int) -> Generator[List[Token], None, None]:
+        source = self.source
+        group_kinds = Lexer.group_kinds
+        newline = Lexer.newline_group
+        scan, classify = Lexer.scanner(source)
+        words = {}
+        block = []
+        append = block.append
+
+        index = self.line  # line number
+        for m in scan(source):
+            group = m.lastgroup
+            if group == "word":
+                t = m.group()
+                kind = words.get(t)
+                if kind is None:
+                    kind = words[t] = classify(t)
+            elif group == newline:
+                index += 1
+                continue
+            else:
+                kind = group_kinds[group]
+                if not kind:
+                    continue
+            start, end = m.span()
+            append(SourceToken(source, start, end, index, kind))
+            if len(block) >= size:
+                yield block
+                block = []
+                append = block.append
+
+        append(Token("EOF", -1))
+        yield block
+
+    # lex the whole source at once into a TokenStream
+    def tokenize(self) -> TokenStream:
+        source = self.f.read() if self.source is None else self.source
+        stream = TokenStream(source)
+        kinds, lines, starts, ends = stream.kinds, stream.lines, stream.starts, stream.ends
+        codes = Token.kind_codes
+        group_codes = {g: codes[k] for g, k in Lexer.group_kinds.items() if k}
+        newline = Lexer.newline_group
+        scan, classify = Lexer.scanner(source)
+        words = {}  # word -> kind code
+
+        index = self.line  # line number
+        for m in scan(source):
+            group = m.lastgroup
+            if group == "word":
+                t = m.group()
+                code = words.get(t)
+                if code is None:
+                    code = words[t] = codes[classify(t)]
+            elif group == newline:
+                index += 1
+                continue
+            else:
+                code = group_codes.get(group)
+                if code is None:
+                    continue
+            start, end = m.span()
+            kinds.append(code)
+            lines.append(index)
+            starts.append(start)
+            ends.append(end)
+        return stream
+
+
+# create our own exception by inheriting
+# from Python's exception
+class SLUCIOError(Exception):
+    def __init__(self, message: str):
+        Exception.__init__(self)
+        self.message = message
 
-        yield Token("EOF", -1)
+    def __str__(self):
+        return self.message
 
 
 if __name__ == "__main__":
 
-    lex = Lexer("lexertest.c")
+    try:
+        lex = Lexer(sys.argv[1] if len(sys.argv) > 1 else "lexertest.c")
+    except SLUCIOError as e:
+        print(str(e))
+        print("Exiting")
+        sys.exit(1)  # can't go on
     g = lex.token_generator()
 
     # formatted print the token table
@@ -0,0 +1,147 @@
+"""
+SLU-C memoization
+Finds the pure functions of a checked Program, those that can never print
+and only call pure functions, and turns every call of one into a MemoCall
+that keeps the function's results in a bounded LRU table keyed by the
+arguments, so a repeated call returns without running the body
+A function only sees its arguments, so without printing its result and its
+errors depend on nothing else; errors are never kept and raise again
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Set
+
+from ast import *
+from optimizer import Pass
+
+DEFAULT_SIZE = 1024
+MISSING = object()  # Memo.get of a key that is not kept
+
+
+class Memo:
+    """
+    Results of one pure function, the least recently used is dropped
+    when more than size are kept
+    """
+    def __init__(self, name: str, size: int = DEFAULT_SIZE):
+        self.name = name
+        self.size = size
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, k: tuple):
+        """
+        the value kept for key k, or MISSING
+        """
+        table = self.table
+        if k in table:
+            self.hits += 1
+            table.move_to_end(k)
+            return table[k]
+        self.misses += 1
+        return MISSING
+
+    def put(self, k: tuple, value):
+        table = self.table
+        table[k] = value
+        if len(table) > self.size:
+            table.popitem(last=False)
+
+    def call(self, fn: Callable[[list], object], args):
+        """
+        fn(args), or its value from an earlier call with the same arguments
+        """
+        k = key(args)
+        value = self.get(k)
+        if value is MISSING:
+            value = fn(args)
+            self.put(k, value)
+        return value
+
+    def __str__(self):
+        return "{}: {} hits, {} misses, {} kept".format(self.name, self.hits, self.misses, len(self.table))
+
+
+def key(args) -> tuple:
+    """
+    the table key of an argument list: 1, 1.0 and true are equal in Python
+    and so are 0.0 and -0.0, but a function may tell them apart
+    """
+    return tuple([(type(a), repr(a) if type(a) == float and not a else a) for a in args])
+
+
+class Effects(Pass):
+    """
+    Collects whether a function prints and the names it calls
+    """
+    def __init__(self, func: FunctionDef):
+        Pass.__init__(self, func)
+        self.prints = False
+        self.callees: Set[str] = set()
+        self.rules[PrintStatement] = self.printing
+        self.rules[FuncCExpr] = self.calling
+        self.rules[MemoCall] = self.calling
+
+    def printing(self, s: PrintStatement):
+        self.prints = True
+        return s
+
+    def calling(self, e: FuncCExpr):
+        self.callees.add(str(e.f_id))
+        return e
+
+
+class Memoize(Pass):
+    """
+    Turns the calls of the functions in memos into MemoCalls,
+    and MemoCalls of any other function back into plain calls
+    """
+    def __init__(self, func: FunctionDef, memos: Dict[str, Memo]):
+        Pass.__init__(self, func)
+        self.memos = memos
+        self.rules[FuncCExpr] = self.call_node
+        self.rules[MemoCall] = self.call_node
+
+    def call_node(self, e: FuncCExpr):
+        memo = self.memos.get(str(e.f_id))
+        if memo is None:
+            return e if type(e) == FuncCExpr else FuncCExpr(e.f_id, e.left, e.right)
+        node = MemoCall(e.f_id, e.left, e.right)
+        node.memo = memo
+        return node
+
+
+def pure_functions(program: Program) -> Set[str]:
+    """
+    names of the functions that can never print, main and names
+    defined twice are left out
+    """
+    names = [str(f.id) for f in program.funcs]
+    effects = {}
+    for f in program.funcs:
+        name = str(f.id)
+        if name != "main" and names.count(name) == 1:
+            effects[name] = Effects(f)
+            effects[name].run()
+    # a function is impure when it prints or calls one that may, repeat until none changes
+    pure = {name for name, e in effects.items() if not e.prints}
+    changed = True
+    while changed:
+        changed = False
+        for name in list(pure):
+            if not effects[name].callees <= pure:
+                pure.discard(name)
+                changed = True
+    return pure
+
+
+def memoize(program: Program, size: int = DEFAULT_SIZE) -> Dict[str, Memo]:
+    """
+    gives every pure function of a checked Program a new memo of size
+    results and makes its calls go through it, in place
+    returns the memos by function name
+    """
+    memos = {name: Memo(name, size) for name in sorted(pure_functions(program))}
+    for f in program.funcs:
+        Memoize(f, memos).run()
+    return memos
@@ -0,0 +1,405 @@
+"""
+SLU-C optimizer
+Rewrites a checked Program before it runs, for either engine: constant
+subtrees are folded into literals, if arms and while loops that can never
+run are removed, and arithmetic and boolean identities are simplified
+Every pass keeps the output and the errors of the program it was given
+"""
+from typing import List, Optional, Set
+
+from ast import *
+from checker import LITERALS, NUMBERS, assigned_reads, returns
+
+ASSIGNMENTS = (AssignmentStatement, StoreAssignment, IntAssignment, FloatAssignment)
+
+MAX_EXPONENT = 64   # bigger powers are left for run time, they may never be computed
+
+
+class Pass:
+    """
+    One bottom up rewrite of a function: the children of a node are
+    rewritten first, then the pass's rule for the node's class, if it
+    has one, returns the node to use in its place
+    """
+    def __init__(self, func: FunctionDef):
+        self.func = func
+        self.changed = False
+        self.rules = {}     # node class -> rule
+
+        #  statement and expression dictionaries, keyed by node class
+        self.stmt_dict = {
+            Statement: lambda s: s,
+            Declaration: self.declaration,
+            PrintStatement: self.printstmt,
+            WhileStatement: self.whilestmt,
+            IfStatement: self.ifstmt,
+            BlockStatement: self.block,
+            ReturnStatement: self.returnstmt,
+            ConstAssignment: lambda s: s,
+        }
+        for cls in ASSIGNMENTS:
+            self.stmt_dict[cls] = self.assignment
+        self.expr_dict = {
+            IDExpr: lambda e: e,
+            Farg: self.farg,
+            UnaryOp: self.unary,
+            FuncCExpr: self.call,
+            MemoCall: self.call,
+        }
+        for cls in LITERALS:
+            self.expr_dict[cls] = lambda e: e
+        for cls in (Expr, BoolOr, ConjExpr, BoolAnd, EqExpr, RelatExpr, AddExpr, IntAdd, FloatAdd, MultExpr, ExpoExpr):
+            self.expr_dict[cls] = self.binary
+
+    def run(self) -> bool:
+        f = self.func
+        f.decls = [self.statement(d) for d in f.decls]
+        f.stmts = [self.statement(s) for s in f.stmts]
+        return self.changed
+
+    def rewrite(self, node):
+        rule = self.rules.get(type(node))
+        if rule is None:
+            return node
+        new = rule(node)
+        if new is not node:
+            self.changed = True
+        return new
+
+    # ---- statements
+
+    def statement(self, s):
+        return self.rewrite(self.stmt_dict[type(s)](s))
+
+    def declaration(self, d: Declaration):
+        if isinstance(d.right, AssignmentStatement):
+            d.right = self.statement(d.right)
+        return d
+
+    def assignment(self, s: AssignmentStatement):
+        s.right = self.expression(s.right)
+        return s
+
+    def printstmt(self, s: PrintStatement):
+        s.prtarg = self.expression(s.prtarg)
+        s.prtargs = [self.expression(arg) for arg in s.prtargs]
+        return s
+
+    def whilestmt(self, s: WhileStatement):
+        s.left = self.expression(s.left)
+        s.right = self.statement(s.right)
+        return s
+
+    def ifstmt(self, s: IfStatement):
+        s.expr = self.expression(s.expr)
+        s.stmt = self.statement(s.stmt)
+        if s.elsestmt:
+            s.elsestmt = self.statement(s.elsestmt)
+        return s
+
+    def block(self, s: BlockStatement):
+        s.left = self.statement(s.left)
+        s.right = [self.statement(arg) for arg in s.right]
+        return s
+
+    def returnstmt(self, s: ReturnStatement):
+        s.left = self.expression(s.left)
+        return s
+
+    # ---- expressions
+
+    def expression(self, e):
+        return self.rewrite(self.expr_dict[type(e)](e))
+
+    def farg(self, e: Farg):
+        e.farg = self.expression(e.farg)
+        return e
+
+    def unary(self, e: UnaryOp):
+        e.tree = self.expression(e.tree)
+        return e
+
+    # ||, && and the relational operators may have no right side
+    def binary(self, e: Expr):
+        e.left = self.expression(e.left)
+        if e.right:
+            e.right = self.expression(e.right)
+        return e
+
+    def call(self, e: FuncCExpr):
+        e.left = self.expression(e.left)
+        e.right = [self.expression(arg) for arg in e.right]
+        return e
+
+
+class FoldConstants(Pass):
+    """
+    Evaluates operators whose operands are all literals, with the node's own
+    eval so the result is exactly what running it gives; operators that
+    raise are left to raise at run time
+    """
+    def __init__(self, func: FunctionDef):
+        Pass.__init__(self, func)
+        for cls in (UnaryOp, Expr, BoolOr, ConjExpr, BoolAnd, EqExpr, RelatExpr,
+                    AddExpr, IntAdd, FloatAdd, MultExpr, ExpoExpr):
+            self.rules[cls] = self.fold
+        for cls in ASSIGNMENTS:
+            self.rules[cls] = self.assignment_value
+
+    def fold(self, e: Expr):
+        operands = [e.tree] if type(e) == UnaryOp else [e.left] + ([e.right] if e.right else [])
+        if not all(type(arg) in LITERALS for arg in operands):
+            return e
+        try:
+            if type(e) == ExpoExpr and not abs(operands[1].eval()) <= MAX_EXPONENT:
+                return e
+            return literal(e.eval({}, [])) or e
+        except (SLUCTypeError, ArithmeticError, TypeError, ValueError):
+            return e
+
+    def assignment_value(self, s: AssignmentStatement):
+        """
+        an assignment of a folded value stores a constant, converted the way
+        the value was before folding: a folded literal is not a literal of the source
+        """
+        if type(s.right) not in (IntLitExpr, FloatLitExpr, BoolExpr):
+            return s
+        probe = type(s)(s.left, Farg(s.right))
+        probe.slot = s.slot
+        probe.type = s.type
+        frame = [None] * (s.slot + 1)
+        try:
+            probe.eval({}, frame)
+        except (SLUCTypeError, ArithmeticError, ValueError):
+            return s
+        node = ConstAssignment(s.left, literal(frame[s.slot]))
+        node.line = s.line
+        node.slot = s.slot
+        node.type = s.type
+        node.value = frame[s.slot]
+        return node
+
+
+class PruneDeadCode(Pass):
+    """
+    Replaces an if with a literal condition by the arm that runs, drops while
+    loops whose condition is a false literal, empty statements, and statements
+    after one that always returns
+    """
+    def __init__(self, func: FunctionDef):
+        Pass.__init__(self, func)
+        self.rules[IfStatement] = self.ifarm
+        self.rules[WhileStatement] = self.loop
+        self.rules[BlockStatement] = self.live_block
+
+    def run(self) -> bool:
+        Pass.run(self)
+        stmts = live(self.func.stmts)
+        if len(stmts) != len(self.func.stmts):
+            self.func.stmts = stmts
+            self.changed = True
+        return self.changed
+
+    def ifarm(self, s: IfStatement):
+        if type(s.expr) not in LITERALS:
+            return s
+        if s.expr.eval():
+            return s.stmt
+        return s.elsestmt or Statement(";")
+
+    def loop(self, s: WhileStatement):
+        if type(s.left) in LITERALS and not s.left.eval():
+            return Statement(";")
+        return s
+
+    def live_block(self, s: BlockStatement):
+        stmts = [s.left] + list(s.right)
+        kept = live(stmts)
+        if len(kept) == len(stmts):
+            return s
+        if not kept:
+            return Statement(";")
+        return BlockStatement(kept[0], kept[1:])
+
+
+class Simplify(Pass):
+    """
+    Algebraic identities that hold for the operand's static type:
+    x + 0, x * 1, x * 0 for pure ints, x ** 1, x && true, x || false,
+    and double negation
+    A local holds None until it is assigned, and None makes the operation fail,
+    so x only goes in place of one when it is known to have a value
+    """
+    def __init__(self, func: FunctionDef):
+        Pass.__init__(self, func)
+        self.assigned = assigned_reads(func)
+        self.rules[IntAdd] = self.add
+        self.rules[MultExpr] = self.mult
+        self.rules[ExpoExpr] = self.expo
+        self.rules[BoolAnd] = lambda e: self.logical(e, True)
+        self.rules[BoolOr] = lambda e: self.logical(e, False)
+        self.rules[UnaryOp] = self.unary_pair
+
+    def typeof(self, e) -> Optional[str]:
+        return static_type(e, self.func)
+
+    def defined(self, e) -> bool:
+        return defined(e, self.assigned)
+
+    # both sides of an IntAdd are ints, and x + 0 is x for ints only: -0.0 + 0 is 0.0
+    def add(self, e: IntAdd):
+        if is_value(e.right, 0) and self.defined(e.left):
+            return e.left
+        if is_value(e.left, 0) and self.defined(e.right):
+            return e.right
+        return e
+
+    def mult(self, e: MultExpr):
+        if e.op == "%":
+            return e
+        pairs = [(e.left, e.right)] if e.op == "/" else [(e.left, e.right), (e.right, e.left)]
+        for x, c in pairs:
+            if not self.defined(x):
+                continue
+            t = self.typeof(x)
+            one = type(c) == IntLitExpr and c.intlit == 1 or type(c) == FloatLitExpr and c.floatlit == 1
+            if one and (t == "float" or t == "int" and e.op == "*" and type(c) == IntLitExpr):
+                return x
+            if e.op == "*" and t == "int" and type(c) == IntLitExpr and c.intlit == 0 and pure(x, self.assigned):
+                return c
+        return e
+
+    def expo(self, e: ExpoExpr):
+        if type(e.right) == IntLitExpr and e.right.intlit == 1 and self.typeof(e.left) in ("int", "float") \
+                and self.defined(e.left):
+            return e.left
+        return e
+
+    # both sides are proven bools and both are evaluated, so only the literal may go
+    def logical(self, e: Expr, identity: bool):
+        if is_value(e.right, identity):
+            return e.left
+        if is_value(e.left, identity):
+            return e.right
+        return e
+
+    def unary_pair(self, e: UnaryOp):
+        inner = e.tree
+        if type(inner) != UnaryOp or inner.op != e.op or not self.defined(inner.tree):
+            return e
+        t = self.typeof(inner.tree)
+        if e.op == "-" and t in ("int", "float") or e.op != "-" and t == "bool":
+            return inner.tree
+        return e
+
+
+# the passes in the order they run, repeated until none changes anything
+PASSES = [FoldConstants, PruneDeadCode, Simplify]
+
+
+def literal(value) -> Optional[Expr]:
+    """
+    the literal node for an int, float or bool value, None for any other value
+    """
+    if type(value) == bool:
+        return BoolExpr("true" if value else "false")
+    if type(value) == int:
+        return IntLitExpr(str(value))
+    if type(value) == float:
+        return FloatLitExpr(repr(value))
+    return None
+
+
+def is_value(e, value) -> bool:
+    return type(e) in (IntLitExpr, BoolExpr) and type(e.eval()) == type(value) and e.eval() == value
+
+
+def pure(e, assigned: Set[int]) -> bool:
+    """
+    whether evaluating e can neither fail nor print, assigned are
+    the reads of variables that have a value, see assigned_reads
+    """
+    if type(e) in LITERALS:
+        return True
+    if type(e) == IDExpr:
+        return id(e) in assigned
+    if type(e) in (IntAdd, FloatAdd) or type(e) == MultExpr and e.op == "*":
+        return pure(e.left, assigned) and pure(e.right, assigned)
+    if type(e) == UnaryOp:
+        return pure(e.tree, assigned)
+    return False
+
+
+def defined(e, assigned: Set[int]) -> bool:
+    """
+    whether e never evaluates to None: a variable read in assigned, or an
+    operation that fails on None; a call may end without a return
+    """
+    cls = type(e)
+    if cls == IDExpr:
+        return id(e) in assigned
+    if cls == Farg:
+        return defined(e.farg, assigned)
+    if cls in (BoolAnd, BoolOr):
+        return defined(e.left, assigned) and defined(e.right, assigned)
+    if cls == RelatExpr and not e.right:
+        return defined(e.left, assigned)
+    return cls in LITERALS or cls in (UnaryOp, IntAdd, FloatAdd, MultExpr, ExpoExpr, EqExpr, RelatExpr)
+
+
+def static_type(e, func: FunctionDef) -> Optional[str]:
+    """
+    the type e always has, None when that is only known at run time
+    parameters are None, a local has its declared type
+    """
+    cls = type(e)
+    if cls == IDExpr:
+        return func.types[e.slot] if e.slot >= func.nparams else None
+    if cls == IntLitExpr or cls == IntAdd:
+        return "int"
+    if cls == FloatLitExpr or cls == FloatAdd:
+        return "float"
+    if cls in (BoolExpr, BoolOr, BoolAnd, EqExpr) or cls == RelatExpr and e.right:
+        return "bool"
+    if cls == Farg:
+        return static_type(e.farg, func)
+    if cls == UnaryOp:
+        t = static_type(e.tree, func)
+        if e.op != "-":
+            return "bool"
+        return "float" if t == "float" else "int" if t in ("int", "bool") else None
+    if cls == MultExpr:
+        lt = static_type(e.left, func)
+        rt = static_type(e.right, func)
+        if lt not in NUMBERS or rt not in NUMBERS:
+            return None
+        return "int" if e.op != "/" and lt != "float" and rt != "float" else "float"
+    return None
+
+
+def live(stmts: List[Statement]) -> List[Statement]:
+    """
+    stmts without empty statements and without those after a return
+    """
+    kept = []
+    for s in stmts:
+        if type(s) == Statement and s.left == ";":
+            continue
+        kept.append(s)
+        if returns(s):
+            break
+    return kept
+
+
+def optimize(program: Program, passes=PASSES, rounds: int = 4) -> Program:
+    """
+    runs the passes over every function of a checked Program, in place
+    """
+    for f in program.funcs:
+        for _ in range(rounds):
+            changed = False
+            for p in passes:
+                changed = p(f).run() or changed
+            if not changed:
+                break
+    return program
@@ -0,0 +1,81 @@
+"""
+SLU-C output sinks
+Print statements hand their text to a sink instead of calling print():
+the buffered sink collects it and writes it to a stream in large pieces,
+the capture sink keeps it in memory and the null sink drops it
+Every engine flushes its sink when the program ends, normally or with an error
+"""
+import sys
+from typing import List, TextIO
+
+BUFFER_SIZE = 1 << 16   # characters the buffered sink holds before writing them out
+FLUSH_POLICIES = ["auto", "full", "line"]
+
+
+class Sink:
+    """
+    Where print statements write, text arrives exactly as it is printed
+    """
+    def write(self, text: str):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+
+class BufferedSink(Sink):
+    """
+    Writes to stream, by default the sys.stdout of when it is made, once size
+    characters are held, or at the end of every line when line is set
+    """
+    def __init__(self, stream: TextIO = None, size: int = BUFFER_SIZE, line: bool = False):
+        self.stream = sys.stdout if stream is None else stream
+        self.size = size
+        self.line = line
+        self.parts: List[str] = []
+        self.count = 0
+
+    def write(self, text: str):
+        self.parts.append(text)
+        self.count += len(text)
+        if self.count >= self.size or self.line and text[-1:] == "\n":
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.stream.write("".join(self.parts))
+            self.parts = []
+            self.count = 0
+        self.stream.flush()
+
+
+class CaptureSink(Sink):
+    """
+    Keeps the output in memory, for embedding the interpreter and for tests
+    """
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def write(self, text: str):
+        self.parts.append(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+class NullSink(Sink):
+    """
+    Drops the output, the values are still converted to text
+    """
+    def write(self, text: str):
+        pass
+
+
+def sink(size: int = BUFFER_SIZE, policy: str = "auto") -> BufferedSink:
+    """
+    the buffered sink over sys.stdout for a flush policy: full flushes when the
+    buffer fills, line at every line end, auto by line on a terminal only
+    """
+    if policy == "auto":
+        policy = "line" if sys.stdout.isatty() else "full"
+    return BufferedSink(sys.stdout, size, policy == "line")
@@ -2,25 +2,92 @@
 Xin, Jiusheng, Peixuan
 
 """
-from lexer import Lexer
+from lexer import Lexer, Token, TokenStream, SLUCIOError
 from ast import *
+from symbols import SymbolTable, Scope, Symbol
+from resolver import resolve
 import sys
-from typing import List
+from itertools import chain, islice, repeat
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Union
 
 
-class Parser:
+class TokenCursor:
+    """
+    Token cursor with k-token lookahead
+    Tokens are pulled from the lexer a block at a time and chained into one iterator,
+    currtok is the current token and peek(k) looks k tokens past it without consuming anything
+    Once the lexer is done the last token (EOF) is repeated
+    """
+    def __init__(self, tokens: Union[Lexer, TokenStream, Iterable[Token]]):
+        if isinstance(tokens, Lexer):
+            blocks = tokens.token_blocks()
+        elif isinstance(tokens, TokenStream):
+            blocks = tokens.blocks(Lexer.block_size)
+        else:
+            it = iter(tokens)
+            blocks = iter(lambda: list(islice(it, Lexer.block_size)), [])
+        self.stream = chain.from_iterable(padded(blocks))
+        self.ahead = iter(())
+        #  next_token is the C level __next__ of the chain, advancing is a single call
+        self.next_token = self.stream.__next__
+        self.currtok: Token = self.next_token()
+
+    def advance(self) -> Token:
+        tok = self.currtok = self.next_token()
+        return tok
+
+    def peek(self, k: int = 1) -> Token:
+        # pull k tokens plus whatever an earlier peek left over, then put them back in front of the stream
+        pulled = [self.next_token() for _ in range(k)]
+        pulled.extend(self.ahead)
+        self.ahead = iter(pulled)
+        self.next_token = chain(self.ahead, self.stream).__next__
+        return pulled[k - 1]
+
+    # consume the current token if it is of this kind
+    def accept(self, kind: str) -> Optional[Token]:
+        tok = self.currtok
+        if tok.kind == kind:
+            self.currtok = self.next_token()
+            return tok
+        return None
+
+    # consume a token of this kind, or raise message formatted with args
+    def expect(self, kind: str, message: str, *args) -> Token:
+        tok = self.currtok
+        if tok.kind != kind:
+            raise SLUCSyntaxError(message.format(*args))
+        self.currtok = self.next_token()
+        return tok
+
+
+# the blocks followed by the last token forever
+def padded(blocks: Iterable[List[Token]]) -> Iterator[List[Token]]:
+    last = Token("EOF", -1)
+    for block in blocks:
+        if block:
+            last = block[-1]
+            yield block
+    yield from repeat([last])
+
+
+class Parser(TokenCursor):
     """
      Parser class is used to implement SLUC grammar
     """
-    def __init__(self, fn: str):
-        #  list for checking variable id and function id
-        self.var_id: List[str] = []
-        self.func_id: List[str] = []
-        self.funccs: List[str] = []
-        self.level = 0
-        self.lex = Lexer(fn)
-        self.tg = self.lex.token_generator()
-        self.currtok = next(self.tg)
+    def __init__(self, fn: Union[str, Lexer, TokenStream], recover: bool = False):
+        #  scopes for checking variable id and function id
+        self.symbols = SymbolTable()
+        self.scope: Scope = self.symbols.globals
+        #  with recover a syntax error is recorded in errors and parsing goes on after it
+        self.recovering = recover
+        self.errors: List[Diagnostic] = []
+        #  fn is a file name, a Lexer over any source, or a TokenStream that was already lexed
+        if isinstance(fn, TokenStream):
+            TokenCursor.__init__(self, fn)
+        else:
+            self.lex = fn if isinstance(fn, Lexer) else Lexer(fn)
+            TokenCursor.__init__(self, self.lex)
 
         #  expression dictionary for DRY rule
         self.ex_dict = {
@@ -38,63 +105,126 @@ class Parser:
             "ID": (lambda x: self.assignment())
          }
 
-    # function for create a \t based on level
-    def formctrl(self) -> str:
-        return "\t"*self.level
+    # parse source text that is already in memory
+    @classmethod
+    def from_string(cls, text: str, line: int = 1, recover: bool = False) -> "Parser":
+        return cls(Lexer.from_string(text, line), recover)
 
-    # function to check whether id exists or not
-    def check_id_exist(self, var_name, id_list):
-        if var_name not in id_list:
-            return False
-        return True
+    # parse a bytes, bytearray, memoryview or mmap buffer
+    @classmethod
+    def from_bytes(cls, data, line: int = 1, recover: bool = False) -> "Parser":
+        return cls(Lexer.from_bytes(data, line), recover)
+
+    # parse a file through a memory map
+    @classmethod
+    def from_mmap(cls, fn: str, recover: bool = False) -> "Parser":
+        return cls(Lexer.from_mmap(fn), recover)
 
     def program(self) -> Program:
+        funcdefs = self.functiondefs()
+        for call in self.symbols.unresolved():
+            self.report(SLUCSyntaxError(call_error(self.symbols, call)), call[1])
+        return Program(funcdefs, self.symbols)
+
+    # ---- error recovery
+
+    # raise error, or record it when recovering
+    def report(self, error: "SLUCSyntaxError", line: int = None):
+        if not self.recovering:
+            raise error
+        self.errors.append(Diagnostic(self.currtok.loc if line is None else line, error.message))
+
+    # a function header starts at the current token: type id (
+    def function_start(self) -> bool:
+        tok = self.currtok
+        if tok.kind != "Keyword" or tok.name not in {"int", "bool", "float"}:
+            return False
+        name = self.peek(1)
+        return (name.kind == "ID" or name.name == "main") and self.peek(2).kind == "left-paren"
+
+    # skip past the next ; or up to the next } or function header
+    def synchronize(self):
+        while self.currtok.name != "EOF" and self.currtok.kind != "right-brace" and not self.function_start():
+            kind = self.currtok.kind
+            self.currtok = self.next_token()
+            if kind == "semicolon":
+                return
+
+    def item(self, items: list, parse: Callable[[], object]):
+        """
+        parse one declaration or statement of a body into items
+        when recovering a syntax error is recorded and the rest of the statement skipped,
+        and running into the next function or the end of file ends the function
+        """
+        if not self.recovering:
+            items.append(parse())
+            return
+        if self.currtok.name == "EOF" or self.function_start():
+            raise FunctionEnd("ERROR: Missing }} in function {} on line {}".format(self.sig.name, self.sig.line))
+        try:
+            items.append(parse())
+        except FunctionEnd:
+            raise
+        except SLUCSyntaxError as e:
+            self.report(e)
+            self.synchronize()
+
+    # ---- grammar
+
+    # parse function definitions until the end of file, calls between them are not checked
+    def functiondefs(self) -> List[FunctionDef]:
         funcdefs = []
         #   append functions until the end of file
         while self.currtok and self.currtok.name != "EOF":
-            funcdefs.append(self.functiondef())
-        for f in self.funccs:
-            if not self.check_id_exist(f, self.func_id):
-                raise SLUCSyntaxError("ERROR: Function {} undefined".format(f))
-        return Program(funcdefs)
+            if not self.recovering:
+                funcdefs.append(self.functiondef())
+                continue
+            tok = self.currtok
+            try:
+                funcdefs.append(self.functiondef())
+            except FunctionEnd as e:
+                self.report(e, self.sig.line)
+            except SLUCSyntaxError as e:
+                self.report(e)
+                # skip to the next function header
+                if self.currtok is tok:
+                    self.currtok = self.next_token()
+                while self.currtok.name != "EOF" and not self.function_start():
+                    self.currtok = self.next_token()
+        return funcdefs
 
     def functiondef(self) -> FunctionDef:
         stms = []
         decs = []
         currentline = self.currtok.loc
-        self.level = 0
-        self.var_id.clear()
         #  check type
         if self.currtok.kind == "Keyword" and self.currtok.name in {"int", "bool", "float"}:
             type = self.currtok.name
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             # check id
             if self.currtok.kind == "ID" or (self.currtok.kind=="Keyword" and self.currtok.name=="main"):
-                if self.check_id_exist(self.currtok.name,self.func_id):
+                if self.currtok.name in self.symbols.globals:
                     raise SLUCSyntaxError("ERROR: ID {} duplicated on line {}".format(self.currtok.name,self.currtok.loc))
-                self.func_id.append(self.currtok.name)
+                self.sig, self.scope = self.symbols.function(self.currtok.name, type, self.currtok.loc)
                 id=IDExpr(self.currtok.name)
                 # add id to parameter list
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 # dealing with parameters
                 if self.currtok.kind == "left-paren":
-                    self.currtok = next(self.tg)
+                    self.currtok = self.next_token()
                     parm = self.params()
                     if self.currtok.kind == "right-paren":
-                        self.currtok = next(self.tg)
+                        self.currtok = self.next_token()
                 # dealing with braces
                     if self.currtok.kind == "left-brace":
-                        self.level += 1
-                        self.currtok = next(self.tg)
+                        self.currtok = self.next_token()
                         while(self.currtok.name in {"int", "bool", "float"}):
-                            decs.append(self.declaration())
+                            self.item(decs, self.declaration)
                         while(self.currtok.kind != "right-brace"):
-                            stms.append(self.statement())
-                            if self.currtok.name in  {"int", "bool", "float"}:
-                                raise SLUCSyntaxError("ERROR: declarations must be written before statements on line {}".format(self.currtok.loc))
+                            self.item(stms, self.bodystatement)
 
-                        self.currtok = next(self.tg)
-                        return FunctionDef(type, id, parm, decs, stms)
+                        self.currtok = self.next_token()
+                        return resolve(FunctionDef(type, id, parm, decs, stms))
 
         raise SLUCSyntaxError("ERROR: Invalid function definition on line {}".format(currentline))
 
@@ -102,246 +232,221 @@ class Parser:
         args: List[Union[IDExpr, str]] = []
         if self.currtok.kind == "Keyword" and self.currtok.name in{"int", "bool", "float"}:
             left = self.currtok.name
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             if self.currtok.kind == "ID":
-                self.var_id.append(self.currtok.name)
+                self.param(left, self.currtok.name)
                 right = IDExpr(self.currtok.name)
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
             else:
                 raise SLUCSyntaxError("ERROR: Invalid param on line {}".format(self.currtok.loc))
 
             while (self.currtok.kind == "comma"):
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 type=self.currtok.name
                 args.append(self.currtok.name)
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 args.append(IDExpr(self.currtok.name))
-                self.var_id.append(self.currtok.name)
-                self.currtok = next(self.tg)
+                self.param(type, self.currtok.name)
+                self.currtok = self.next_token()
             return Param(left, right, args)
 
         elif self.currtok.kind == "right-paren":
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             return Param("", StrLitExpr(""))
 
         raise SLUCSyntaxError("ERROR: Invalid param on line {}".format(self.currtok.loc))
 
+    # record a parameter in the function scope and signature
+    def param(self, type: str, name: str):
+        self.scope.declare(Symbol(name, type, "param"))
+        self.sig.params.append((type, name))
+
     def declaration(self) -> Declaration:
         """
         Declaration -> type id | assignment
         """
 
         if self.currtok.kind == "Keyword" and self.currtok.name in {"int", "bool", "float"}:
+            line = self.currtok.loc
             left = self.currtok.name
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             if self.currtok.kind == "ID":
                 #  add id
-                if not self.check_id_exist(self.currtok.name, self.var_id):
-                    self.var_id.append(self.currtok.name)
+                if self.currtok.name not in self.scope:
+                    self.scope.declare(Symbol(self.currtok.name, left, "local"))
                     right: IDExpr = IDExpr(self.currtok.name)
-                    self.currtok = next(self.tg)
+                    self.currtok = self.next_token()
                 else:
                     raise SLUCSyntaxError("ERROR: ID {} duplicated on line {}".format(self.currtok.name, self.currtok.loc))
             else:
-                raise SLUCSyntaxError("ERROR: Invalid declaration on line {}".format(self.currtok))
+                raise SLUCSyntaxError("ERROR: Invalid declaration on line {}".format(self.currtok.loc))
             if self.currtok.kind == "semicolon":
-                self.currtok = next(self.tg)
-                return Declaration(left, right, self.formctrl())
+                self.currtok = self.next_token()
+                return Declaration(left, right)
             elif self.currtok.kind == "assignment":
                 assign: Statement = self.assignment(right)
-                return Declaration(left, assign, self.formctrl())
+                decl = Declaration(left, assign)
+                decl.line = line
+                return decl
         raise SLUCSyntaxError("ERROR: Invalid declaration on line {}".format(self.currtok.loc))
 
+    # a statement of a function body, after the declarations
+    def bodystatement(self) -> Statement:
+        if self.currtok.name in {"int", "bool", "float"}:
+            raise SLUCSyntaxError("ERROR: declarations must be written before statements on line {}".format(self.currtok.loc))
+        return self.statement()
+
+    # every statement but a block keeps the line it starts on
     def statement(self) -> Statement:
+        line = self.currtok.loc
         if self.currtok.kind == "semicolon":  # using ID in expression
             tmp = self.currtok
-            self.currtok = next(self.tg)
-            return Statement(tmp.name)
+            self.currtok = self.next_token()
+            item = Statement(tmp.name)
+            item.line = line
+            return item
         if self.currtok.kind == "left-brace":
             return self.block()
 
-        if self.currtok.kind == "Keyword":
+        if self.currtok.kind == "Keyword" and self.currtok.name in self.stmt_dict:
             item=self.stmt_dict[self.currtok.name](self)
+            item.line = line
             return item
 
         if self.currtok.kind == "ID":
             item=self.stmt_dict[self.currtok.kind](self)
+            item.line = line
             return item
 
         raise SLUCSyntaxError("ERROR: Invalid statement {} on line {}".format(self.currtok.name, self.currtok.loc))
 
     def returnstmt(self) -> Statement:
         currentline = self.currtok.loc
-        self.currtok = next(self.tg)
+        self.currtok = self.next_token()
         expr = self.expression()
-        if self.currtok.kind == "semicolon":
-            self.currtok = next(self.tg)
-            return ReturnStatement(expr, self.formctrl())
-        raise SLUCSyntaxError("ERROR: Missing ; on line {}".format(currentline))
+        self.expect("semicolon", "ERROR: Missing ; on line {}", currentline)
+        return ReturnStatement(expr)
 
     def block(self) -> Statement:
         stmts = []
-        self.currtok = next(self.tg)
-        stmt = self.statement()
+        self.currtok = self.next_token()
+        self.item(stmts, self.statement)
         while self.currtok.kind != "right-brace":
-            stmts.append(self.statement())
-        self.currtok = next(self.tg)
-        return BlockStatement(stmt, stmts, self.formctrl())
+            self.item(stmts, self.statement)
+        self.currtok = self.next_token()
+        if not stmts:   # every statement of the block had an error
+            return BlockStatement(Statement(";"), [])
+        return BlockStatement(stmts[0], stmts[1:])
 
     def assignment(self, id: Expr = None) -> Statement:
         currentline = self.currtok.loc
         if id:
             if self.currtok.kind == "assignment":
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 expr = self.expression()
                 if self.currtok.kind == "semicolon":
-                    self.currtok = next(self.tg)
+                    self.currtok = self.next_token()
                     assign = AssignmentStatement(id, expr)
                     return assign
         else:
-            if self.check_id_exist(self.currtok.name,self.var_id):
+            if self.scope.variable(self.currtok.name):
                 id = IDExpr(self.currtok.name)
             else:
                 raise SLUCSyntaxError("ERROR: Variable {} not defined on line {}".format(self.currtok.name, self.currtok.loc))
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             if self.currtok.kind == "assignment":
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 expr = self.expression()
                 if self.currtok.kind == "semicolon":
-                    self.currtok = next(self.tg)
-                    assign = AssignmentStatement(id, expr, self.formctrl())
+                    self.currtok = self.next_token()
+                    assign = AssignmentStatement(id, expr)
                     return assign
         raise SLUCSyntaxError("ERROR: Invalid Assignment on line {}".format(currentline))
 
     def ifstatement(self) -> Statement:
-        self.level += 1
         currentline = self.currtok.loc
-        self.currtok = next(self.tg)
+        self.currtok = self.next_token()
         #  dealing with conditions
-        if self.currtok.kind == "left-paren":
-            self.currtok = next(self.tg)
-            expr = self.expression()
-            if self.currtok.kind == "right-paren":
-                self.currtok = next(self.tg)
-                stmt = self.statement()
-                if self.currtok.kind == "Keyword" and self.currtok.name == "else":
-                    self.currtok = next(self.tg)
-                    elsestmt = self.statement()
-                    ifstmt = IfStatement(expr, stmt, elsestmt, self.formctrl())
-                    self.level -= 1
-                    return ifstmt
-                ifstmt = IfStatement(expr, stmt, tabs=self.formctrl())
-                self.level -= 1
-                return ifstmt
-
-        raise SLUCSyntaxError("ERROR: Invalid ifstatement on line {}".format(currentline))
+        self.expect("left-paren", "ERROR: Invalid ifstatement on line {}", currentline)
+        expr = self.expression()
+        self.expect("right-paren", "ERROR: Invalid ifstatement on line {}", currentline)
+        stmt = self.statement()
+        if self.currtok.kind == "Keyword" and self.currtok.name == "else":
+            self.currtok = self.next_token()
+            elsestmt = self.statement()
+            return IfStatement(expr, stmt, elsestmt)
+        return IfStatement(expr, stmt)
 
     def whilestatement(self) -> Statement:
-        self.level += 1
         currentline = self.currtok.loc
-        self.currtok = next(self.tg)
+        self.currtok = self.next_token()
         # dealing with conditions
-        if self.currtok.kind == "left-paren":
-            self.currtok = next(self.tg)
-            expr = self.expression()
-            if self.currtok.kind == "right-paren":
-                self.currtok = next(self.tg)
-                stmt = self.statement()
-                whilestmt = WhileStatement(expr, stmt, self.formctrl())
-                self.level -= 1
-                return whilestmt
-        raise SLUCSyntaxError("ERROR: Invalid whilestatement on line {}".format(currentline))
+        self.expect("left-paren", "ERROR: Invalid whilestatement on line {}", currentline)
+        expr = self.expression()
+        self.expect("right-paren", "ERROR: Invalid whilestatement on line {}", currentline)
+        stmt = self.statement()
+        return WhileStatement(expr, stmt)
 
     def printstmt(self) -> Statement:
         currentline = self.currtok.loc
         prtargs = []
-        self.currtok = next(self.tg)
-        if self.currtok.kind == "left-paren":
-            self.currtok = next(self.tg)
-            prtarg = self.printarg()
-        else:
-            raise  SLUCSyntaxError("ERROR: Missing ( on line {}".format(currentline))
-        while (self.currtok.kind == "comma"):
-            self.currtok = next(self.tg)
+        self.currtok = self.next_token()
+        self.expect("left-paren", "ERROR: Missing ( on line {}", currentline)
+        prtarg = self.printarg()
+        while self.accept("comma"):
             prtargs.append(self.printarg())
-        if self.currtok.kind == "right-paren":
-            self.currtok = next(self.tg)
-            left = PrintStatement(prtarg, prtargs, self.formctrl())
-            return left
-        raise SLUCSyntaxError("ERROR: Invalid print statement on line {}".format(currentline))
+        self.expect("right-paren", "ERROR: Invalid print statement on line {}", currentline)
+        return PrintStatement(prtarg, prtargs)
 
     def printarg(self) -> Expr:
         if self.currtok.kind == "String":
             tmp = self.currtok
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             return StrLitExpr(tmp.name)
         return self.expression()
 
     def expression(self) -> Expr:
-        left = self.conjunction()
-        while self.currtok.kind == "or":
-            self.currtok = next(self.tg)
-            right = self.conjunction()
-            left = Expr(left, right)
-        return left
-
-    def conjunction(self) -> Expr:
-        left = self.equality()
-
-        while self.currtok.kind == "and":
-            self.currtok = next(self.tg)
-            right = self.equality()
-            left = ConjExpr(left, right)
-        return left
-
-    def equality(self):  # a == b      3*z != 99
-        left = self.relation()
-
-        if self.currtok.kind in {"equal-equal", "not-equal"}:
-            equop = self.currtok.name
-            self.currtok = next(self.tg)
-            right = self.relation()
-            left = EqExpr(left, right, equop)
-        return left
-
-    def relation(self) -> Expr:  # a < b
-        left = self.addition()
-        while self.currtok.kind in {"less-than", "less-equal", "greater-than", "greater-equal"}:
-            relop = self.currtok.name
-            self.currtok = next(self.tg)
-            right = self.addition()
-            left = RelatExpr(left, right, relop)
-        return left
-
-    def addition(self) -> Expr:
+        return self.binary(0)
+
+    def binary(self, min_power: int) -> Expr:
         """
-        Expr  →  Term { + Term }
+        Expr → [UnaryOp] Primary {BinOp Expr}
+        operators are read by binding power (see binary_ops), one loop instead of a method per level
         """
-        left = self.term()
-
-        while self.currtok.kind in {"plus", "minus"}:
-            if self.currtok.kind == "plus":
-                self.currtok = next(self.tg)  # advance to the next token
-
-            # because we matched a +
-            right = self.term()
-            left = AddExpr(left, right)
-
-        return left
-
-    def funcC(self, f_id) -> Expr:
+        tok = self.currtok
+        if tok.kind == "minus" or tok.kind == "negate":
+            self.currtok = self.next_token()
+            left = UnaryOp(self.primary(), tok.name)
+        else:
+            left = self.primary()
+        limit = max_power   # operators above this were already taken by the right operand
+        while True:
+            tok = self.currtok
+            op = binary_ops.get(tok.kind)
+            if op is None:
+                return left
+            power, assoc, build = op
+            if power < min_power or power > limit:
+                return left
+            # a minus is left in place to be read as the sign of the right operand
+            if tok.kind != "minus":
+                self.currtok = self.next_token()
+            right = self.binary(power if assoc == "right" else power + 1)
+            left = build(left, right, tok.name)
+            limit = power - 1 if assoc == "none" else power
+
+    def funcC(self, f_id, line: int = -1) -> Expr:
         """
         FuncC → id (farg {, farg})
          """
         left = self.farg()
-        self.funccs.append(f_id)
         args = []
-        while self.currtok.kind == "comma":
-            self.currtok = next(self.tg)
+        while self.accept("comma"):
             args.append(self.farg())
         if self.currtok.kind == "right-paren":
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             f = FuncCExpr(f_id, left, args)
+            self.symbols.call(f_id, line, f.arity())
             return f
         print(self.currtok.kind)
         raise SLUCSyntaxError("ERROR: Invalid function call on line {}".format(self.currtok.loc))
@@ -353,25 +458,25 @@ class Parser:
         """
         if self.currtok.kind == "ID":
             tmp = self.currtok
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             if self.check_id_exist(tmp.name, self.var_id):
                 return Farg(IDExpr(tmp.name))
             elif self.currtok.kind == "left-paren":
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 return Farg(self.funcC(tmp.name))
             else:
                 raise SLUCSyntaxError("ERROR: Variable {} undefined on line {} ".format(self.currtok.name, self.currtok.loc))
         else:
             if self.currtok.kind == "int":
                 tmp = self.currtok
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 return Farg(IntLitExpr(tmp.name))
             if self.currtok.kind == "real":
                 tmp = self.currtok
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 return Farg(FloatLitExpr(tmp.name))
             if self.currtok.kind == "right-paren":
-                self.currtok = next(self.tg)
+                self.currtok = self.next_token()
                 return Farg(StrLitExpr("")) 
             """
         if self.currtok.kind == "right-paren":
@@ -379,84 +484,66 @@ class Parser:
         return Farg(self.expression())
         # raise SLUCSyntaxError("ERROR: Invalid function argument {} on line {} ".format(self.currtok.name, self.currtok.loc))
 
-    def term(self) -> Expr:
-        """
-        Term  → Fact { MulOp Fact }
-        """
-        left = self.fact()
-        while self.currtok.kind in {"multiply", "divide", "mod"}:
-            op = self.currtok.name
-            self.currtok = next(self.tg)
-            right = self.fact()
-            left = MultExpr(left, right, op)
-        return left
-
-    def fact(self) -> Expr:
-        """
-        Fact  → Base {Expo Base}
-        """
-        left = self.base()
-        while self.currtok.kind == "expo":
-            self.currtok = next(self.tg)  # advance to the next token
-            right = self.fact()
-            left = ExpoExpr(left, right)
-        return left
-
-    def base(self) -> Expr:
-        """
-        Base → [UnaryOp] primary
-        """
-        if self.currtok.kind in {"minus", "negate"}:
-
-            op = self.currtok.name
-            self.currtok = next(self.tg)
-            tree = self.primary()
-            return UnaryOp(tree, op)
-
-        return self.primary()
-
     def primary(self) -> Expr:
         """
         Primary  → ID | INTLIT | ( Expr ) | FuncCall | Bool
         """
         if self.currtok.kind == "ID":
-            func_name=self.currtok.name
             tmp = self.currtok
-            self.currtok=next(self.tg)
-            if self.currtok.kind=="left-paren":
-                self.currtok=next(self.tg)
-                return self.funcC(tmp.name)
+            self.currtok = self.next_token()
+            # an ID followed by ( is a function call
+            if self.currtok.kind == "left-paren":
+                self.currtok = self.next_token()
+                return self.funcC(tmp.name, tmp.loc)
 
-            elif tmp.name in self.var_id:
+            elif self.scope.variable(tmp.name):
                 return IDExpr(tmp.name)
             else:
                 raise SLUCSyntaxError("ERROR: Variable {} undefined on line {}".format(tmp.name, tmp.loc))
 
         if self.currtok.kind in self.ex_dict.keys():
             tmp=self.currtok
-            self.currtok=next(self.tg)
+            self.currtok = self.next_token()
             return self.ex_dict[tmp.kind](tmp.name)
 
 
         # parse a parenthesized expression
         if self.currtok.kind == "left-paren":
-            self.currtok = next(self.tg)
-            tree = self.expression()
-            if self.currtok.kind == "right-paren":
-                self.currtok = next(self.tg)
-                return tree
-            else:
-                # use the line number from your token object
-                raise SLUCSyntaxError("ERROR: Missing right paren on line {0}".format(self.currtok.loc))
+            self.currtok = self.next_token()
+            tree = self.binary(0)
+            # use the line number from your token object
+            self.expect("right-paren", "ERROR: Missing right paren on line {0}", self.currtok.loc)
+            return tree
         if self.currtok.name in ["true", "false"]:
             tmp = self.currtok
-            self.currtok = next(self.tg)
+            self.currtok = self.next_token()
             return BoolExpr(tmp.name)
 
         # what if we get here we have a problem
         raise SLUCSyntaxError("ERROR: Unexpected token {0} on line {1}".format(self.currtok.name, self.currtok.loc))
 
 
+# binary operators by token kind: (binding power, associativity, node builder)
+# == and != do not chain, a == b == c is a syntax error
+binary_ops = {
+    "or": (1, "left", lambda left, right, op: Expr(left, right)),
+    "and": (2, "left", lambda left, right, op: ConjExpr(left, right)),
+    "equal-equal": (3, "none", EqExpr),
+    "not-equal": (3, "none", EqExpr),
+    "less-than": (4, "left", RelatExpr),
+    "less-equal": (4, "left", RelatExpr),
+    "greater-than": (4, "left", RelatExpr),
+    "greater-equal": (4, "left", RelatExpr),
+    "plus": (5, "left", lambda left, right, op: AddExpr(left, right)),
+    "minus": (5, "left", lambda left, right, op: AddExpr(left, right)),
+    "multiply": (6, "left", MultExpr),
+    "divide": (6, "left", MultExpr),
+    "mod": (6, "left", MultExpr),
+    "expo": (7, "right", lambda left, right, op: ExpoExpr(left, right)),
+}
+max_power = 7
+
+
 # create our own exception by inheriting
 # from Python's exception
 class SLUCSyntaxError(Exception):
@@ -468,10 +555,34 @@ class SLUCSyntaxError(Exception):
         return self.message
 
 
+# a function body ran into the next function or the end of file while recovering
+class FunctionEnd(SLUCSyntaxError):
+    pass
+
+
+class Diagnostic(NamedTuple):
+    line: int       # line of the token the error was found at, -1 at the end of file
+    message: str
+
+
+# message for a call that SymbolTable.resolve could not match
+def call_error(symbols: SymbolTable, call) -> str:
+    name, line, arity = call
+    sig = symbols.functions.get(name)
+    if sig is None:
+        return "ERROR: Function {} undefined".format(name)
+    return "ERROR: Function {} takes {} arguments, {} given on line {}".format(name, sig.arity, arity, line)
+
+
 if __name__ == '__main__':
-    if len(sys.argv)>1:
-        p = Parser(sys.argv[1])
-    else:
-        p = Parser("simple.c")
+    try:
+        if len(sys.argv)>1:
+            p = Parser(sys.argv[1])
+        else:
+            p = Parser("simple.c")
+    except SLUCIOError as e:
+        print(str(e))
+        print("Exiting")
+        sys.exit(1)
     t =p.program()
     print(t)
@@ -0,0 +1,175 @@
+"""
+SLU-C profiler
+Instruments a checked Program for the tree walker: every statement is
+wrapped in a node that counts how often it runs and every call in one that
+times it, so a run records per function the calls, the inclusive and the
+exclusive time, and per source line the statements executed
+Programs that are not profiled are never rewritten and pay nothing
+"""
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from ast import *
+from optimizer import Pass
+
+ROOT = "main"
+
+
+class Profile:
+    """
+    Counters of one profiled run, times are in seconds
+    """
+    def __init__(self):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.inclusive: Dict[str, float] = defaultdict(float)
+        self.exclusive: Dict[str, float] = defaultdict(float)
+        self.stacks: Dict[Tuple[str, ...], float] = defaultdict(float)    # call path -> exclusive time
+        self.statements: List["CountedStatement"] = []
+        self.frames = []    # [name, start, time spent in callees] of the running calls
+        self.path: List[str] = []
+        self.active: Dict[str, int] = defaultdict(int)  # running calls per function, for recursion
+
+    def enter(self, name: str):
+        self.calls[name] += 1
+        self.active[name] += 1
+        self.path.append(name)
+        self.frames.append([name, time.perf_counter(), 0.0])
+
+    def leave(self):
+        name, start, inner = self.frames.pop()
+        elapsed = time.perf_counter() - start
+        self.exclusive[name] += elapsed - inner
+        self.stacks[tuple(self.path)] += elapsed - inner
+        self.path.pop()
+        self.active[name] -= 1
+        # a recursive call's time is already inside the outermost one
+        if not self.active[name]:
+            self.inclusive[name] += elapsed
+        if self.frames:
+            self.frames[-1][2] += elapsed
+
+    def lines(self) -> Dict[int, int]:
+        """
+        statements executed per source line
+        """
+        counts = defaultdict(int)
+        for s in self.statements:
+            counts[s.line] += s.count
+        return counts
+
+    def report(self, source: List[str] = None) -> str:
+        """
+        the per function table by exclusive time and the per line counts,
+        with the text of each line when the source lines are given
+        """
+        out = ["{:<24} {:>10} {:>12} {:>12}".format("function", "calls", "inclusive s", "exclusive s")]
+        for name in sorted(self.calls, key=lambda n: -self.exclusive[n]):
+            out.append("{:<24} {:>10} {:>12.6f} {:>12.6f}".format(
+                name, self.calls[name], self.inclusive[name], self.exclusive[name]))
+        out.append("")
+        out.append("{:>6} {:>10}".format("line", "count"))
+        for line, count in sorted(self.lines().items()):
+            text = source[line - 1].rstrip() if source and 0 < line <= len(source) else ""
+            out.append("{:>6} {:>10}  {}".format(line, count, text))
+        return "\n".join(out) + "\n"
+
+    def collapsed(self) -> str:
+        """
+        one line per call path with its exclusive microseconds, the input of flamegraph tools
+        """
+        return "".join("{} {}\n".format(";".join(path), round(seconds * 1e6))
+                       for path, seconds in sorted(self.stacks.items()))
+
+
+class CountedStatement(Statement):
+    """
+    Runs a statement and counts it
+    """
+    __slots__ = ("stmt", "count")
+
+    def __init__(self, stmt, line: int):
+        self.stmt = stmt
+        self.line = line
+        self.count = 0
+
+    def format(self, level: int) -> str:
+        return self.stmt.format(level)
+
+    def eval(self, global_env, env):
+        self.count += 1
+        return self.stmt.eval(global_env, env)
+
+
+class TimedCall(FuncCExpr):
+    """
+    A call, or a MemoCall when memo is set, timed as its callee
+    """
+    __slots__ = ("memo", "profile")
+
+    def eval(self, global_env, env):
+        args = [self.left.eval(global_env, env)]
+        for a in self.right:
+            args.append(a.eval(global_env, env))
+        f = global_env[self.f_id][1]
+        profile = self.profile
+        profile.enter(str(self.f_id))
+        try:
+            if self.memo is None:
+                return f.eval(global_env, args)
+            return self.memo.call(lambda args: f.eval(global_env, args), args)
+        finally:
+            profile.leave()
+
+
+class Instrument(Pass):
+    """
+    Wraps the statements with a line in CountedStatements and the calls in TimedCalls
+    """
+    def __init__(self, func: FunctionDef, profile: Profile):
+        Pass.__init__(self, func)
+        self.profile = profile
+        # blocks run no code of their own, and neither do empty statements,
+        # like the ; a print statement leaves behind
+        for cls in list(self.stmt_dict):
+            if cls not in (BlockStatement, Statement):
+                self.rules[cls] = self.count
+        self.rules[FuncCExpr] = self.time
+        self.rules[MemoCall] = self.time
+        self.stmt_dict[Declaration] = self.declaration
+
+    # Declaration.eval tests for an AssignmentStatement, the declaration is counted instead
+    def declaration(self, d: Declaration):
+        if isinstance(d.right, AssignmentStatement):
+            d.right.right = self.expression(d.right.right)
+        return d
+
+    def count(self, s: Statement):
+        if s.line is None:
+            return s
+        node = CountedStatement(s, s.line)
+        self.profile.statements.append(node)
+        return node
+
+    def time(self, e: FuncCExpr):
+        node = TimedCall(e.f_id, e.left, e.right)
+        node.memo = getattr(e, "memo", None)
+        node.profile = self.profile
+        return node
+
+
+def run(program: Program, out: Sink = None, profile: Profile = None) -> Profile:
+    """
+    instruments a checked Program and runs it on the tree walker, in place,
+    main is the root of every call path; profile has the counts so far
+    when the program ends with an error
+    """
+    profile = Profile() if profile is None else profile
+    for f in program.funcs:
+        Instrument(f, profile).run()
+    profile.enter(ROOT)
+    try:
+        program.eval(out)
+    finally:
+        profile.leave()
+    return profile
@@ -0,0 +1,133 @@
+"""
+SLU-C slot resolution
+A pass over each parsed FunctionDef that numbers its parameters and locals:
+every variable reference gets the index of its slot in the call frame and
+every assignment the declared type of its target, so evaluation indexes a
+list instead of looking names up in a dict
+"""
+from typing import Dict, List
+
+from ast import *
+
+
+class Resolver:
+    """
+    Resolves one FunctionDef in place
+    """
+    def __init__(self, func: FunctionDef):
+        self.func = func
+        self.slots: Dict[str, int] = {}     # variable name -> slot
+        self.types: List[str] = []          # slot -> declared type
+
+        #  statement and expression dictionaries, keyed by node class
+        self.stmt_dict = {
+            Statement: lambda s: None,
+            AssignmentStatement: self.assignment,
+            Declaration: self.declaration,
+            PrintStatement: self.printstmt,
+            WhileStatement: self.whilestmt,
+            IfStatement: self.ifstmt,
+            BlockStatement: self.block,
+            ReturnStatement: lambda s: self.expression(s.left),
+        }
+        self.expr_dict = {
+            IDExpr: self.variable,
+            IntLitExpr: lambda e: None,
+            FloatLitExpr: lambda e: None,
+            StrLitExpr: lambda e: None,
+            BoolExpr: lambda e: None,
+            Farg: lambda e: self.expression(e.farg),
+            UnaryOp: lambda e: self.expression(e.tree),
+            FuncCExpr: self.call,
+        }
+        for cls in (Expr, ConjExpr, EqExpr, RelatExpr, AddExpr, MultExpr, ExpoExpr):
+            self.expr_dict[cls] = self.binary
+
+    def declare(self, name: str, t: str):
+        self.slots[name] = len(self.types)
+        self.types.append(t)
+
+    def resolve(self) -> FunctionDef:
+        func = self.func
+        p = func.params
+        params = []
+        if str(func.id) != "main" and p.left:
+            # calls pass one argument per parameter, a lone one is always typed int
+            if p.args:
+                params = [(p.left, p.right)] + list(zip(p.args[0::2], p.args[1::2]))
+            else:
+                params = [("int", p.right)]
+        for t, id in params:
+            self.declare(str(id), t)
+            self.variable(id)
+        for d in func.decls:
+            id = d.right.left if isinstance(d.right, AssignmentStatement) else d.right
+            self.declare(str(id), d.left)
+            self.variable(id)
+
+        for s in func.decls:
+            self.statement(s)
+        for s in func.stmts:
+            self.statement(s)
+        func.nparams = len(params)
+        func.names = sorted(self.slots, key=self.slots.get)
+        func.types = self.types
+        return func
+
+    # ---- statements
+
+    def statement(self, s):
+        self.stmt_dict[type(s)](s)
+
+    def declaration(self, d: Declaration):
+        if isinstance(d.right, AssignmentStatement):
+            self.assignment(d.right)
+
+    def assignment(self, s: AssignmentStatement):
+        self.variable(s.left)
+        s.slot = s.left.slot
+        s.type = self.types[s.slot]
+        self.expression(s.right)
+
+    def printstmt(self, s: PrintStatement):
+        self.expression(s.prtarg)
+        for arg in s.prtargs:
+            self.expression(arg)
+
+    def whilestmt(self, s: WhileStatement):
+        self.expression(s.left)
+        self.statement(s.right)
+
+    def ifstmt(self, s: IfStatement):
+        self.expression(s.expr)
+        self.statement(s.stmt)
+        if s.elsestmt:
+            self.statement(s.elsestmt)
+
+    def block(self, s: BlockStatement):
+        self.statement(s.left)
+        for arg in s.right:
+            self.statement(arg)
+
+    # ---- expressions
+
+    def expression(self, e):
+        self.expr_dict[type(e)](e)
+
+    def variable(self, e: IDExpr):
+        e.slot = self.slots[e.id]
+
+    # ||, && and the relational operators may have no right side
+    def binary(self, e: Expr):
+        self.expression(e.left)
+        if e.right:
+            self.expression(e.right)
+
+    def call(self, e: FuncCExpr):
+        self.expression(e.left)
+        for arg in e.right:
+            self.expression(arg)
+
+
+def resolve(func: FunctionDef) -> FunctionDef:
+    return Resolver(func).resolve()
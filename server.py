@@ -0,0 +1,373 @@
+"""
+SLU-C server
+Keeps the interpreter loaded and answers client.py over a Unix domain
+socket: lex, parse, pretty-print or run a file, for many clients at once,
+one thread per connection
+Parsed programs stay pickled in memory in front of the on-disk parse cache,
+and the time every request took is kept per operation
+A run with --max-memory has the server to itself while it runs, other
+requests wait for it, since memory is measured for the whole process
+Frames are a 4 byte big-endian length and that many bytes of a JSON object,
+a request has the op, the interpreter.py arguments as argv and the client's
+cwd, the reply has the stdout, stderr and exit status of the request and
+the seconds it took
+"""
+import argparse
+import gc
+import io
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+from lexer import Lexer, SLUCIOError
+from parser_sluc import Parser, SLUCSyntaxError
+from ast import Program, SLUCTypeError
+from cache import MAX_BYTES, ParseCache
+from output import CaptureSink
+from client import OPS, SLUCServerError, default_socket, receive, send
+import governor
+import interpreter
+
+SAMPLES = 1024      # latencies kept per operation for the percentiles
+
+
+class Usage(Exception):
+    """
+    The arguments of a request were rejected, or help was asked for
+    """
+    def __init__(self, status: int, text: str):
+        Exception.__init__(self)
+        self.status = status
+        self.text = text
+
+
+class Turns:
+    """
+    Requests that share the process and requests that need it to themselves:
+    tracemalloc counts the allocations of every thread, so a run with a memory
+    limit waits for the other requests to finish and they wait for it
+    """
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.sharing = 0
+        self.alone = False
+        self.waiting = 0    # requests waiting to be alone, new sharers let them go first
+
+    @contextmanager
+    def shared(self):
+        with self.changed:
+            while self.alone or self.waiting:
+                self.changed.wait()
+            self.sharing += 1
+        try:
+            yield
+        finally:
+            with self.changed:
+                self.sharing -= 1
+                self.changed.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self.changed:
+            self.waiting += 1
+            while self.alone or self.sharing:
+                self.changed.wait()
+            self.waiting -= 1
+            self.alone = True
+        try:
+            yield
+        finally:
+            with self.changed:
+                self.alone = False
+                self.changed.notify_all()
+
+
+class WarmCache:
+    """
+    Pickled Programs in memory, up to max_bytes, in front of the parse caches
+    and keyed like them; a hit unpickles a fresh copy, since checking and
+    running a program rewrite its tree
+    """
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: Dict[str, bytes] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.disks: Dict[str, ParseCache] = {}    # one per cache directory, hashing the front end once
+        self.lock = threading.Lock()
+
+    def disk(self, directory: str) -> ParseCache:
+        with self.lock:
+            cache = self.disks.get(directory)
+            if cache is None:
+                cache = self.disks[directory] = ParseCache(directory)
+            return cache
+
+    def parse(self, fn: str, directory: str = None, name: str = None) -> Program:
+        source = read(fn, name)
+        disk = self.disk(directory)
+        key = disk.key(source)
+        with self.lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+        if data is not None:
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                return disk.loads(data)
+            finally:
+                if enabled:
+                    gc.enable()
+        program = disk.get(source)
+        if program is None:
+            program = Parser.from_bytes(source).program()
+            disk.put(source, program)
+        data = disk.dumps(program)
+        if data is not None and len(data) <= self.max_bytes:
+            with self.lock:
+                if key not in self.entries:
+                    self.entries[key] = data
+                    self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, old = self.entries.popitem(last=False)
+                    self.size -= len(old)
+        return program
+
+    def __str__(self):
+        return "warm cache: {} programs, {} bytes, {} hits, {} misses".format(
+            len(self.entries), self.size, self.hits, self.misses)
+
+
+class Latency:
+    """
+    The seconds taken by the requests of each operation
+    """
+    def __init__(self, samples: int = SAMPLES):
+        self.counts: Dict[str, int] = {}
+        self.totals: Dict[str, float] = {}
+        self.recent: Dict[str, deque] = {}
+        self.samples = samples
+        self.lock = threading.Lock()
+
+    def record(self, op: str, seconds: float):
+        with self.lock:
+            if op not in self.counts:
+                self.counts[op] = 0
+                self.totals[op] = 0.0
+                self.recent[op] = deque(maxlen=self.samples)
+            self.counts[op] += 1
+            self.totals[op] += seconds
+            self.recent[op].append(seconds)
+
+    def report(self) -> str:
+        """
+        per operation the requests, their mean, and the median, 99th percentile
+        and maximum of the recent ones, in milliseconds
+        """
+        out = ["{:<8} {:>8} {:>10} {:>10} {:>10} {:>10}".format("op", "requests", "mean ms", "p50 ms", "p99 ms", "max ms")]
+        with self.lock:
+            for op in sorted(self.counts):
+                recent = sorted(self.recent[op])
+                out.append("{:<8} {:>8} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+                    op, self.counts[op], self.totals[op] / self.counts[op] * 1e3,
+                    percentile(recent, 0.5) * 1e3, percentile(recent, 0.99) * 1e3, recent[-1] * 1e3))
+        return "\n".join(out) + "\n"
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def read(fn: str, name: str = None) -> bytes:
+    """
+    the source of fn, errors call it name, the path the client gave
+    """
+    try:
+        with open(fn, "rb") as f:
+            return f.read()
+    except IOError:
+        raise SLUCIOError("File {} not found".format(name or fn))
+
+
+def arguments(argv: List[str], cwd: str) -> argparse.Namespace:
+    """
+    the interpreter.py arguments of a request, paths made relative to the client's cwd,
+    args.name keeps the file as given; raises Usage instead of printing and exiting
+    """
+    argp = interpreter.arguments()
+    argp.prog = "client.py"
+
+    def exit(status=0, message=None):
+        raise Usage(status, message or "")
+
+    def error(message):
+        raise Usage(2, "{}{}: error: {}\n".format(argp.format_usage(), argp.prog, message))
+
+    def print_help(file=None):
+        raise Usage(0, argp.format_help())
+
+    argp.exit, argp.error, argp.print_help = exit, error, print_help
+    args = argp.parse_args(argv)
+    problem = interpreter.validate(args)
+    if problem:
+        argp.error(problem)
+    args.name = args.file
+    for name in ("file", "cache_dir", "profile_stacks"):
+        if getattr(args, name):
+            setattr(args, name, os.path.join(cwd, getattr(args, name)))
+    return args
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES):
+        socketserver.ThreadingUnixStreamServer.__init__(self, path, Connection)
+        os.chmod(path, 0o600)
+        self.path = path
+        self.warm = WarmCache(max_bytes)
+        self.latency = Latency()
+        self.turns = Turns()
+
+    def answer(self, message: dict) -> dict:
+        """
+        the reply to one request, with the seconds it took
+        """
+        start = time.perf_counter()
+        op = message.get("op")
+        stdout, stderr, status = [], [], 0
+        try:
+            if op == "stats":
+                stdout.append(self.latency.report())
+                stdout.append(str(self.warm) + "\n")
+            elif op == "shutdown":
+                pass    # the connection stops the server once the reply is sent
+            elif op in OPS:
+                args = arguments(list(message.get("argv", [])), str(message.get("cwd", "/")))
+                alone = op == "run" and args.max_memory is not None
+                with self.turns.exclusive() if alone else self.turns.shared():
+                    status = getattr(self, op)(args, stdout, stderr)
+            else:
+                stderr.append("ERROR: unknown op {}\n".format(op))
+                status = 2
+        except Usage as e:
+            (stdout if e.status == 0 else stderr).append(e.text)
+            status = e.status
+        except SLUCIOError as e:
+            stdout.append("{}\nExiting\n".format(e))
+            status = 1
+        except (SLUCSyntaxError, SLUCTypeError) as e:
+            stdout.append("{}\n".format(e))
+        except Exception as e:
+            # the server outlives the requests, anything they raise is their reply
+            stderr.append("{}: {}\n".format(type(e).__name__, e))
+            status = 1
+        seconds = time.perf_counter() - start
+        self.latency.record(op if op in OPS else str(op), seconds)
+        return {"stdout": "".join(stdout), "stderr": "".join(stderr), "exit": status, "seconds": seconds}
+
+    def load(self, args) -> Program:
+        if args.no_cache:
+            return Parser.from_bytes(read(args.file, args.name)).program()
+        return self.warm.parse(args.file, args.cache_dir, args.name)
+
+    def lex(self, args, stdout: List[str], stderr: List[str]) -> int:
+        stdout.append("%-30s %-70s %s\n" % ("Token", "Name", "Line Number"))
+        stdout.append("-" * 112 + "\n")
+        for t in Lexer.from_bytes(read(args.file, args.name)).tokenize():
+            stdout.append("%-30s %-70s %s\n" % (t.kind, t.name, t.loc))
+        stdout.append("Done\n")
+        return 0
+
+    def parse(self, args, stdout: List[str], stderr: List[str]) -> int:
+        stdout.append("{}: {} functions\n".format(args.name, len(self.load(args).funcs)))
+        return 0
+
+    def format(self, args, stdout: List[str], stderr: List[str]) -> int:
+        stdout.append(str(self.load(args)) + "\n")
+        return 0
+
+    def run(self, args, stdout: List[str], stderr: List[str]) -> int:
+        out = CaptureSink()
+        report = io.StringIO()
+        try:
+            interpreter.execute(self.load(args), args, out, report)
+        except governor.SLUCLimitError as e:
+            stdout.append("{}\n".format(e))
+            stderr.append(", ".join("{} {}".format(k, v) for k, v in e.stats.items()) + "\n")
+            return 1
+        finally:
+            # the output comes before the error it ended with, as it would on a terminal
+            stdout.insert(0, out.getvalue())
+            stderr.insert(0, report.getvalue())
+        return 0
+
+
+class Connection(socketserver.BaseRequestHandler):
+    """
+    Answers the requests of one client until it closes the connection
+    """
+    def handle(self):
+        while True:
+            try:
+                message = receive(self.request)
+            except EOFError:
+                return
+            except (SLUCServerError, ValueError) as e:
+                send(self.request, {"stdout": "", "stderr": "ERROR: bad request: {}\n".format(e), "exit": 2,
+                                    "seconds": 0.0})
+                return
+            send(self.request, self.server.answer(message))
+            if message.get("op") == "shutdown":
+                self.server.shutdown()
+                return
+
+
+def listen(path: str, max_bytes: int = MAX_BYTES) -> Server:
+    """
+    the server on path, a socket left behind by a server that is gone is replaced
+    """
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(path)
+            except OSError:
+                os.remove(path)
+            else:
+                raise SLUCServerError("ERROR: a server is already running on {}".format(path))
+    return Server(path, max_bytes)
+
+
+if __name__ == '__main__':
+    argp = argparse.ArgumentParser(description="serve SLU-C requests of client.py on a Unix socket")
+    argp.add_argument("--socket", default=default_socket(), help="socket path, default $SLUC_SOCKET or /tmp/sluc-UID.sock")
+    argp.add_argument("--cache-size", type=int, default=MAX_BYTES,
+                      help="bytes of parsed programs kept in memory, default {}".format(MAX_BYTES))
+    args = argp.parse_args()
+
+    try:
+        server = listen(args.socket, args.cache_size)
+    except (SLUCServerError, OSError) as e:
+        print(str(e))
+        sys.exit(1)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print("listening on {}".format(args.socket), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(args.socket)
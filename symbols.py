@@ -0,0 +1,128 @@
+"""
+SLU-C symbol tables
+Hashed scopes with parent links: one global scope holding the functions and
+one scope per function holding its parameters and locals
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class Symbol:
+    """
+    a named variable or function
+    """
+    __slots__ = ("name", "type", "kind")
+
+    def __init__(self, name: str, type: str, kind: str):
+        self.name = name
+        self.type = type    # int | float | bool
+        self.kind = kind    # param | local | function
+
+    def __repr__(self):
+        return "Symbol({}, {}, {})".format(self.name, self.type, self.kind)
+
+
+class FunctionSignature(Symbol):
+    """
+    a function symbol with its parameter types, recorded while parsing its header
+    """
+    __slots__ = ("params", "line")
+
+    def __init__(self, name: str, type: str, line: int):
+        Symbol.__init__(self, name, type, "function")
+        self.params: List[Tuple[str, str]] = []    # (type, name)
+        self.line = line
+
+    @property
+    def arity(self) -> int:
+        return len(self.params)
+
+
+class Scope:
+    """
+    one level of names, lookups fall back to the parent scope
+    """
+    def __init__(self, name: str, parent: "Scope" = None):
+        self.name = name
+        self.parent = parent
+        self.symbols: Dict[str, Symbol] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.symbols
+
+    def declare(self, symbol: Symbol) -> Symbol:
+        self.symbols[symbol.name] = symbol
+        return symbol
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        scope = self
+        while scope is not None:
+            symbol = scope.symbols.get(name)
+            if symbol is not None:
+                return symbol
+            scope = scope.parent
+        return None
+
+    def variable(self, name: str) -> Optional[Symbol]:
+        """
+        the variable visible under name, functions don't count
+        """
+        symbol = self.lookup(name)
+        if symbol is None or symbol.kind == "function":
+            return None
+        return symbol
+
+
+class SymbolTable:
+    """
+    every scope of a program plus the function calls waiting to be resolved
+    """
+    def __init__(self):
+        self.globals = Scope("")
+        self.scopes: Dict[str, Scope] = {}                  # function name -> its scope
+        self.calls: List[Tuple[str, int, int]] = []         # (function name, line, number of arguments)
+
+    @property
+    def functions(self) -> Dict[str, Symbol]:
+        return self.globals.symbols
+
+    def function(self, name: str, type: str, line: int) -> Tuple[FunctionSignature, Scope]:
+        """
+        declare a function and open its scope
+        """
+        sig = self.globals.declare(FunctionSignature(name, type, line))
+        scope = self.scopes[name] = Scope(name, self.globals)
+        return sig, scope
+
+    def call(self, name: str, line: int, arity: int):
+        self.calls.append((name, line, arity))
+
+    def absorb(self, other: "SymbolTable") -> List[FunctionSignature]:
+        """
+        add the functions and calls of a table built from another part of the same program
+        returns the functions that were already defined, those are left out
+        """
+        duplicates = []
+        for name, sig in other.functions.items():
+            if name in self.globals:
+                duplicates.append(sig)
+                continue
+            self.globals.declare(sig)
+            self.scopes[name] = other.scopes[name]
+            other.scopes[name].parent = self.globals
+        self.calls.extend(other.calls)
+        return duplicates
+
+    def unresolved(self) -> Iterator[Tuple[str, int, int]]:
+        """
+        check every recorded call against the function signatures in one pass
+        yields the calls that are undefined or have the wrong number of arguments
+        """
+        functions = self.globals.symbols
+        for call in self.calls:
+            sig = functions.get(call[0])
+            if sig is None or sig.arity != call[2]:
+                yield call
+
+    # the first call that does not match its function
+    def resolve(self) -> Optional[Tuple[str, int, int]]:
+        return next(self.unresolved(), None)
@@ -0,0 +1,62 @@
+"""
+Arena regression cases: a tree rebuilt from its arena runs like the tree
+it was flattened from
+Run with python3 test_arena.py, the repo's ast.py shadows the standard
+library module unittest and pytest need, so this runs the cases itself
+"""
+import sys
+import traceback
+
+from parser_sluc import Parser
+from checker import check
+from optimizer import optimize
+from output import CaptureSink
+from arena import Arena
+from bench.generator import PRESETS, generate
+
+
+def output(program) -> str:
+    out = CaptureSink()
+    program.eval(out)
+    return out.getvalue()
+
+
+def round_trip(source: str, optimized: bool = False):
+    program = check(Parser.from_bytes(source.encode()).program())
+    if optimized:
+        optimize(program)
+    rebuilt = Arena(program).program()
+    assert str(rebuilt) == str(program), "{}\nrebuilt as\n{}".format(program, rebuilt)
+    expected, got = output(program), output(rebuilt)
+    assert expected == got, "{!r} rebuilt prints {!r}".format(expected, got)
+
+
+def test_negative_zero():
+    # folded to FloatLitExpr values 0.0 and -0.0, which are equal in Python
+    round_trip("int main() {\n\tfloat a;\n\tfloat b;\n\ta = 0.0;\n\tb = -0.0;\n\tprint(a, b);\n}\n", True)
+
+
+def test_equal_literals_of_other_types():
+    round_trip("int main() {\n\tint a;\n\tfloat b;\n\tbool c;\n\ta = 1;\n\tb = 1.0;\n\tc = true;\n"
+               "\tprint(a, b, c, 1, 1.0, true);\n}\n", True)
+
+
+def test_generated():
+    source = generate(PRESETS["small"], 7)
+    round_trip(source)
+    round_trip(source, True)
+
+
+if __name__ == '__main__':
+    failed = 0
+    for name, case in sorted(globals().items()):
+        if name.startswith("test_") and callable(case):
+            try:
+                case()
+            except Exception:
+                failed += 1
+                print("FAIL {}".format(name))
+                traceback.print_exc()
+            else:
+                print("ok   {}".format(name))
+    sys.exit(1 if failed else 0)
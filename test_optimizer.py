@@ -0,0 +1,135 @@
+"""
+Optimizer and checker regression cases: an optimized program prints the
+same and fails the same way as the program it was given, and every engine
+runs a checked program the way the tree walker does
+Run with python3 test_optimizer.py, the repo's ast.py shadows the standard
+library module unittest and pytest need, so this runs the cases itself
+"""
+import sys
+import traceback
+
+from parser_sluc import Parser
+from checker import check
+from optimizer import optimize
+from output import CaptureSink
+import closures
+import transpiler
+import vm
+
+ENGINES = {
+    "tree": lambda program, out: program.eval(out),
+    "vm": lambda program, out: vm.run(program, out=out),
+    "closure": closures.run,
+    "python": lambda program, out: transpiler.run(program, None, out),
+}
+
+
+def run(source: str, optimized: bool, engine: str = "tree"):
+    """
+    the output and the error of a run on one engine
+    """
+    program = check(Parser.from_bytes(source.encode()).program())
+    if optimized:
+        optimize(program)
+    out = CaptureSink()
+    try:
+        ENGINES[engine](program, out)
+    except Exception as e:
+        return out.getvalue(), "{}: {}".format(type(e).__name__, e)
+    return out.getvalue(), None
+
+
+def main(body: str, kind: str = "int") -> str:
+    return "int main() {{\n\t{0} a;\n\t{0} b;\n\tbool c;\n{1}\n}}\n".format(kind, body)
+
+
+def same(source: str):
+    plain, optimized = run(source, False), run(source, True)
+    assert plain == optimized, "{} without -O, {} with it".format(plain, optimized)
+
+
+# a local holds None until it is assigned, an identity must not hide the error that causes
+
+def test_times_zero():
+    same(main("\tb = a * 0;\n\tprint(b);"))
+
+
+def test_plus_zero():
+    same(main("\tb = a + 0;\n\tprint(b);"))
+
+
+def test_times_one():
+    same(main("\tb = a * 1;\n\tprint(b);"))
+
+
+def test_divided_by_one():
+    same(main("\tb = a / 1;\n\tprint(b);", "float"))
+
+
+def test_power_one():
+    same(main("\tb = a ** 1;\n\tprint(b);"))
+
+
+def test_double_negation():
+    same(main("\tb = -(-a);\n\tprint(b);\n\tc = !(!c);\n\tprint(c);"))
+
+
+def test_assigned_on_one_branch():
+    same(main("\tb = 0;\n\tif (b == 0)\n\t\ta = 2;\n\tb = a * 0;\n\tprint(b);"))
+
+
+def test_assigned_in_loop_body():
+    same(main("\tb = 0;\n\twhile (b < 0) {\n\t\ta = 1;\n\t\tb = 1;\n\t}\n\tb = a + 0;\n\tprint(b);"))
+
+
+# the checker types a local only where it is assigned, the engines keep the run time checks
+
+def everywhere(source: str, error: str):
+    for engine in ENGINES:
+        for optimized in (False, True):
+            result = run(source, optimized, engine)
+            assert result[1] and error in result[1], "{}{}: {}".format(engine, " -O" * optimized, result)
+
+
+def test_unassigned_or():
+    everywhere(main("\tc = c || c;\n\tprint(c);"), "ERROR: type error")
+
+
+def test_unassigned_and():
+    everywhere(main("\tc = c && c;\n\tprint(c);"), "ERROR: type error")
+
+
+def test_unassigned_return():
+    everywhere("int f() {\n\tint x;\n\treturn x;\n}\nint main() {\n\tprint(f());\n}\n", "ERROR: type error")
+
+
+def test_unassigned_store():
+    everywhere(main("\tb = a;\n\tprint(b);"), "TypeError")
+
+
+def test_unassigned_on_one_branch():
+    everywhere(main("\tb = 0;\n\tif (b == 1)\n\t\ta = 2;\n\tb = a + 1;\n\tprint(b);"), "TypeError")
+
+
+# once every path assigns the local, the identities still apply
+
+def test_assigned_rewritten():
+    source = main("\tb = 0;\n\tif (b == 0)\n\t\ta = b;\n\telse\n\t\ta = 1;\n\tb = a * 0 + a * 1;\n\tprint(b);")
+    program = optimize(check(Parser.from_bytes(source.encode()).program()))
+    assert "b = a;" in str(program), str(program)
+    same(source)
+
+
+if __name__ == '__main__':
+    failed = 0
+    for name, case in sorted(globals().items()):
+        if name.startswith("test_") and callable(case):
+            try:
+                case()
+            except Exception:
+                failed += 1
+                print("FAIL {}".format(name))
+                traceback.print_exc()
+            else:
+                print("ok   {}".format(name))
+    sys.exit(1 if failed else 0)
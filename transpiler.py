@@ -0,0 +1,342 @@
+"""
+SLU-C to Python transpiler
+Emits each FunctionDef of a checked Program as the source of a Python
+function, with the variables as Python locals and while / if as Python
+control flow, and runs it with exec so programs run as CPython bytecode
+The type rules of the eval methods in ast.py are kept: assignments convert
+to the declared type, || and && and unproven + check their operands
+"""
+import sys
+from typing import Callable, List
+
+from ast import *
+from cache import CodeCache
+import closures
+
+FILENAME = "<sluc>"
+INDENT = "    "
+
+
+# helpers the generated code calls, they raise the errors eval raises
+
+def add_checked(left, right):
+    if type(left) == bool or type(right) == bool:
+        raise SLUCTypeError("ERROR: type error")
+    return left + right
+
+
+def bool_operand(value):
+    if type(value) != bool:
+        raise SLUCTypeError("ERROR: type error")
+    return value
+
+
+def bool_value(value, message: str):
+    if type(value) != bool:
+        raise SLUCTypeError(message)
+    return value
+
+
+def returned(value, ftype: str):
+    if type(value).__name__ != ftype:
+        raise SLUCTypeError("ERROR: type error")
+    return value
+
+
+def fail(message: str):
+    raise SLUCTypeError(message)
+
+
+def memo_call(memo, fn, *args):
+    return memo.call(lambda args: fn(*args), args)
+
+
+HELPERS = {
+    "_add": add_checked,
+    "_bool": bool_operand,
+    "_bool_value": bool_value,
+    "_returned": returned,
+    "_fail": fail,
+    "_memo": memo_call,
+}
+
+
+def literal(value) -> str:
+    """
+    Python source for an int, float, bool or str value
+    """
+    if type(value) == float and (value != value or value in (float("inf"), float("-inf"))):
+        return "float({!r})".format(repr(value))
+    text = repr(value)
+    return "(" + text + ")" if text.startswith("-") else text
+
+
+def variable(name: str) -> str:
+    return "v_" + name
+
+
+# the Python function of a FunctionDef, and the name it is registered under for calls
+def function_name(name: str) -> str:
+    return "fn_" + name
+
+
+def registered_name(name: str) -> str:
+    return "f_" + name
+
+
+def memo_name(name: str) -> str:
+    return "m_" + name
+
+
+class Transpiler:
+    """
+    Emits the Python source of one FunctionDef
+    """
+    def __init__(self, func: FunctionDef):
+        self.func = func
+        self.main = str(func.id) == "main"
+        self.lines: List[str] = []
+        self.level = 1
+        self.memos = {}     # the memos the calls use, by their name in the namespace
+
+        #  statement and expression dictionaries, keyed by node class
+        self.stmt_dict = {
+            Statement: lambda s: None,
+            AssignmentStatement: self.assignment,
+            ConstAssignment: lambda s: self.emit("{} = {}".format(self.target(s), literal(s.value))),
+            StoreAssignment: lambda s: self.store(s, "{}"),
+            IntAssignment: lambda s: self.store(s, "int({})"),
+            FloatAssignment: lambda s: self.store(s, "float({})"),
+            Declaration: self.declaration,
+            PrintStatement: self.printstmt,
+            WhileStatement: self.whilestmt,
+            IfStatement: self.ifstmt,
+            BlockStatement: self.block,
+            ReturnStatement: self.returnstmt,
+        }
+        self.expr_dict = {
+            IDExpr: lambda e: variable(e.id),
+            IntLitExpr: lambda e: literal(e.intlit),
+            FloatLitExpr: lambda e: literal(e.floatlit),
+            StrLitExpr: lambda e: literal(e.strlit),
+            BoolExpr: lambda e: literal(e.bool == "true"),
+            Farg: lambda e: self.expression(e.farg),
+            UnaryOp: self.unary,
+            AddExpr: lambda e: "_add({}, {})".format(self.expression(e.left), self.expression(e.right)),
+            IntAdd: lambda e: self.binary(e, "+"),
+            FloatAdd: lambda e: self.binary(e, "+"),
+            MultExpr: lambda e: self.binary(e, e.op if e.op in {"*", "/"} else "%"),
+            ExpoExpr: lambda e: self.binary(e, "**"),
+            EqExpr: lambda e: self.binary(e, "==" if e.Eqlop == "==" else "!="),
+            RelatExpr: lambda e: self.binary(e, e.relop) if e.right else self.expression(e.left),
+            Expr: lambda e: self.logical(e, "|"),
+            ConjExpr: lambda e: self.logical(e, "&"),
+            BoolOr: lambda e: self.binary(e, "|"),
+            BoolAnd: lambda e: self.binary(e, "&"),
+            FuncCExpr: self.call,
+            MemoCall: self.memo_call,
+        }
+
+    def emit(self, line: str):
+        self.lines.append(INDENT * self.level + line)
+
+    def body(self, s):
+        """
+        s one level deeper, a statement that emits nothing becomes pass
+        """
+        self.level += 1
+        count = len(self.lines)
+        self.statement(s)
+        if len(self.lines) == count:
+            self.emit("pass")
+        self.level -= 1
+
+    def transpile(self) -> List[str]:
+        func = self.func
+        params = [variable(name) for name in func.names[:func.nparams]]
+        if not self.main:
+            # calls pass one argument per parameter, f() passes a single empty one
+            params.append("*_")
+        self.lines.append("def {}({}):".format(function_name(str(func.id)), ", ".join(params)))
+        for name in func.names[func.nparams:]:
+            self.emit("{} = None".format(variable(name)))
+        for s in list(func.decls) + list(func.stmts):
+            self.statement(s)
+        if len(self.lines) == 1:
+            self.emit("pass")
+        return self.lines
+
+    # ---- statements
+
+    def statement(self, s):
+        self.stmt_dict[type(s)](s)
+
+    def target(self, s: AssignmentStatement) -> str:
+        return variable(str(s.left))
+
+    def declaration(self, d: Declaration):
+        if isinstance(d.right, AssignmentStatement):
+            self.statement(d.right)
+
+    def assignment(self, s: AssignmentStatement):
+        """
+        the literal and target type tests of AssignmentStatement.eval, made here
+        """
+        t = s.type
+        literal_type = type(s.right)
+        incorrect = "_fail({!r})".format("ERROR: Variable {} incorrect assignment type".format(s.left))
+        if t == "int" or t == "float":
+            if literal_type == StrLitExpr or literal_type == BoolExpr:
+                self.emit(incorrect)
+            else:
+                self.store(s, t + "({})")
+        elif t == "bool":
+            if literal_type == BoolExpr:
+                self.store(s, "{}")
+            elif literal_type in (IntLitExpr, FloatLitExpr, StrLitExpr):
+                self.emit(incorrect)
+            else:
+                message = "ERROR: Variable {} incorrect assignment type".format(s.left)
+                self.store(s, "_bool_value({{}}, {!r})".format(message))
+        elif t == "str":
+            if literal_type == StrLitExpr:
+                self.store(s, "str({})")
+            else:
+                self.emit(incorrect)
+
+    def store(self, s: AssignmentStatement, convert: str):
+        self.emit("{} = {}".format(self.target(s), convert.format(self.expression(s.right))))
+
+    def printstmt(self, s: PrintStatement):
+        args = [s.prtarg] + list(s.prtargs)
+        # one write per value, calls in the arguments may print too
+        for arg in args[:-1]:
+            self.emit("_write(str({}) + ' ')".format(self.expression(arg)))
+        self.emit("_write(str({}) + '\\n')".format(self.expression(args[-1])))
+
+    def whilestmt(self, s: WhileStatement):
+        self.emit("while {}:".format(self.expression(s.left)))
+        self.body(s.right)
+
+    def ifstmt(self, s: IfStatement):
+        self.emit("if {}:".format(self.expression(s.expr)))
+        self.body(s.stmt)
+        if s.elsestmt:
+            self.emit("else:")
+            self.body(s.elsestmt)
+
+    def block(self, s: BlockStatement):
+        self.statement(s.left)
+        for arg in s.right:
+            self.statement(arg)
+
+    # main's value is thrown away, any other function checks it against its type
+    # unless the checker proved every return has it
+    def returnstmt(self, s: ReturnStatement):
+        value = self.expression(s.left)
+        if self.main or not self.func.check_return:
+            self.emit("return {}".format(value))
+        else:
+            self.emit("return _returned({}, {!r})".format(value, self.func.type))
+
+    # ---- expressions, every operator is parenthesized
+
+    def expression(self, e) -> str:
+        return self.expr_dict[type(e)](e)
+
+    def unary(self, e: UnaryOp) -> str:
+        if e.op == "-":
+            return "(-{})".format(self.expression(e.tree))
+        return "(not {})".format(self.expression(e.tree))
+
+    def binary(self, e: BinaryExpr, op: str) -> str:
+        return "({} {} {})".format(self.expression(e.left), op, self.expression(e.right))
+
+    # || and && evaluate both sides and require bools, the left one is checked first
+    def logical(self, e: Expr, op: str) -> str:
+        if not e.right:
+            return "_bool({})".format(self.expression(e.left))
+        return "(_bool({}) {} _bool({}))".format(self.expression(e.left), op, self.expression(e.right))
+
+    def call(self, e: FuncCExpr) -> str:
+        args = [e.left] + list(e.right)
+        return "{}({})".format(registered_name(str(e.f_id)), ", ".join(map(self.expression, args)))
+
+    def memo_call(self, e: MemoCall) -> str:
+        name = memo_name(str(e.f_id))
+        self.memos[name] = e.memo
+        args = [e.left] + list(e.right)
+        return "_memo({}, {})".format(name, ", ".join([registered_name(str(e.f_id))] + list(map(self.expression, args))))
+
+
+def transpile(func: FunctionDef) -> str:
+    return "\n".join(Transpiler(func).transpile()) + "\n"
+
+
+class Calls:
+    """
+    Function table for closure-compiled functions, over the registered Python ones
+    """
+    def __init__(self, namespace: dict):
+        self.namespace = namespace
+
+    def __getitem__(self, name: str):
+        fn = self.namespace[registered_name(name)]
+        return lambda args: fn(*args)
+
+
+def load(func: FunctionDef, namespace: dict, cache: CodeCache = None) -> Callable:
+    """
+    func as a Python function of its arguments, its globals are namespace
+    """
+    try:
+        transpiler = Transpiler(func)
+        source = "\n".join(transpiler.transpile()) + "\n"
+        namespace.update(transpiler.memos)
+        code = cache.compile(source, FILENAME) if cache else compile(source, FILENAME, "exec")
+    except (SyntaxError, RecursionError, MemoryError):
+        # nested deeper than Python compiles, this function runs as closures instead
+        code = closures.ClosureCompiler(Calls(namespace), namespace["_out"]).compile(func)
+        return lambda *args: code(list(args))
+    exec(code, namespace)
+    return namespace.pop(function_name(str(func.id)))
+
+
+def register(func: FunctionDef, namespace: dict, cache: CodeCache = None):
+    """
+    puts func in namespace, it is transpiled on its first call
+    so functions that never run cost nothing
+    """
+    name = registered_name(str(func.id))
+
+    def compile_and_call(*args):
+        fn = load(func, namespace, cache)
+        namespace[name] = fn
+        return fn(*args)
+    namespace[name] = compile_and_call
+
+
+def run(program: Program, cache: CodeCache = None, out: Sink = None):
+    """
+    registers the functions in order and runs main when it is reached,
+    compiled code objects are kept in cache
+    """
+    out = BufferedSink() if out is None else out
+    namespace = dict(HELPERS)
+    namespace["_out"] = out
+    namespace["_write"] = out.write
+    try:
+        for f in program.funcs:
+            if str(f.id) == "main":
+                load(f, namespace, cache)()
+            else:
+                register(f, namespace, cache)
+    finally:
+        out.flush()
+
+
+if __name__ == '__main__':
+    from parser_sluc import Parser
+    from checker import check
+    for f in check(Parser(sys.argv[1] if len(sys.argv) > 1 else "simple.c").program()).funcs:
+        print(transpile(f))
@@ -0,0 +1,219 @@
+"""
+SLU-C virtual machine
+A stack machine that runs the bytecode made by compiler.py, one dispatch
+loop per program run: calls push a frame on a list instead of the Python
+stack, so the depth of SLU-C recursion is the VM's limit, not CPython's
+"""
+import sys
+from typing import Dict, List
+
+from compiler import *
+from memo import MISSING, key
+
+RECURSION_LIMIT = 100000    # deepest call nesting, the frames are small lists
+
+
+class VM:
+    """
+    Runs a compiled program the way Program.eval runs the tree: functions are
+    registered in order and main runs when it is reached
+    """
+    def __init__(self, limit: int = RECURSION_LIMIT, out: Sink = None):
+        self.functions: Dict[str, Function] = {}
+        self.limit = limit
+        self.out = BufferedSink() if out is None else out
+
+    def run(self, functions: List[Function]):
+        try:
+            for f in functions:
+                if f.name == "main":
+                    self.execute(f, [])
+                else:
+                    self.functions[f.name] = f
+        finally:
+            self.out.flush()
+
+    def execute(self, func: Function, args: list):
+        """
+        runs func and every call it makes, the frames of the callers wait in frames
+        all frames share one operand stack, a call pops its arguments
+        and a return leaves its value on top for the caller
+        """
+        code = func.code
+        slots = args[:func.params] + [None] * (len(func.names) - func.params)
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        functions = self.functions
+        write = self.out.write
+        frames = []     # (func, code, slots, pc, memo, key) of each waiting caller
+        limit = self.limit
+        memo = None     # the memo this frame's value goes into, and its key there
+        memo_key = None
+        pc = 0
+        # opcodes are numbered by frequency, tested six at a time
+        while True:
+            op, arg = code[pc]
+            pc += 1
+            if op <= CONST:
+                if op == LOAD:
+                    push(slots[arg])
+                elif op == JUMP_UNLESS_LC:
+                    a, c, fn, target = arg
+                    if not fn(slots[a], c):
+                        pc = target
+                elif op == STORE_INT:
+                    value = pop()
+                    slots[arg] = value if type(value) == int else int(value)
+                elif op == ADD_LC:
+                    a, c = arg
+                    left = slots[a]
+                    if type(left) == bool:
+                        raise SLUCTypeError("ERROR: type error")
+                    push(left + c)
+                elif op == BINARY_LC:
+                    a, c, fn = arg
+                    push(fn(slots[a], c))
+                elif op == CONST:
+                    push(arg)
+            elif op <= RETURN:
+                if op == JUMP:
+                    pc = arg
+                elif op == CALL:
+                    name, n = arg
+                    args = stack[-n:]
+                    del stack[-n:]
+                    if len(frames) >= limit:
+                        raise SLUCRecursionError(limit)
+                    frames.append((func, code, slots, pc, memo, memo_key))
+                    func = functions[name]
+                    code = func.code
+                    slots = args[:func.params] + [None] * (len(func.names) - func.params)
+                    pc = 0
+                    memo = None
+                elif op == ADD:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) == bool or type(right) == bool:
+                        raise SLUCTypeError("ERROR: type error")
+                    stack[-1] = left + right
+                elif op == BINARY_XC:
+                    c, fn = arg
+                    stack[-1] = fn(stack[-1], c)
+                elif op == STORE:
+                    slots[arg] = pop()
+                elif op == RETURN:
+                    if memo is not None:
+                        memo.put(memo_key, stack[-1])
+                    if not frames:
+                        return pop()
+                    func, code, slots, pc, memo, memo_key = frames.pop()
+            elif op <= ADD_LL:
+                if op == RETURN_CHECKED:
+                    if type(stack[-1]).__name__ != arg:
+                        raise SLUCTypeError("ERROR: type error")
+                    if memo is not None:
+                        memo.put(memo_key, stack[-1])
+                    if not frames:
+                        return pop()
+                    func, code, slots, pc, memo, memo_key = frames.pop()
+                elif op == BINARY:
+                    right = pop()
+                    stack[-1] = arg(stack[-1], right)
+                elif op == JUMP_IF_FALSE:
+                    if not pop():
+                        pc = arg
+                elif op == STORE_FLOAT:
+                    slots[arg] = float(pop())
+                elif op == ADD_LL:
+                    left = slots[arg[0]]
+                    right = slots[arg[1]]
+                    if type(left) == bool or type(right) == bool:
+                        raise SLUCTypeError("ERROR: type error")
+                    push(left + right)
+            elif op <= PRINT:
+                if op == BINARY_LL:
+                    a, b, fn = arg
+                    push(fn(slots[a], slots[b]))
+                elif op == JUMP_UNLESS_LL:
+                    a, b, fn, target = arg
+                    if not fn(slots[a], slots[b]):
+                        pc = target
+                elif op == ADD_XC:
+                    left = stack[-1]
+                    if type(left) == bool:
+                        raise SLUCTypeError("ERROR: type error")
+                    stack[-1] = left + arg
+                elif op == ADD_XL:
+                    left = stack[-1]
+                    right = slots[arg]
+                    if type(left) == bool or type(right) == bool:
+                        raise SLUCTypeError("ERROR: type error")
+                    stack[-1] = left + right
+                elif op == BINARY_XL:
+                    a, fn = arg
+                    stack[-1] = fn(stack[-1], slots[a])
+                elif op == PRINT:
+                    write(str(pop()) + arg)
+            else:
+                if op == UNARY:
+                    stack[-1] = arg(stack[-1])
+                elif op == CHECK_BOOL:
+                    if type(stack[-1]) != bool:
+                        raise SLUCTypeError("ERROR: type error")
+                elif op == BOOL_AND:
+                    right = pop()
+                    if type(right) != bool:
+                        raise SLUCTypeError("ERROR: type error")
+                    stack[-1] = stack[-1] and right
+                elif op == BOOL_OR:
+                    right = pop()
+                    if type(right) != bool:
+                        raise SLUCTypeError("ERROR: type error")
+                    stack[-1] = stack[-1] or right
+                elif op == STORE_BOOL:
+                    value = pop()
+                    if type(value) != bool:
+                        raise arg[1]
+                    slots[arg[0]] = value
+                elif op == FAIL:
+                    raise arg
+                elif op == CALL_MEMO:
+                    name, n, callee_memo = arg
+                    args = stack[-n:]
+                    del stack[-n:]
+                    f = functions[name]
+                    k = key(args)
+                    value = callee_memo.get(k)
+                    if value is not MISSING:
+                        push(value)
+                        continue
+                    if len(frames) >= limit:
+                        raise SLUCRecursionError(limit)
+                    frames.append((func, code, slots, pc, memo, memo_key))
+                    func = f
+                    code = func.code
+                    slots = args[:func.params] + [None] * (len(func.names) - func.params)
+                    pc = 0
+                    memo = callee_memo
+                    memo_key = k
+                elif op == TAIL_CALL:
+                    # the callee takes over this frame, its value is this call's value
+                    name, n = arg
+                    args = stack[-n:]
+                    del stack[-n:]
+                    func = functions[name]
+                    code = func.code
+                    slots = args[:func.params] + [None] * (len(func.names) - func.params)
+                    pc = 0
+                else:
+                    raise RuntimeError("bad opcode {} at {} in {}".format(op, pc - 1, func.name))
+
+
+def run(program: Program, limit: int = RECURSION_LIMIT, out: Sink = None):
+    VM(limit, out).run(compile_program(program))
+
+
+if __name__ == '__main__':
+    from parser_sluc import Parser
+    run(Parser(sys.argv[1] if len(sys.argv) > 1 else "simple.c").program())